@@ -1,10 +1,114 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Blueprint, Flask, Response, current_app, g, render_template, request, jsonify, send_file, session, stream_with_context, url_for
+from jinja2 import DictLoader, FileSystemLoader, ModuleLoader
+import argparse
+import hashlib
+import itertools
 import json
 import os
-from datetime import datetime
+import re
+import secrets
+import time
+from datetime import datetime, timedelta
 
-app = Flask(__name__)
-app.secret_key = 'smart_tourism_secret_key_2024'
+import compression
+import metrics
+import profiling
+from answers import DEFAULT_ANSWER, AnswerEngine
+from ar import ARAssetStore, MappedFile
+from assets import AssetManifest
+from catalog import SCHEMA_VERSION, CatalogSchemaError, decode_cursor, encode_cursor, open_catalog, parse_sort
+from compression import add_vary, choose_encoding, compress
+from i18n import DEFAULT_LANGUAGE, LANGUAGE_CODES, LANGUAGES_BY_CODE, localize, negotiate_language
+from metrics import Metrics, TimedProxy, timed
+from offline import DOWNLOAD_ID_RE, DownloadProgress, PackBuilder
+from pagecache import CachedPage, PageCache, page_etag
+from profiling import PROFILE_ID_RE
+from reloader import CatalogReloader, LoadedCatalog
+from search import GENERAL_PASSAGES, SearchIndex, index_path, site_passages
+from server import SHARED_SESSIONS, add_serve_arguments, gunicorn_metrics_dir, serve, under_gunicorn
+from sessions import ServerSessionInterface, open_session_store
+from synthetic import write_catalog
+from tts import ESPEAK_VOICES, TTS_AVAILABLE, VOICE_RE, AudioCache, EspeakSynthesizer, SpeechRenderer, audio_key
+from voice import SAMPLE_RATE, STT_AVAILABLE, AudioError, SpeechBatcher, WhisperTranscriber, decode_audio
+
+bp = Blueprint('tourism', __name__)
+
+def default_config():
+    return {
+        # Sessions are stored server-side, so nothing depends on this key across
+        # restarts; set it to keep anything else that signs data stable
+        'SECRET_KEY': os.environ.get('SMART_TOURISM_SECRET_KEY') or secrets.token_hex(32),
+        # memory: per-worker LRU; sqlite:///path shares sessions between workers,
+        # the default under gunicorn
+        'SESSION_URI': os.environ.get('SMART_TOURISM_SESSIONS', SHARED_SESSIONS if under_gunicorn() else 'memory'),
+        # Sessions idle for longer than this expire
+        'PERMANENT_SESSION_LIFETIME': timedelta(days=30),
+        'SESSION_MAX_ENTRIES': 100000,
+        'CATALOG_URI': os.environ.get('SMART_TOURISM_CATALOG', 'memory'),
+        # Seconds between checks of a sqlite:/// catalog file for changes, which
+        # are loaded in the background and swapped in; 0 only reloads on request
+        'CATALOG_WATCH_INTERVAL': float(os.environ.get('SMART_TOURISM_CATALOG_WATCH_INTERVAL', 5)),
+        # Requests sending this in X-Admin-Token may reload the catalog
+        'ADMIN_TOKEN': os.environ.get('SMART_TOURISM_ADMIN_TOKEN'),
+        # memory: serve the TEMPLATES dict below; compiled: load the modules written by
+        # `python Website.py build`; filesystem: read templates/ (handy while editing)
+        'TEMPLATE_MODE': os.environ.get('SMART_TOURISM_TEMPLATES', 'memory'),
+        'BUILD_DIR': os.environ.get('SMART_TOURISM_BUILD_DIR', 'build'),
+        'STATIC_DIR': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'),
+        'NEARBY_RADIUS_KM': 100.0,
+        'NEARBY_LIMIT': 10,
+        'NEARBY_MAX_LIMIT': 100,
+        'PAGE_CACHE_MAX_BYTES': int(os.environ.get('SMART_TOURISM_PAGE_CACHE_BYTES', 64 * 1024 * 1024)),
+        'ANSWER_PASSAGES': 3,
+        # Answers kept in memory, keyed by site, normalised question and language
+        'ANSWER_CACHE_SIZE': 10000,
+        'DISCOVER_PAGE_SIZE': 24,
+        # Responses smaller than this are sent uncompressed
+        'COMPRESS_MIN_SIZE': 500,
+        'OFFLINE_PACK_DIR': os.environ.get('SMART_TOURISM_PACK_DIR', 'packs'),
+        # Maps, audio and AR files, laid out as <kind>/<site_id>/...
+        'OFFLINE_MEDIA_DIR': os.environ.get('SMART_TOURISM_MEDIA_DIR', 'media'),
+        'OFFLINE_CHUNK_SIZE': 1024 * 1024,
+        # Seconds clients are asked to wait while a region's first pack is built
+        'OFFLINE_RETRY_AFTER': 10,
+        # Bytes per write when streaming AR models out of their memory maps
+        'AR_CHUNK_SIZE': 256 * 1024,
+        # Sites whose pages the service worker keeps for offline use
+        'PRECACHE_MAX_SITES': 500,
+        # Site pages and JSON rendered in every language at start-up
+        'PRECOMPUTE_SITES': 1000,
+        # Local speech-to-text for /api/voice_query (needs transformers)
+        'STT_MODEL': os.environ.get('SMART_TOURISM_STT_MODEL', 'openai/whisper-tiny'),
+        'STT_WORKERS': 1,
+        'STT_THREADS': None,
+        'STT_MAX_BATCH': 8,
+        # How long the first clip of a batch waits for others to join it
+        'STT_MAX_WAIT_MS': 50,
+        'VOICE_MAX_BYTES': 5 * 1024 * 1024,
+        'VOICE_MAX_SECONDS': 30,
+        # Spoken answers (needs espeak-ng); clips are cached by content
+        'TTS_VOICE': 'default',
+        'TTS_MAX_CHARS': 1000,
+        'TTS_CACHE_BYTES': 32 * 1024 * 1024,
+        'TTS_SPILL_DIR': os.environ.get('SMART_TOURISM_TTS_DIR', 'tts-cache'),
+        'TTS_SPILL_MAX_BYTES': 1024 * 1024 * 1024,
+        # Where workers share request metrics, so /metrics covers all of them;
+        # unset, each worker reports only its own requests (gunicorn's workers
+        # default to a directory per master)
+        'METRICS_DIR': os.environ.get('SMART_TOURISM_METRICS_DIR') or (
+            gunicorn_metrics_dir() if under_gunicorn() else None),
+        'METRICS_FLUSH_INTERVAL': 1.0,
+        # Requests sending this in X-Profile-Token may ask for a profile with
+        # X-Profile; unset, only PROFILE_SAMPLE_RATE picks requests to profile
+        'PROFILE_TOKEN': os.environ.get('SMART_TOURISM_PROFILE_TOKEN'),
+        'PROFILE_SAMPLE_RATE': float(os.environ.get('SMART_TOURISM_PROFILE_SAMPLE_RATE', 0)),
+        'PROFILE_INTERVAL_MS': 1,
+        'PROFILE_DIR': os.environ.get('SMART_TOURISM_PROFILE_DIR', 'profiles'),
+        'PROFILE_MAX_FILES': 1000,
+        'BATCH_MAX_SITES': 1000,
+        # Batches larger than this are streamed instead of built in memory
+        'BATCH_STREAM_THRESHOLD': 100,
+    }
 
 # Sample data for demonstration
 SAMPLE_HERITAGE_SITES = {
@@ -14,6 +118,8 @@ SAMPLE_HERITAGE_SITES = {
         "description": "An ivory-white marble mausoleum on the right bank of the Yamuna river",
         "history": "Built by Mughal emperor Shah Jahan in memory of his wife Mumtaz Mahal. Construction started in 1632 and completed in 1653.",
         "architectural_style": "Mughal architecture",
+        "lat": 27.1751,
+        "lon": 78.0421,
         "fun_facts": [
             "It took approximately 22 years and 20,000 artisans to complete",
             "The marble changes color throughout the day",
@@ -27,6 +133,8 @@ SAMPLE_HERITAGE_SITES = {
         "description": "An oval amphitheatre in the centre of the city of Rome",
         "history": "Built between 72 AD and 80 AD under the emperors Vespasian and Titus. Could hold 50,000-80,000 spectators.",
         "architectural_style": "Roman architecture",
+        "lat": 41.8902,
+        "lon": 12.4922,
         "fun_facts": [
             "Used for gladiatorial contests and public spectacles",
             "Had a retractable awning to protect spectators from sun",
@@ -40,6 +148,8 @@ SAMPLE_HERITAGE_SITES = {
         "description": "Series of fortifications made of stone, brick, and other materials",
         "history": "Originally built as early as the 7th century BC, with major construction during the Ming dynasty (1368-1644).",
         "architectural_style": "Military architecture",
+        "lat": 40.3597,
+        "lon": 116.0200,
         "fun_facts": [
             "Total length is approximately 21,196 km",
             "Contrary to myth, it cannot be seen from space with naked eye",
@@ -51,264 +161,899 @@ SAMPLE_HERITAGE_SITES = {
 
 SAMPLE_NEARBY_ATTRACTIONS = {
     "taj_mahal": [
-        {"name": "Agra Fort", "type": "Historical Fort", "distance": "2.5 km"},
-        {"name": "Mehtab Bagh", "type": "Gardens", "distance": "1 km"},
-        {"name": "Local Bazaar", "type": "Shopping", "distance": "3 km"}
+        {"name": "Agra Fort", "type": "Historical Fort", "lat": 27.1795, "lon": 78.0211},
+        {"name": "Mehtab Bagh", "type": "Gardens", "lat": 27.1795, "lon": 78.0425},
+        {"name": "Local Bazaar", "type": "Shopping", "lat": 27.1967, "lon": 78.0185}
     ],
     "colosseum": [
-        {"name": "Roman Forum", "type": "Archaeological Site", "distance": "0.5 km"},
-        {"name": "Palatine Hill", "type": "Historical Site", "distance": "0.8 km"},
-        {"name": "Trevi Fountain", "type": "Landmark", "distance": "1.2 km"}
+        {"name": "Roman Forum", "type": "Archaeological Site", "lat": 41.8925, "lon": 12.4853},
+        {"name": "Palatine Hill", "type": "Historical Site", "lat": 41.8894, "lon": 12.4875},
+        {"name": "Trevi Fountain", "type": "Landmark", "lat": 41.9009, "lon": 12.4833}
     ],
     "great_wall": [
-        {"name": "Mutianyu Section", "type": "Wall Section", "distance": "70 km"},
-        {"name": "Ming Tombs", "type": "Historical Site", "distance": "50 km"},
-        {"name": "Beijing City Center", "type": "Urban Area", "distance": "60 km"}
+        {"name": "Mutianyu Section", "type": "Wall Section", "lat": 40.4319, "lon": 116.5704},
+        {"name": "Ming Tombs", "type": "Historical Site", "lat": 40.2530, "lon": 116.2200},
+        {"name": "Beijing City Center", "type": "Urban Area", "lat": 39.9042, "lon": 116.4074}
     ]
 }
 
-@app.route('/')
+SAMPLE_SITE_TRANSLATIONS = {
+    "taj_mahal": {
+        "Hindi": {
+            "name": "ताज महल",
+            "location": "आगरा, भारत",
+            "description": "यमुना नदी के दाहिने किनारे पर स्थित हाथीदांत-सफ़ेद संगमरमर का मकबरा",
+            "history": "मुग़ल सम्राट शाहजहाँ ने इसे अपनी पत्नी मुमताज़ महल की याद में बनवाया था। निर्माण 1632 में शुरू हुआ और 1653 में पूरा हुआ।",
+            "architectural_style": "मुग़ल वास्तुकला",
+            "fun_facts": [
+                "इसे बनाने में लगभग 22 वर्ष और 20,000 कारीगर लगे",
+                "दिन भर में संगमरमर का रंग बदलता रहता है",
+                "यह दुनिया के सात अजूबों में से एक है"
+            ]
+        },
+        "Spanish": {
+            "name": "Taj Mahal",
+            "location": "Agra, India",
+            "description": "Un mausoleo de mármol blanco marfil en la orilla derecha del río Yamuna",
+            "history": "Construido por el emperador mogol Shah Jahan en memoria de su esposa Mumtaz Mahal. La construcción comenzó en 1632 y terminó en 1653.",
+            "architectural_style": "Arquitectura mogol",
+            "fun_facts": [
+                "Se necesitaron unos 22 años y 20.000 artesanos para completarlo",
+                "El mármol cambia de color a lo largo del día",
+                "Es una de las siete maravillas del mundo"
+            ]
+        },
+        "French": {
+            "name": "Taj Mahal",
+            "location": "Agra, Inde",
+            "description": "Un mausolée de marbre blanc ivoire sur la rive droite de la Yamuna",
+            "history": "Construit par l'empereur moghol Shah Jahan en mémoire de son épouse Mumtaz Mahal. Les travaux ont commencé en 1632 et se sont achevés en 1653.",
+            "architectural_style": "Architecture moghole",
+            "fun_facts": [
+                "Il a fallu environ 22 ans et 20 000 artisans pour l'achever",
+                "Le marbre change de couleur au fil de la journée",
+                "C'est l'une des sept merveilles du monde"
+            ]
+        }
+    },
+    "colosseum": {
+        "Italian": {
+            "name": "Colosseo",
+            "location": "Roma, Italia",
+            "description": "Un anfiteatro ovale nel centro della città di Roma",
+            "history": "Costruito tra il 72 e l'80 d.C. sotto gli imperatori Vespasiano e Tito. Poteva ospitare da 50.000 a 80.000 spettatori.",
+            "architectural_style": "Architettura romana",
+            "fun_facts": [
+                "Era usato per combattimenti tra gladiatori e spettacoli pubblici",
+                "Aveva un velario retrattile per riparare gli spettatori dal sole",
+                "80 ingressi permettevano di entrare e uscire rapidamente"
+            ]
+        },
+        "Spanish": {
+            "name": "Coliseo",
+            "location": "Roma, Italia",
+            "description": "Un anfiteatro ovalado en el centro de la ciudad de Roma",
+            "history": "Construido entre el 72 d. C. y el 80 d. C. bajo los emperadores Vespasiano y Tito. Podía albergar entre 50.000 y 80.000 espectadores.",
+            "architectural_style": "Arquitectura romana",
+            "fun_facts": [
+                "Se usaba para combates de gladiadores y espectáculos públicos",
+                "Tenía un toldo retráctil para proteger del sol a los espectadores",
+                "80 entradas permitían entrar y salir con rapidez"
+            ]
+        },
+        "French": {
+            "name": "Colisée",
+            "location": "Rome, Italie",
+            "description": "Un amphithéâtre ovale au centre de la ville de Rome",
+            "history": "Construit entre 72 et 80 apr. J.-C. sous les empereurs Vespasien et Titus. Il pouvait accueillir de 50 000 à 80 000 spectateurs.",
+            "architectural_style": "Architecture romaine",
+            "fun_facts": [
+                "Il accueillait des combats de gladiateurs et des spectacles publics",
+                "Un velum rétractable protégeait les spectateurs du soleil",
+                "80 entrées permettaient d'entrer et de sortir rapidement"
+            ]
+        }
+    },
+    "great_wall": {
+        "Mandarin": {
+            "name": "长城",
+            "location": "中国北方",
+            "description": "由石头、砖块和其他材料建成的一系列防御工事",
+            "history": "最早建于公元前7世纪，明朝（1368-1644年）期间进行了大规模修建。",
+            "architectural_style": "军事建筑",
+            "fun_facts": [
+                "总长度约为21,196公里",
+                "与传说相反，从太空用肉眼看不到长城",
+                "由多个朝代历时两千多年修建而成"
+            ]
+        },
+        "Spanish": {
+            "name": "Gran Muralla China",
+            "location": "Norte de China",
+            "description": "Serie de fortificaciones hechas de piedra, ladrillo y otros materiales",
+            "history": "Construida originalmente ya en el siglo VII a. C., con grandes obras durante la dinastía Ming (1368-1644).",
+            "architectural_style": "Arquitectura militar",
+            "fun_facts": [
+                "Su longitud total es de aproximadamente 21.196 km",
+                "Contrariamente al mito, no se puede ver desde el espacio a simple vista",
+                "Fue construida durante más de 2.000 años por varias dinastías"
+            ]
+        },
+        "French": {
+            "name": "Grande Muraille de Chine",
+            "location": "Nord de la Chine",
+            "description": "Ensemble de fortifications en pierre, en brique et en d'autres matériaux",
+            "history": "Construite dès le VIIe siècle av. J.-C., avec de grands travaux sous la dynastie Ming (1368-1644).",
+            "architectural_style": "Architecture militaire",
+            "fun_facts": [
+                "Sa longueur totale est d'environ 21 196 km",
+                "Contrairement au mythe, on ne la voit pas depuis l'espace à l'œil nu",
+                "Elle a été bâtie pendant plus de 2 000 ans par plusieurs dynasties"
+            ]
+        }
+    }
+}
+
+def loaded_catalog():
+    """The catalog and search index of this request.
+    
+    Fixed on first use, so a reload finishing mid-request can't mix versions.
+    """
+    if 'loaded_catalog' not in g:
+        g.loaded_catalog = current_app.extensions['catalog_reloader'].current
+    return g.loaded_catalog
+
+def get_catalog():
+    # Lookups are timed as the request's data phase in /metrics
+    return TimedProxy(loaded_catalog().catalog, 'data')
+
+def request_language():
+    """The language chosen with /api/change_language, else from Accept-Language."""
+    language = session.get('language')
+    # Sessions saved before languages were checked may hold anything
+    if language in LANGUAGE_CODES:
+        return language
+    return negotiate_language(request.accept_languages)
+
+def site_language(site_id):
+    """Language of the variant of a site to serve: the requested one if the
+    site has a translation for it, otherwise the original."""
+    language = request_language()
+    if language != DEFAULT_LANGUAGE and get_catalog().get_translation(site_id, language) is None:
+        return DEFAULT_LANGUAGE
+    return language
+
+def template_version():
+    """Version of the templates and assets that pages are rendered from."""
+    app = current_app
+    if app.config['TEMPLATE_MODE'] != 'filesystem':
+        return app.extensions['template_version']
+    # Templates edited on disk are served from the next request on, so this
+    # follows the files rather than the TEMPLATES dict
+    loader = app.jinja_env.loader
+    digest = hashlib.sha1(app.extensions['assets'].version.encode('utf-8'))
+    for name in sorted(loader.list_templates()):
+        stat = os.stat(os.path.join(loader.searchpath[0], name))
+        digest.update(f'{name}:{stat.st_size}:{stat.st_mtime_ns}'.encode('utf-8'))
+    return digest.hexdigest()
+
+def page_revision(route, site_id, language=None):
+    """ETag of a page served by ``cached_page``, without encoding suffix."""
+    return page_etag(get_catalog().version, template_version(), route, site_id, language)
+
+def render_page(route, site_id, language, render, mimetype='text/html'):
+    """Return the uncompressed ``CachedPage``, rendering it on a cache miss.
+    
+    ``render`` returns the body, or a ``(body, status)`` tuple for responses
+    that must not be cached, which is passed through.
+    """
+    cache = current_app.extensions['page_cache']
+    key = (get_catalog().version, template_version(), route, site_id, language, None)
+    page = cache.get(key)
+    if page is None:
+        rendered = render()
+        if isinstance(rendered, tuple):
+            return rendered
+        page = CachedPage(rendered.encode('utf-8'), page_revision(route, site_id, language), mimetype)
+        cache.put(key, page)
+    return page
+
+def cached_page(route, site_id, render, mimetype='text/html', language=None):
+    """Serve a rendered page from the page cache, honouring If-None-Match.
+    
+    Pages that come in several languages pass the ``language`` of the variant
+    to serve. Compressed variants are cached alongside the page, so repeat
+    requests cost no CPU.
+    """
+    version = (get_catalog().version, template_version())
+    etag = page_revision(route, site_id, language)
+    encoding = choose_encoding(request.accept_encodings)
+    encoded_etag = f'{etag}-{encoding}' if encoding else etag
+    if request.if_none_match.contains(encoded_etag) or request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(encoded_etag if request.if_none_match.contains(encoded_etag) else etag)
+    else:
+        cache = current_app.extensions['page_cache']
+        key = (*version, route, site_id, language)
+        page = cache.get(key + (encoding,))
+        if page is None:
+            page = render_page(route, site_id, language, render, mimetype)
+            if isinstance(page, tuple):
+                return page
+            if encoding and page.size >= current_app.config['COMPRESS_MIN_SIZE']:
+                page = CachedPage(compress(page.body, encoding, 'best'), encoded_etag,
+                                  page.mimetype, encoding)
+                cache.put(key + (encoding,), page)
+        response = Response(page.body, mimetype=page.mimetype)
+        if page.encoding:
+            response.headers['Content-Encoding'] = page.encoding
+        response.set_etag(page.etag)
+    add_vary(response, 'Accept-Encoding')
+    if language is not None:
+        set_content_language(response, language)
+    # Let browsers keep the page but revalidate it, which costs a 304
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def answer_question(question, site_id=None, language=None):
+    """Answer through the app's ``AnswerEngine`` in the visitor's language.
+    
+    Returns ``(answer, hit)`` like ``AnswerEngine.answer``.
+    """
+    language = language or request_language()
+    catalog, index = loaded_catalog()
+    with timed('data'):
+        return current_app.extensions['answers'].answer(catalog, index, question, site_id, language)
+
+def answer_tokens(text):
+    """Pieces of ``text``, one word each with its trailing space, that
+    concatenate back to it exactly."""
+    return re.split(r'(?<=\s)(?=\S)', text)
+
+def answer_json(answer):
+    return {"answer": answer.text, "language": answer.language,
+            "audio_url": speech_url(answer), "passages": answer.passages}
+
+def speech_url(answer):
+    """URL of the spoken version of ``answer``, or None without espeak-ng.
+    
+    It names the site the answer came from, so /api/speech can check the
+    text is one of its passages.
+    """
+    if not TTS_AVAILABLE:
+        return None
+    site_id = answer.passages[0]['site_id'] if answer.passages else None
+    return url_for('tourism.speech', text=answer.text, language=LANGUAGE_CODES[answer.language],
+                   voice=current_app.config['TTS_VOICE'], site=site_id)
+
+def is_answer_text(text, language_code, site_id):
+    """Whether ``text`` is an answer this server gives in ``language_code``:
+    the default or a general answer, or a passage of site ``site_id``."""
+    if language_code == LANGUAGE_CODES[DEFAULT_LANGUAGE] and (
+            text == DEFAULT_ANSWER or text in GENERAL_PASSAGES.values()):
+        return True
+    catalog = get_catalog()
+    site = catalog.get_site(site_id) if site_id else None
+    language = LANGUAGES_BY_CODE.get(language_code)
+    if site is None or language is None:
+        return False
+    if language != DEFAULT_LANGUAGE:
+        translation = catalog.get_translation(site_id, language)
+        if translation is None:
+            return False
+        site = localize(site, translation)
+    return any(passage == text for _, _, passage in site_passages(site))
+
+# Streaming formats of /api/ask_question, by ?stream= value and by mimetype
+STREAM_FORMATS = {'sse': 'text/event-stream', 'ndjson': 'application/x-ndjson'}
+
+def stream_answer(question, site_id, language, fmt):
+    """Stream an answer as ``meta``, ``passage``..., ``token``... and ``done`` events.
+    
+    ``meta`` goes out before retrieval starts, so the client hears back
+    straight away however long ranking takes. A cached answer is replayed;
+    otherwise each passage goes out as soon as it is resolved.
+    """
+    def event(kind, payload):
+        if fmt == 'sse':
+            return f'event: {kind}\ndata: {json.dumps(payload)}\n\n'
+        return json.dumps(dict(type=kind, **payload)) + '\n'
+    
+    yield event('meta', {"question": question, "timestamp": datetime.now().strftime("%H:%M:%S")})
+    catalog, index = loaded_catalog()
+    for kind, value in current_app.extensions['answers'].iter_answer(catalog, index, question, site_id, language):
+        if kind == 'passage':
+            yield event('passage', {"passage": value})
+        else:
+            answer, _ = value
+    for token in answer_tokens(answer.text):
+        yield event('token', {"text": token})
+    yield event('done', {"answer": answer.text, "language": answer.language,
+                         "audio_url": speech_url(answer)})
+
+def number_arg(name, type_, default=None):
+    value = request.args.get(name)
+    return default if value is None else type_(value)
+
+def nearby_attractions_for(site, site_id, radius_km=None, limit=None):
+    # Sites imported without coordinates keep their hand-curated list
+    if site.get('lat') is None or site.get('lon') is None:
+        return get_catalog().get_nearby(site_id)
+    radius_km = radius_km or current_app.config['NEARBY_RADIUS_KM']
+    limit = limit or current_app.config['NEARBY_LIMIT']
+    return get_catalog().nearest_attractions(site['lat'], site['lon'], radius_km, limit)
+
+def asset_response(asset, cache_control):
+    encoding = choose_encoding(request.accept_encodings, asset.variants)
+    response = Response(asset.variants[encoding] if encoding else asset.body,
+                        content_type=asset.content_type)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = cache_control
+    response.set_etag(f'{asset.digest}-{encoding}' if encoding else asset.digest)
+    return response.make_conditional(request)
+
+@bp.route('/static/<path:filename>')
+def static_asset(filename):
+    # Only fingerprinted names are served, so they can be cached forever
+    asset = current_app.extensions['assets'].lookup(filename)
+    if asset is None:
+        return "Not found", 404
+    return asset_response(asset, 'public, max-age=31536000, immutable')
+
+SERVICE_WORKER = 'js/service_worker.js'
+
+@bp.route('/service-worker.js')
+def service_worker():
+    # Served from the root so it can control every page; browsers must see
+    # updates to it, so it is revalidated instead of cached
+    return asset_response(current_app.extensions['assets'].assets[SERVICE_WORKER], 'no-cache')
+
+# (cache route, endpoint, key) of the pages every device keeps offline
+# (route, endpoint, cache key, served per language)
+PRECACHE_PAGES = [
+    ('home', 'tourism.home', None, False),
+    ('discover', 'tourism.discover', '', True),
+    ('ar_experience', 'tourism.ar_experience', None, False),
+    ('voice_assistant', 'tourism.voice_assistant', None, False),
+    ('offline_mode', 'tourism.offline_mode', None, False),
+]
+
+@bp.route('/precache-manifest.json')
+def precache_manifest():
+    """URLs for the service worker to keep offline, with their revisions.
+    
+    A page's revision is the ETag it is served with, so the worker refetches
+    exactly the entries that changed. Fingerprinted assets need none.
+    """
+    region = request.args.get('region')
+    # The localized pages' revisions depend on the language asked for
+    language = request_language()
+    
+    def render():
+        catalog = get_catalog()
+        limit = current_app.config['PRECACHE_MAX_SITES']
+        if region:
+            if region not in current_app.extensions['packs'].regions(catalog):
+                return jsonify({"error": "Region not found"}), 404
+            site_ids = catalog.site_ids_by_region(region, limit)
+        elif limit:
+            site_ids = [site_id for site_id, _ in catalog.query_sites(limit=limit)[0]]
+        else:
+            site_ids = []
+        entries = [{"url": url_for(endpoint), "revision": page_revision(route, key, language if localized else None)}
+                   for route, endpoint, key, localized in PRECACHE_PAGES]
+        for site_id in site_ids:
+            site_lang = site_language(site_id)
+            entries.append({"url": url_for('tourism.site_detail', site_id=site_id),
+                            "revision": page_revision('site_detail', site_id, site_lang)})
+            entries.append({"url": url_for('tourism.api_site_info', site_id=site_id),
+                            "revision": page_revision('site_info', site_id, site_lang)})
+        for name, asset in sorted(current_app.extensions['assets'].assets.items()):
+            if name != SERVICE_WORKER:
+                entries.append({"url": url_for('tourism.static_asset', filename=asset.hashed_name),
+                                "revision": None})
+        return json.dumps({"version": page_revision('precache_manifest', region, language), "entries": entries})
+    return cached_page('precache_manifest', region, render, mimetype='application/json', language=language)
+
+@bp.route('/')
 def home():
-    return render_template('index.html')
+    return cached_page('home', None, lambda: render_template('index.html'))
 
-@app.route('/discover')
+def discover_page(language):
+    """Run the /discover query in the request args, with the sites in
+    ``language`` where translated; raises ValueError on a bad sort key or
+    cursor."""
+    sort = request.args.get('sort', 'name')
+    parse_sort(sort)
+    cursor = request.args.get('cursor')
+    after = decode_cursor(cursor, sort) if cursor else None
+    filters = {name: request.args.get(name) or None for name in ('location', 'style', 'language')}
+    sites, next_after = get_catalog().query_sites(
+        sort=sort, after=after, limit=current_app.config['DISCOVER_PAGE_SIZE'], **filters)
+    return filters, sort, localized_sites(sites, language), encode_cursor(sort, next_after) if next_after else None
+
+@bp.route('/discover')
 def discover():
-    return render_template('discover.html', sites=SAMPLE_HERITAGE_SITES)
+    language = request_language()
+    
+    def render():
+        try:
+            filters, sort, sites, next_cursor = discover_page(language)
+        except ValueError as e:
+            return str(e), 400
+        return render_template('discover.html', sites=sites, filters=filters, sort=sort,
+                               next_cursor=next_cursor)
+    return cached_page('discover', request.query_string.decode('utf-8'), render, language=language)
 
-@app.route('/site/<site_id>')
-def site_detail(site_id):
-    site = SAMPLE_HERITAGE_SITES.get(site_id)
+@bp.route('/api/discover')
+def api_discover():
+    language = request_language()
+    try:
+        filters, sort, sites, next_cursor = discover_page(language)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return set_content_language(jsonify({
+        "sites": [dict(project(site, DISCOVER_FIELDS), site_id=site_id) for site_id, site in sites],
+        "next_cursor": next_cursor
+    }), language)
+
+def localized_sites(sites, language):
+    """``[(site_id, site), ...]`` in ``language``, for the sites that have a
+    translation into it; the others stay in the original."""
+    if language == DEFAULT_LANGUAGE or not sites:
+        return sites
+    translations = get_catalog().get_translations([site_id for site_id, _ in sites], language)
+    return [(site_id, localize(site, translations.get(site_id))) for site_id, site in sites]
+
+def set_content_language(response, language):
+    # The variant also depends on the session cookie (via request_language)
+    add_vary(response, 'Accept-Language')
+    response.headers['Content-Language'] = LANGUAGE_CODES.get(language, 'en')
+    return response
+
+def localized_site(site_id, language):
+    catalog = get_catalog()
+    site = catalog.get_site(site_id)
+    if site and language != DEFAULT_LANGUAGE:
+        site = localize(site, catalog.get_translation(site_id, language))
+    return site
+
+def render_site_detail(site_id, language):
+    site = localized_site(site_id, language)
     if not site:
         return "Site not found", 404
     
-    nearby = SAMPLE_NEARBY_ATTRACTIONS.get(site_id, [])
-    return render_template('site_detail.html', site=site, site_id=site_id, nearby_attractions=nearby)
+    nearby = nearby_attractions_for(site, site_id)
+    return render_template('site_detail.html', site=site, site_id=site_id, nearby_attractions=nearby,
+                           lang=LANGUAGE_CODES.get(language, 'en'))
+
+def render_site_info(site_id, language):
+    site = localized_site(site_id, language)
+    if not site:
+        return jsonify({"error": "Site not found"}), 404
+    return current_app.json.dumps(site)
+
+def precompute_site_variants(app, limit, loaded=None):
+    """Render the page and JSON of the first ``limit`` sites in every language
+    they have, so the first visitor in each language is served from cache.
+    
+    ``loaded`` renders a catalog that is about to be swapped in instead.
+    """
+    with app.test_request_context():
+        if loaded is not None:
+            g.loaded_catalog = loaded
+        catalog = get_catalog()
+        for site_id, _ in itertools.islice(catalog.items(), limit):
+            for language in [DEFAULT_LANGUAGE] + catalog.translation_languages(site_id):
+                render_page('site_detail', site_id, language, lambda: render_site_detail(site_id, language))
+                render_page('site_info', site_id, language, lambda: render_site_info(site_id, language),
+                            'application/json')
+
+@bp.route('/site/<site_id>')
+def site_detail(site_id):
+    language = site_language(site_id)
+    return cached_page('site_detail', site_id, lambda: render_site_detail(site_id, language),
+                       language=language)
 
-@app.route('/ar_experience')
+@bp.route('/ar_experience')
 def ar_experience():
-    return render_template('ar_experience.html')
+    return cached_page('ar_experience', None, lambda: render_template('ar_experience.html'))
 
-@app.route('/voice_assistant')
+@bp.route('/voice_assistant')
 def voice_assistant():
-    return render_template('voice_assistant.html')
+    return cached_page('voice_assistant', None, lambda: render_template('voice_assistant.html'))
 
-@app.route('/api/site_info/<site_id>')
+@bp.route('/api/site_info/<site_id>')
 def api_site_info(site_id):
-    site = SAMPLE_HERITAGE_SITES.get(site_id)
-    if site:
-        return jsonify(site)
-    return jsonify({"error": "Site not found"}), 404
-
-@app.route('/api/nearby_attractions/<site_id>')
-def api_nearby_attractions(site_id):
-    attractions = SAMPLE_NEARBY_ATTRACTIONS.get(site_id, [])
+    language = site_language(site_id)
+    return cached_page('site_info', site_id, lambda: render_site_info(site_id, language),
+                       mimetype='application/json', language=language)
+
+DISCOVER_FIELDS = ['name', 'location', 'description', 'architectural_style', 'languages']
+
+def project(site, fields):
+    if not fields:
+        return site
+    return {field: site[field] for field in fields if field in site}
+
+def stream_site_batch(site_ids, fields, chunk_size, language):
+    catalog = get_catalog()
+    missing = []
+    yield '{"sites": {'
+    first = True
+    for start in range(0, len(site_ids), chunk_size):
+        chunk = site_ids[start:start + chunk_size]
+        found = dict(localized_sites(list(catalog.get_sites(chunk).items()), language))
+        for site_id in chunk:
+            if site_id not in found:
+                missing.append(site_id)
+                continue
+            yield ('' if first else ', ') + json.dumps(site_id) + ': ' + json.dumps(project(found[site_id], fields))
+            first = False
+    yield '}, "missing": ' + json.dumps(missing) + '}'
+
+@bp.route('/api/site_info_batch', methods=['POST'])
+def api_site_info_batch():
+    data = request.get_json(silent=True) or {}
+    site_ids = data.get('site_ids')
+    fields = data.get('fields')
+    if not isinstance(site_ids, list) or not all(isinstance(s, str) for s in site_ids):
+        return jsonify({"error": "site_ids must be a list of strings"}), 400
+    if fields is not None and (not isinstance(fields, list) or not all(isinstance(f, str) for f in fields)):
+        return jsonify({"error": "fields must be a list of strings"}), 400
+    if len(site_ids) > current_app.config['BATCH_MAX_SITES']:
+        return jsonify({"error": f"at most {current_app.config['BATCH_MAX_SITES']} site_ids per batch"}), 400
+    site_ids = list(dict.fromkeys(site_ids))
+    
+    language = request_language()
+    threshold = current_app.config['BATCH_STREAM_THRESHOLD']
+    if len(site_ids) > threshold:
+        return set_content_language(Response(
+            stream_with_context(stream_site_batch(site_ids, fields, threshold, language)),
+            mimetype='application/json'), language)
+    
+    found = dict(localized_sites(list(get_catalog().get_sites(site_ids).items()), language))
+    return set_content_language(jsonify({
+        "sites": {site_id: project(found[site_id], fields) for site_id in site_ids if site_id in found},
+        "missing": [site_id for site_id in site_ids if site_id not in found]
+    }), language)
+
+@bp.route('/api/nearby_attractions')
+@bp.route('/api/nearby_attractions/<site_id>')
+def api_nearby_attractions(site_id=None):
+    try:
+        lat = number_arg('lat', float)
+        lon = number_arg('lon', float)
+        radius_km = number_arg('radius_km', float, current_app.config['NEARBY_RADIUS_KM'])
+        limit = number_arg('limit', int, current_app.config['NEARBY_LIMIT'])
+    except ValueError:
+        return jsonify({"error": "lat, lon, radius_km and limit must be numbers"}), 400
+    if (lat is None) != (lon is None):
+        return jsonify({"error": "lat and lon must be given together"}), 400
+    if lat is not None and not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({"error": "lat/lon out of range"}), 400
+    if not radius_km > 0 or not 1 <= limit <= current_app.config['NEARBY_MAX_LIMIT']:
+        return jsonify({"error": "radius_km must be positive and limit between 1 and "
+                                 f"{current_app.config['NEARBY_MAX_LIMIT']}"}), 400
+    
+    if lat is None:
+        site = get_catalog().get_site(site_id) if site_id else None
+        if not site:
+            return jsonify([])
+        return jsonify(nearby_attractions_for(site, site_id, radius_km, limit))
+    
+    attractions = get_catalog().nearest_attractions(lat, lon, radius_km, limit)
     return jsonify(attractions)
 
-@app.route('/api/ask_question', methods=['POST'])
+@bp.route('/api/ask_question', methods=['POST'])
 def ask_question():
     data = request.get_json()
     question = data.get('question', '')
     site_id = data.get('site_id', '')
     
-    # Simple AI response simulation
-    responses = {
-        "history": f"Here's more about the history of {SAMPLE_HERITAGE_SITES.get(site_id, {}).get('name', 'this site')}...",
-        "architecture": f"The architectural style is {SAMPLE_HERITAGE_SITES.get(site_id, {}).get('architectural_style', 'unique and historically significant')}.",
-        "construction": "The construction involved skilled artisans and took many years to complete.",
-        "significance": "This site holds great cultural and historical importance for the region.",
-        "visit": "The best time to visit is during morning hours to avoid crowds."
-    }
+    fmt = request.args.get('stream')
+    if fmt is None:
+        mimetype = request.accept_mimetypes.best_match(['application/json'] + list(STREAM_FORMATS.values()))
+        fmt = next((name for name, value in STREAM_FORMATS.items() if value == mimetype), None)
+    elif fmt not in STREAM_FORMATS:
+        return jsonify({"error": f"stream must be one of: {', '.join(STREAM_FORMATS)}"}), 400
+    if fmt:
+        response = Response(stream_with_context(stream_answer(question, site_id, request_language(), fmt)),
+                            mimetype=STREAM_FORMATS[fmt])
+        response.headers['Cache-Control'] = 'no-cache'
+        # Stop proxies such as nginx from buffering the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
     
-    # Simple keyword matching for demo
-    answer = "I'd be happy to tell you more about this heritage site. It represents rich cultural heritage and historical significance."
-    for key, response in responses.items():
-        if key in question.lower():
-            answer = response
-            break
+    answer, hit = answer_question(question, site_id)
     
-    return jsonify({
+    response = jsonify({
         "question": question,
-        "answer": answer,
+        **answer_json(answer),
+        "timestamp": datetime.now().strftime("%H:%M:%S")
+    })
+    response.headers['X-Answer-Cache'] = 'hit' if hit else 'miss'
+    return response
+
+@bp.route('/api/answer_cache')
+def answer_cache():
+    stats = current_app.extensions['answers'].stats()
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+    return jsonify(stats)
+
+@bp.route('/api/voice_query', methods=['POST'])
+def voice_query():
+    """Transcribe an uploaded question and answer it like /api/ask_question.
+    
+    The audio is the raw request body or an ``audio`` form file. Latency of
+    each stage is returned in ``timings`` and as a Server-Timing header.
+    """
+    started = time.perf_counter()
+    if not STT_AVAILABLE:
+        return jsonify({"error": "Speech recognition is not available on this server"}), 503
+    if (request.content_length or 0) > current_app.config['VOICE_MAX_BYTES']:
+        return jsonify({"error": "Audio too large"}), 413
+    upload = request.files.get('audio')
+    data = upload.read() if upload else request.get_data()
+    if not data:
+        return jsonify({"error": "No audio"}), 400
+    site_id = request.args.get('site_id') or request.form.get('site_id', '')
+    language = request_language()
+    
+    try:
+        audio = decode_audio(data)
+    except AudioError as e:
+        return jsonify({"error": str(e)}), 400
+    if len(audio) > current_app.config['VOICE_MAX_SECONDS'] * SAMPLE_RATE:
+        return jsonify({"error": f"Audio longer than {current_app.config['VOICE_MAX_SECONDS']} s"}), 413
+    decoded = time.perf_counter()
+    
+    try:
+        job = current_app.extensions['speech'].transcribe(audio, LANGUAGE_CODES.get(language, 'en'))
+    except TimeoutError as e:
+        return jsonify({"error": str(e)}), 504
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 503
+    transcribed = time.perf_counter()
+    answer, hit = answer_question(job.text, site_id, language)
+    finished = time.perf_counter()
+    
+    timings = {
+        "decode_ms": (decoded - started) * 1000,
+        "queue_ms": job.queue_ms,
+        "stt_ms": job.stt_ms,
+        "answer_ms": (finished - transcribed) * 1000,
+        "total_ms": (finished - started) * 1000,
+    }
+    timings = {name: round(ms, 2) for name, ms in timings.items()}
+    response = jsonify({
+        "transcript": job.text,
+        **answer_json(answer),
+        "batch_size": job.batch_size,
+        "timings": timings,
         "timestamp": datetime.now().strftime("%H:%M:%S")
     })
+    response.headers['Server-Timing'] = ', '.join(
+        f'{name[:-3]};dur={ms}' for name, ms in timings.items())
+    response.headers['X-Answer-Cache'] = 'hit' if hit else 'miss'
+    return response
+
+@bp.route('/api/speech')
+def speech():
+    """Spoken ``text`` as WAV. The URL names the content, so it is cached forever.
+    
+    Only answers are spoken, so clients cannot fill the cache with text of
+    their own.
+    """
+    text = request.args.get('text', '').strip()
+    language = request.args.get('language', 'en')
+    voice = request.args.get('voice', current_app.config['TTS_VOICE'])
+    if not text or len(text) > current_app.config['TTS_MAX_CHARS']:
+        return jsonify({"error": f"text must be 1-{current_app.config['TTS_MAX_CHARS']} characters"}), 400
+    if language not in ESPEAK_VOICES or not VOICE_RE.match(voice):
+        return jsonify({"error": "Unsupported language or voice"}), 400
+    key = audio_key(text, language, voice)
+    if request.if_none_match.contains(key):
+        response = Response(status=304)
+        response.set_etag(key)
+        return response
+    if not is_answer_text(text, language, request.args.get('site')):
+        return jsonify({"error": "text is not an answer"}), 400
+    try:
+        key, audio = current_app.extensions['speech_renderer'].render(text, language, voice)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 503
+    response = Response(audio, mimetype='audio/wav')
+    response.set_etag(key)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    # Audio elements fetch with Range requests
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(audio))
+
+@bp.route('/api/offline/packs')
+def api_offline_packs():
+    regions = current_app.extensions['packs'].regions(get_catalog())
+    return jsonify({"packs": [
+        {"region": region, "sites": count,
+         "manifest": url_for('tourism.api_offline_pack', region=region),
+         "diff": url_for('tourism.api_offline_pack_diff', region=region)}
+        for region, count in sorted(regions.items())
+    ]})
+
+def pack_not_ready():
+    response = jsonify({"error": "Pack is being built"})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(current_app.config['OFFLINE_RETRY_AFTER'])
+    return response
+
+@bp.route('/api/offline/packs/<region>')
+def api_offline_pack(region):
+    builder = current_app.extensions['packs']
+    catalog = get_catalog()
+    if region not in builder.regions(catalog):
+        return jsonify({"error": "Region not found"}), 404
+    manifest = builder.current(catalog, region)
+    if manifest is None:
+        return pack_not_ready()
+    url = url_for('tourism.offline_pack_archive', region=region, version=manifest['version'])
+    return jsonify(dict(manifest, url=url))
+
+@bp.route('/api/offline/packs/<region>/diff')
+def api_offline_pack_diff(region):
+    builder = current_app.extensions['packs']
+    catalog = get_catalog()
+    if region not in builder.regions(catalog):
+        return jsonify({"error": "Region not found"}), 404
+    diff = builder.diff(catalog, region, request.args.get('from'))
+    if diff is None:
+        return pack_not_ready()
+    url = url_for('tourism.offline_pack_archive', region=region, version=diff['to'])
+    return jsonify(dict(diff, url=url))
+
+@bp.route('/api/offline/packs/<region>/<version>.zip')
+def offline_pack_archive(region, version):
+    builder = current_app.extensions['packs']
+    path = builder.archive_path(region, version)
+    if not re.fullmatch(r'[0-9a-f]{16}', version) or not os.path.exists(path):
+        return "Pack not found", 404
+    download_id = request.args.get('download_id')
+    if download_id is not None and not DOWNLOAD_ID_RE.match(download_id):
+        return jsonify({"error": "Invalid download_id"}), 400
+    
+    # conditional=True handles Range/If-Range, so clients fetch and resume
+    # the archive chunk by chunk
+    response = send_file(os.path.abspath(path), mimetype='application/zip', conditional=True,
+                         etag=version, download_name=f'{region}-{version}.zip')
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    if download_id:
+        response.response = current_app.extensions['download_progress'].counting(
+            download_id, response.response)
+    return response
+
+@bp.route('/api/offline/progress/<download_id>')
+def api_offline_progress(download_id):
+    if not DOWNLOAD_ID_RE.match(download_id):
+        return jsonify({"error": "Invalid download_id"}), 400
+    return jsonify({
+        "download_id": download_id,
+        "bytes_sent": current_app.extensions['download_progress'].bytes_sent(download_id)
+    })
+
+@bp.route('/api/ar')
+def api_ar_sites():
+    catalog = get_catalog()
+    sites = []
+    for site_id in current_app.extensions['ar_assets'].site_ids():
+        site = catalog.get_site(site_id)
+        if site is not None:
+            sites.append({"site_id": site_id, "name": site['name'],
+                          "manifest": url_for('tourism.api_ar_manifest', site_id=site_id)})
+    return jsonify({"sites": sites})
+
+@bp.route('/api/ar/<site_id>')
+def api_ar_manifest(site_id):
+    """A site's models, coarsest first; clients show each level as it arrives."""
+    if get_catalog().get_site(site_id) is None:
+        return jsonify({"error": "Site not found"}), 404
+    levels = [{"level": entry['level'], "size": entry['size'], "sha256": entry['sha256'],
+               "url": url_for('tourism.ar_model', site_id=site_id, level=entry['level'],
+                              version=entry['sha256'][:16])}
+              for entry in current_app.extensions['ar_assets'].levels(site_id)]
+    if not levels:
+        return jsonify({"error": "No AR model for this site"}), 404
+    response = jsonify({"site_id": site_id, "levels": levels})
+    # Start fetching the coarse model while the manifest is still being parsed
+    response.headers['Link'] = f'<{levels[0]["url"]}>; rel=preload; as=fetch; crossorigin'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(hashlib.sha1(json.dumps(levels).encode('utf-8')).hexdigest())
+    return response.make_conditional(request)
+
+@bp.route('/api/ar/<site_id>/lod<int:level>-<version>.glb')
+def ar_model(site_id, level, version):
+    entry = current_app.extensions['ar_assets'].level(site_id, level)
+    if entry is None or entry['sha256'][:16] != version:
+        return "Model not found", 404
+    if request.if_none_match.contains(version):
+        response = Response(status=304)
+        response.set_etag(version)
+        return response
+    body = MappedFile(entry['path'], current_app.config['AR_CHUNK_SIZE'])
+    response = Response(body, mimetype='model/gltf-binary', direct_passthrough=True)
+    response.content_length = body.size
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    # Range requests let clients resume a large level or fetch it in parts
+    return response.make_conditional(request, accept_ranges=True, complete_length=body.size)
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    return Response(current_app.extensions['metrics'].render(), content_type=metrics.CONTENT_TYPE)
+
+@bp.route('/api/profiles')
+def api_profiles():
+    if not profiling.authorized(current_app.config['PROFILE_TOKEN']):
+        return jsonify({"error": "Forbidden"}), 403
+    directory = current_app.config['PROFILE_DIR']
+    names = sorted(os.listdir(directory), reverse=True) if os.path.isdir(directory) else []
+    return jsonify({"profiles": [
+        {"id": name, "url": url_for('tourism.api_profile', profile_id=name)}
+        for name in names if PROFILE_ID_RE.match(name)
+    ]})
+
+@bp.route('/api/profiles/<profile_id>')
+def api_profile(profile_id):
+    if not profiling.authorized(current_app.config['PROFILE_TOKEN']):
+        return jsonify({"error": "Forbidden"}), 403
+    path = os.path.join(current_app.config['PROFILE_DIR'], profile_id)
+    if not PROFILE_ID_RE.match(profile_id) or not os.path.exists(path):
+        return "Profile not found", 404
+    return send_file(os.path.abspath(path), mimetype='application/octet-stream',
+                     as_attachment=True, download_name=profile_id)
 
-@app.route('/api/change_language', methods=['POST'])
+def admin_authorized():
+    token = current_app.config['ADMIN_TOKEN']
+    given = request.headers.get('X-Admin-Token', '')
+    return bool(token) and secrets.compare_digest(given.encode(), token.encode())
+
+@bp.route('/api/catalog/reload', methods=['GET', 'POST'])
+def reload_catalog():
+    """POST loads the catalog again in the background and swaps it in when
+    ready; GET reports on the catalog being served and any load under way."""
+    if not admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    reloader = current_app.extensions['catalog_reloader']
+    if request.method == 'GET':
+        return jsonify(reloader.status())
+    started = reloader.reload()
+    return jsonify(dict(reloader.status(), started=started)), 202
+
+@bp.route('/api/change_language', methods=['POST'])
 def change_language():
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     language = data.get('language', 'English')
+    # Pages, caches and speech are keyed by the language, so only known ones
+    if language not in LANGUAGE_CODES:
+        return jsonify({"error": "Unsupported language"}), 400
     session['language'] = language
+    session.permanent = True
     return jsonify({"message": f"Language changed to {language}", "language": language})
 
-@app.route('/offline_mode')
+@bp.route('/offline_mode')
 def offline_mode():
-    return render_template('offline_mode.html')
-
-if __name__ == '__main__':
-    # Create templates directory if it doesn't exist
-    os.makedirs('templates', exist_ok=True)
-    
-    # Create all HTML templates
-    create_templates()
-    
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    return cached_page('offline_mode', None, lambda: render_template('offline_mode.html'))
 
-def create_templates():
-    templates = {
-        'index.html': '''
+TEMPLATES = {
+    'index.html': '''
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Smart Cultural Tourism Assistant</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-        }
-        
-        .container {
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 20px;
-        }
-        
-        header {
-            background: rgba(255, 255, 255, 0.95);
-            padding: 1rem 0;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            border-radius: 10px;
-            margin-bottom: 2rem;
-        }
-        
-        nav {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding: 0 2rem;
-        }
-        
-        .logo {
-            font-size: 1.8rem;
-            font-weight: bold;
-            color: #4a5568;
-        }
-        
-        .nav-links {
-            display: flex;
-            gap: 2rem;
-        }
-        
-        .nav-links a {
-            text-decoration: none;
-            color: #4a5568;
-            font-weight: 500;
-            transition: color 0.3s;
-        }
-        
-        .nav-links a:hover {
-            color: #667eea;
-        }
-        
-        .hero {
-            text-align: center;
-            padding: 4rem 2rem;
-            background: rgba(255, 255, 255, 0.95);
-            border-radius: 15px;
-            margin-bottom: 2rem;
-            box-shadow: 0 10px 30px rgba(0,0,0,0.1);
-        }
-        
-        .hero h1 {
-            font-size: 3rem;
-            margin-bottom: 1rem;
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-        }
-        
-        .hero p {
-            font-size: 1.2rem;
-            color: #666;
-            margin-bottom: 2rem;
-        }
-        
-        .btn {
-            display: inline-block;
-            padding: 12px 30px;
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            color: white;
-            text-decoration: none;
-            border-radius: 25px;
-            font-weight: 600;
-            transition: transform 0.3s, box-shadow 0.3s;
-            border: none;
-            cursor: pointer;
-        }
-        
-        .btn:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 5px 15px rgba(0,0,0,0.2);
-        }
-        
-        .features {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-            gap: 2rem;
-            margin: 3rem 0;
-        }
-        
-        .feature-card {
-            background: rgba(255, 255, 255, 0.95);
-            padding: 2rem;
-            border-radius: 15px;
-            text-align: center;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-            transition: transform 0.3s;
-        }
-        
-        .feature-card:hover {
-            transform: translateY(-5px);
-        }
-        
-        .feature-icon {
-            font-size: 3rem;
-            margin-bottom: 1rem;
-            color: #667eea;
-        }
-        
-        .feature-card h3 {
-            margin-bottom: 1rem;
-            color: #4a5568;
-        }
-        
-        footer {
-            text-align: center;
-            padding: 2rem;
-            color: white;
-            margin-top: 3rem;
-        }
-        
-        @media (max-width: 768px) {
-            .nav-links {
-                flex-direction: column;
-                gap: 1rem;
-            }
-            
-            .hero h1 {
-                font-size: 2rem;
-            }
-        }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('css/common.css') }}">
+    <link rel="stylesheet" href="{{ asset_url('css/index.css') }}">
 </head>
 <body>
     <header>
@@ -363,168 +1108,17 @@ def create_templates():
     </footer>
 </body>
 </html>
-        ''',
+    ''',
         
-        'discover.html': '''
+    'discover.html': '''
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Discover Heritage Sites</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-        }
-        
-        .container {
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 20px;
-        }
-        
-        header {
-            background: rgba(255, 255, 255, 0.95);
-            padding: 1rem 0;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            border-radius: 10px;
-            margin-bottom: 2rem;
-        }
-        
-        nav {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding: 0 2rem;
-        }
-        
-        .logo {
-            font-size: 1.8rem;
-            font-weight: bold;
-            color: #4a5568;
-        }
-        
-        .nav-links {
-            display: flex;
-            gap: 2rem;
-        }
-        
-        .nav-links a {
-            text-decoration: none;
-            color: #4a5568;
-            font-weight: 500;
-            transition: color 0.3s;
-        }
-        
-        .nav-links a:hover {
-            color: #667eea;
-        }
-        
-        .page-header {
-            text-align: center;
-            color: white;
-            margin-bottom: 3rem;
-        }
-        
-        .page-header h1 {
-            font-size: 2.5rem;
-            margin-bottom: 1rem;
-        }
-        
-        .sites-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(350px, 1fr));
-            gap: 2rem;
-            margin-bottom: 3rem;
-        }
-        
-        .site-card {
-            background: rgba(255, 255, 255, 0.95);
-            border-radius: 15px;
-            overflow: hidden;
-            box-shadow: 0 10px 30px rgba(0,0,0,0.1);
-            transition: transform 0.3s;
-        }
-        
-        .site-card:hover {
-            transform: translateY(-5px);
-        }
-        
-        .site-image {
-            height: 200px;
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            color: white;
-            font-size: 4rem;
-        }
-        
-        .site-content {
-            padding: 1.5rem;
-        }
-        
-        .site-content h3 {
-            color: #4a5568;
-            margin-bottom: 0.5rem;
-        }
-        
-        .site-location {
-            color: #667eea;
-            font-weight: 600;
-            margin-bottom: 1rem;
-        }
-        
-        .site-description {
-            color: #666;
-            margin-bottom: 1rem;
-        }
-        
-        .btn {
-            display: inline-block;
-            padding: 10px 20px;
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            color: white;
-            text-decoration: none;
-            border-radius: 20px;
-            font-weight: 600;
-            transition: transform 0.3s;
-            border: none;
-            cursor: pointer;
-        }
-        
-        .btn:hover {
-            transform: translateY(-2px);
-        }
-        
-        footer {
-            text-align: center;
-            padding: 2rem;
-            color: white;
-            margin-top: 3rem;
-        }
-        
-        @media (max-width: 768px) {
-            .nav-links {
-                flex-direction: column;
-                gap: 1rem;
-            }
-            
-            .sites-grid {
-                grid-template-columns: 1fr;
-            }
-        }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('css/common.css') }}">
+    <link rel="stylesheet" href="{{ asset_url('css/discover.css') }}">
 </head>
 <body>
     <header>
@@ -546,8 +1140,20 @@ def create_templates():
             <p>Explore amazing heritage sites from around the world</p>
         </div>
 
-        <div class="sites-grid">
-            {% for site_id, site in sites.items() %}
+        <form class="filters" method="get" action="/discover">
+            <input type="text" name="location" placeholder="Location" value="{{ filters.location or '' }}">
+            <input type="text" name="style" placeholder="Architectural style" value="{{ filters.style or '' }}">
+            <input type="text" name="language" placeholder="Language" value="{{ filters.language or '' }}">
+            <select name="sort">
+                {% for value, label in [('name', 'Name A-Z'), ('-name', 'Name Z-A'), ('location', 'Location'), ('style', 'Style')] %}
+                <option value="{{ value }}"{% if sort == value %} selected{% endif %}>{{ label }}</option>
+                {% endfor %}
+            </select>
+            <button type="submit" class="btn">Filter</button>
+        </form>
+
+        <div class="sites-grid" id="sitesGrid">
+            {% for site_id, site in sites %}
             <div class="site-card">
                 <div class="site-image">
                     {{ site.name[0] }}{{ site.name.split()[-1][0] if site.name.split()|length > 1 else site.name[1] }}
@@ -561,245 +1167,32 @@ def create_templates():
             </div>
             {% endfor %}
         </div>
+
+        <div class="load-more" id="loadMore"{% if not next_cursor %} hidden{% endif %}>
+            <button class="btn" data-cursor="{{ next_cursor or '' }}" onclick="loadMore()">Load more</button>
+        </div>
     </div>
 
+    <script src="{{ asset_url('js/discover.js') }}"></script>
+
     <footer>
         <p>&copy; 2024 Smart Cultural Tourism Assistant. All rights reserved.</p>
     </footer>
 </body>
 </html>
-        ''',
+    ''',
         
-        'site_detail.html': '''
+    'site_detail.html': '''
 <!DOCTYPE html>
-<html lang="en">
+<html lang="{{ lang }}">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{{ site.name }} - Cultural Explorer</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-        }
-        
-        .container {
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 20px;
-        }
-        
-        header {
-            background: rgba(255, 255, 255, 0.95);
-            padding: 1rem 0;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            border-radius: 10px;
-            margin-bottom: 2rem;
-        }
-        
-        nav {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding: 0 2rem;
-        }
-        
-        .logo {
-            font-size: 1.8rem;
-            font-weight: bold;
-            color: #4a5568;
-        }
-        
-        .nav-links {
-            display: flex;
-            gap: 2rem;
-        }
-        
-        .nav-links a {
-            text-decoration: none;
-            color: #4a5568;
-            font-weight: 500;
-            transition: color 0.3s;
-        }
-        
-        .nav-links a:hover {
-            color: #667eea;
-        }
-        
-        .site-header {
-            background: rgba(255, 255, 255, 0.95);
-            padding: 2rem;
-            border-radius: 15px;
-            margin-bottom: 2rem;
-            text-align: center;
-        }
-        
-        .site-header h1 {
-            color: #4a5568;
-            font-size: 2.5rem;
-            margin-bottom: 0.5rem;
-        }
-        
-        .site-location {
-            color: #667eea;
-            font-size: 1.2rem;
-            font-weight: 600;
-        }
-        
-        .content-grid {
-            display: grid;
-            grid-template-columns: 2fr 1fr;
-            gap: 2rem;
-            margin-bottom: 2rem;
-        }
-        
-        .main-content {
-            background: rgba(255, 255, 255, 0.95);
-            padding: 2rem;
-            border-radius: 15px;
-        }
-        
-        .sidebar {
-            background: rgba(255, 255, 255, 0.95);
-            padding: 2rem;
-            border-radius: 15px;
-        }
-        
-        .section {
-            margin-bottom: 2rem;
-        }
-        
-        .section h2 {
-            color: #4a5568;
-            margin-bottom: 1rem;
-            border-bottom: 2px solid #667eea;
-            padding-bottom: 0.5rem;
-        }
-        
-        .fun-facts {
-            list-style: none;
-        }
-        
-        .fun-facts li {
-            background: #f7fafc;
-            padding: 1rem;
-            margin-bottom: 0.5rem;
-            border-left: 4px solid #667eea;
-            border-radius: 5px;
-        }
-        
-        .attraction-card {
-            background: #f7fafc;
-            padding: 1rem;
-            margin-bottom: 1rem;
-            border-radius: 10px;
-            border-left: 4px solid #764ba2;
-        }
-        
-        .attraction-name {
-            font-weight: 600;
-            color: #4a5568;
-        }
-        
-        .attraction-type {
-            color: #667eea;
-            font-size: 0.9rem;
-        }
-        
-        .attraction-distance {
-            color: #666;
-            font-size: 0.9rem;
-        }
-        
-        .ai-assistant {
-            background: rgba(255, 255, 255, 0.95);
-            padding: 2rem;
-            border-radius: 15px;
-            margin-bottom: 2rem;
-        }
-        
-        .chat-container {
-            max-height: 300px;
-            overflow-y: auto;
-            margin-bottom: 1rem;
-            padding: 1rem;
-            background: #f7fafc;
-            border-radius: 10px;
-        }
-        
-        .message {
-            margin-bottom: 1rem;
-            padding: 0.5rem 1rem;
-            border-radius: 10px;
-        }
-        
-        .user-message {
-            background: #667eea;
-            color: white;
-            margin-left: 2rem;
-        }
-        
-        .ai-message {
-            background: #e2e8f0;
-            margin-right: 2rem;
-        }
-        
-        .chat-input {
-            display: flex;
-            gap: 1rem;
-        }
-        
-        .chat-input input {
-            flex: 1;
-            padding: 0.5rem 1rem;
-            border: 1px solid #cbd5e0;
-            border-radius: 20px;
-            outline: none;
-        }
-        
-        .btn {
-            padding: 10px 20px;
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            color: white;
-            border: none;
-            border-radius: 20px;
-            font-weight: 600;
-            cursor: pointer;
-            transition: transform 0.3s;
-        }
-        
-        .btn:hover {
-            transform: translateY(-2px);
-        }
-        
-        footer {
-            text-align: center;
-            padding: 2rem;
-            color: white;
-        }
-        
-        @media (max-width: 768px) {
-            .nav-links {
-                flex-direction: column;
-                gap: 1rem;
-            }
-            
-            .content-grid {
-                grid-template-columns: 1fr;
-            }
-        }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('css/common.css') }}">
+    <link rel="stylesheet" href="{{ asset_url('css/site_detail.css') }}">
 </head>
-<body>
+<body data-site-id="{{ site_id }}">
     <header>
         <nav>
             <div class="logo">🌍 Cultural Explorer</div>
@@ -892,256 +1285,20 @@ def create_templates():
         <p>&copy; 2024 Smart Cultural Tourism Assistant. All rights reserved.</p>
     </footer>
 
-    <script>
-        function askQuestion() {
-            const input = document.getElementById('questionInput');
-            const question = input.value.trim();
-            const chatContainer = document.getElementById('chatContainer');
-            
-            if (!question) return;
-            
-            // Add user message
-            const userMessage = document.createElement('div');
-            userMessage.className = 'message user-message';
-            userMessage.textContent = question;
-            chatContainer.appendChild(userMessage);
-            
-            // Clear input
-            input.value = '';
-            
-            // Show loading
-            const loadingMessage = document.createElement('div');
-            loadingMessage.className = 'message ai-message';
-            loadingMessage.textContent = 'Thinking...';
-            chatContainer.appendChild(loadingMessage);
-            
-            // Scroll to bottom
-            chatContainer.scrollTop = chatContainer.scrollHeight;
-            
-            // Send request to backend
-            fetch('/api/ask_question', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    question: question,
-                    site_id: '{{ site_id }}'
-                })
-            })
-            .then(response => response.json())
-            .then(data => {
-                // Remove loading message
-                chatContainer.removeChild(loadingMessage);
-                
-                // Add AI response
-                const aiMessage = document.createElement('div');
-                aiMessage.className = 'message ai-message';
-                aiMessage.innerHTML = `<strong>Answer:</strong> ${data.answer}<br><small>${data.timestamp}</small>`;
-                chatContainer.appendChild(aiMessage);
-                
-                // Scroll to bottom
-                chatContainer.scrollTop = chatContainer.scrollHeight;
-            })
-            .catch(error => {
-                console.error('Error:', error);
-                chatContainer.removeChild(loadingMessage);
-                
-                const errorMessage = document.createElement('div');
-                errorMessage.className = 'message ai-message';
-                errorMessage.textContent = 'Sorry, I encountered an error. Please try again.';
-                chatContainer.appendChild(errorMessage);
-            });
-        }
-        
-        // Allow pressing Enter to send message
-        document.getElementById('questionInput').addEventListener('keypress', function(e) {
-            if (e.key === 'Enter') {
-                askQuestion();
-            }
-        });
-    </script>
+    <script src="{{ asset_url('js/site_detail.js') }}"></script>
 </body>
 </html>
-        ''',
+    ''',
         
-        'ar_experience.html': '''
+    'ar_experience.html': '''
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>AR Experience - Cultural Explorer</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-        }
-        
-        .container {
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 20px;
-        }
-        
-        header {
-            background: rgba(255, 255, 255, 0.95);
-            padding: 1rem 0;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            border-radius: 10px;
-            margin-bottom: 2rem;
-        }
-        
-        nav {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding: 0 2rem;
-        }
-        
-        .logo {
-            font-size: 1.8rem;
-            font-weight: bold;
-            color: #4a5568;
-        }
-        
-        .nav-links {
-            display: flex;
-            gap: 2rem;
-        }
-        
-        .nav-links a {
-            text-decoration: none;
-            color: #4a5568;
-            font-weight: 500;
-            transition: color 0.3s;
-        }
-        
-        .nav-links a:hover {
-            color: #667eea;
-        }
-        
-        .page-header {
-            text-align: center;
-            color: white;
-            margin-bottom: 3rem;
-        }
-        
-        .page-header h1 {
-            font-size: 2.5rem;
-            margin-bottom: 1rem;
-        }
-        
-        .ar-container {
-            background: rgba(255, 255, 255, 0.95);
-            padding: 2rem;
-            border-radius: 15px;
-            margin-bottom: 2rem;
-            text-align: center;
-        }
-        
-        .ar-view {
-            width: 100%;
-            height: 400px;
-            background: linear-gradient(135deg, #e2e8f0, #cbd5e0);
-            border-radius: 10px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            margin-bottom: 2rem;
-            position: relative;
-            overflow: hidden;
-        }
-        
-        .ar-overlay {
-            position: absolute;
-            top: 0;
-            left: 0;
-            right: 0;
-            bottom: 0;
-            background: rgba(0,0,0,0.1);
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            flex-direction: column;
-            color: white;
-        }
-        
-        .ar-controls {
-            display: flex;
-            gap: 1rem;
-            justify-content: center;
-            margin-bottom: 2rem;
-        }
-        
-        .btn {
-            padding: 12px 24px;
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            color: white;
-            border: none;
-            border-radius: 25px;
-            font-weight: 600;
-            cursor: pointer;
-            transition: transform 0.3s;
-        }
-        
-        .btn:hover {
-            transform: translateY(-2px);
-        }
-        
-        .btn-outline {
-            background: transparent;
-            border: 2px solid #667eea;
-            color: #667eea;
-        }
-        
-        .features-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-            gap: 2rem;
-            margin: 3rem 0;
-        }
-        
-        .feature-card {
-            background: rgba(255, 255, 255, 0.95);
-            padding: 2rem;
-            border-radius: 15px;
-            text-align: center;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        }
-        
-        .feature-icon {
-            font-size: 3rem;
-            margin-bottom: 1rem;
-        }
-        
-        footer {
-            text-align: center;
-            padding: 2rem;
-            color: white;
-        }
-        
-        @media (max-width: 768px) {
-            .nav-links {
-                flex-direction: column;
-                gap: 1rem;
-            }
-            
-            .ar-controls {
-                flex-direction: column;
-                align-items: center;
-            }
-        }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('css/common.css') }}">
+    <link rel="stylesheet" href="{{ asset_url('css/ar_experience.css') }}">
 </head>
 <body>
     <header>
@@ -1165,7 +1322,9 @@ def create_templates():
 
         <div class="ar-container">
             <div class="ar-view">
-                <div class="ar-overlay">
+                <video id="arCamera" playsinline muted></video>
+                <canvas id="arCanvas"></canvas>
+                <div class="ar-overlay" id="arOverlay">
                     <div style="font-size: 4rem; margin-bottom: 1rem;">📱</div>
                     <h2 style="color: #333; margin-bottom: 1rem;">AR View</h2>
                     <p style="color: #666; text-align: center; max-width: 500px;">
@@ -1175,10 +1334,12 @@ def create_templates():
             </div>
             
             <div class="ar-controls">
+                <select id="arSite" class="ar-site" onchange="loadModel(this.value)"></select>
                 <button class="btn" onclick="startAR()">Start AR Camera</button>
                 <button class="btn btn-outline" onclick="startDemo()">Demo Mode</button>
                 <button class="btn btn-outline" onclick="showInfo()">Show Information</button>
             </div>
+            <p id="arStatus" class="ar-status"></p>
             
             <div id="arInfo" style="display: none;">
                 <h3>Historical Reconstruction</h3>
@@ -1217,243 +1378,20 @@ def create_templates():
         <p>&copy; 2024 Smart Cultural Tourism Assistant. All rights reserved.</p>
     </footer>
 
-    <script>
-        function startAR() {
-            alert('AR Camera would start here. In a real app, this would access your device camera and overlay AR content.');
-        }
-        
-        function startDemo() {
-            alert('Starting AR Demo Mode. Showing sample reconstructions and information overlays.');
-            document.getElementById('arInfo').style.display = 'block';
-        }
-        
-        function showInfo() {
-            const infoDiv = document.getElementById('arInfo');
-            infoDiv.style.display = infoDiv.style.display === 'none' ? 'block' : 'none';
-        }
-    </script>
+    <script src="{{ asset_url('js/ar_experience.js') }}"></script>
 </body>
 </html>
-        ''',
+    ''',
         
-        'voice_assistant.html': '''
+    'voice_assistant.html': '''
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Voice Assistant - Cultural Explorer</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-        }
-        
-        .container {
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 20px;
-        }
-        
-        header {
-            background: rgba(255, 255, 255, 0.95);
-            padding: 1rem 0;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            border-radius: 10px;
-            margin-bottom: 2rem;
-        }
-        
-        nav {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding: 0 2rem;
-        }
-        
-        .logo {
-            font-size: 1.8rem;
-            font-weight: bold;
-            color: #4a5568;
-        }
-        
-        .nav-links {
-            display: flex;
-            gap: 2rem;
-        }
-        
-        .nav-links a {
-            text-decoration: none;
-            color: #4a5568;
-            font-weight: 500;
-            transition: color 0.3s;
-        }
-        
-        .nav-links a:hover {
-            color: #667eea;
-        }
-        
-        .page-header {
-            text-align: center;
-            color: white;
-            margin-bottom: 3rem;
-        }
-        
-        .page-header h1 {
-            font-size: 2.5rem;
-            margin-bottom: 1rem;
-        }
-        
-        .assistant-container {
-            background: rgba(255, 255, 255, 0.95);
-            padding: 2rem;
-            border-radius: 15px;
-            margin-bottom: 2rem;
-        }
-        
-        .voice-interface {
-            text-align: center;
-            margin-bottom: 2rem;
-        }
-        
-        .voice-circle {
-            width: 150px;
-            height: 150px;
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            border-radius: 50%;
-            margin: 0 auto 2rem;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            cursor: pointer;
-            transition: transform 0.3s;
-            position: relative;
-        }
-        
-        .voice-circle:hover {
-            transform: scale(1.05);
-        }
-        
-        .voice-circle.listening {
-            animation: pulse 1.5s infinite;
-        }
-        
-        @keyframes pulse {
-            0% { transform: scale(1); }
-            50% { transform: scale(1.1); }
-            100% { transform: scale(1); }
-        }
-        
-        .voice-icon {
-            font-size: 3rem;
-            color: white;
-        }
-        
-        .chat-container {
-            max-height: 300px;
-            overflow-y: auto;
-            margin-bottom: 2rem;
-            padding: 1rem;
-            background: #f7fafc;
-            border-radius: 10px;
-        }
-        
-        .message {
-            margin-bottom: 1rem;
-            padding: 1rem;
-            border-radius: 10px;
-            max-width: 80%;
-        }
-        
-        .user-message {
-            background: #667eea;
-            color: white;
-            margin-left: auto;
-            text-align: right;
-        }
-        
-        .ai-message {
-            background: #e2e8f0;
-            margin-right: auto;
-        }
-        
-        .language-selector {
-            text-align: center;
-            margin-bottom: 2rem;
-        }
-        
-        .language-buttons {
-            display: flex;
-            justify-content: center;
-            gap: 1rem;
-            flex-wrap: wrap;
-            margin-top: 1rem;
-        }
-        
-        .lang-btn {
-            padding: 8px 16px;
-            background: #e2e8f0;
-            border: none;
-            border-radius: 15px;
-            cursor: pointer;
-            transition: background 0.3s;
-        }
-        
-        .lang-btn.active {
-            background: #667eea;
-            color: white;
-        }
-        
-        .suggested-questions {
-            margin-top: 2rem;
-        }
-        
-        .suggestions {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 1rem;
-            margin-top: 1rem;
-        }
-        
-        .suggestion-card {
-            background: #f7fafc;
-            padding: 1rem;
-            border-radius: 10px;
-            text-align: center;
-            cursor: pointer;
-            transition: background 0.3s;
-        }
-        
-        .suggestion-card:hover {
-            background: #e2e8f0;
-        }
-        
-        footer {
-            text-align: center;
-            padding: 2rem;
-            color: white;
-        }
-        
-        @media (max-width: 768px) {
-            .nav-links {
-                flex-direction: column;
-                gap: 1rem;
-            }
-            
-            .language-buttons {
-                flex-direction: column;
-                align-items: center;
-            }
-        }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('css/common.css') }}">
+    <link rel="stylesheet" href="{{ asset_url('css/voice_assistant.css') }}">
 </head>
 <body>
     <header>
@@ -1524,313 +1462,20 @@ def create_templates():
         <p>&copy; 2024 Smart Cultural Tourism Assistant. All rights reserved.</p>
     </footer>
 
-    <script>
-        let isListening = false;
-        let currentLanguage = 'English';
-        
-        function toggleListening() {
-            const voiceCircle = document.getElementById('voiceCircle');
-            const statusText = document.getElementById('statusText');
-            
-            if (!isListening) {
-                // Start listening
-                isListening = true;
-                voiceCircle.classList.add('listening');
-                statusText.textContent = 'Listening... Speak now';
-                
-                // Simulate voice recognition
-                setTimeout(() => {
-                    const questions = [
-                        "Tell me about the history of this place",
-                        "What is the architectural style?",
-                        "How old is this structure?",
-                        "Who built this monument?",
-                        "What is the cultural significance?"
-                    ];
-                    const randomQuestion = questions[Math.floor(Math.random() * questions.length)];
-                    processVoiceInput(randomQuestion);
-                }, 2000);
-                
-            } else {
-                // Stop listening
-                isListening = false;
-                voiceCircle.classList.remove('listening');
-                statusText.textContent = 'Click the microphone to start speaking';
-            }
-        }
-        
-        function processVoiceInput(question) {
-            const chatContainer = document.getElementById('chatContainer');
-            
-            // Add user message
-            const userMessage = document.createElement('div');
-            userMessage.className = 'message user-message';
-            userMessage.textContent = question;
-            chatContainer.appendChild(userMessage);
-            
-            // Show AI response
-            setTimeout(() => {
-                const responses = {
-                    "history": "This site has a rich history dating back centuries. It was constructed during a significant period and has witnessed many historical events.",
-                    "architecture": "The architecture represents a unique blend of styles from different eras, showcasing excellent craftsmanship and cultural influences.",
-                    "construction": "It took many years and skilled artisans to construct this magnificent structure using traditional techniques and materials.",
-                    "significance": "This site holds immense cultural and historical importance, representing the heritage and traditions of the region."
-                };
-                
-                let answer = "This is a culturally significant site with amazing historical value and architectural beauty.";
-                for (const [key, response] of Object.entries(responses)) {
-                    if (question.toLowerCase().includes(key)) {
-                        answer = response;
-                        break;
-                    }
-                }
-                
-                const aiMessage = document.createElement('div');
-                aiMessage.className = 'message ai-message';
-                aiMessage.innerHTML = `<strong>Assistant:</strong> ${answer}`;
-                chatContainer.appendChild(aiMessage);
-                
-                // Stop listening
-                isListening = false;
-                document.getElementById('voiceCircle').classList.remove('listening');
-                document.getElementById('statusText').textContent = 'Click the microphone to start speaking';
-                
-                // Scroll to bottom
-                chatContainer.scrollTop = chatContainer.scrollHeight;
-            }, 1000);
-            
-            // Scroll to bottom
-            chatContainer.scrollTop = chatContainer.scrollHeight;
-        }
-        
-        function changeLanguage(language) {
-            currentLanguage = language;
-            
-            // Update active button
-            document.querySelectorAll('.lang-btn').forEach(btn => {
-                btn.classList.remove('active');
-                if (btn.textContent === language) {
-                    btn.classList.add('active');
-                }
-            });
-            
-            // Show confirmation
-            const chatContainer = document.getElementById('chatContainer');
-            const message = document.createElement('div');
-            message.className = 'message ai-message';
-            message.textContent = `Language changed to ${language}. You can now speak in ${language}.`;
-            chatContainer.appendChild(message);
-            
-            // Send to backend
-            fetch('/api/change_language', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ language: language })
-            });
-            
-            // Scroll to bottom
-            chatContainer.scrollTop = chatContainer.scrollHeight;
-        }
-        
-        function askQuestion(question) {
-            processVoiceInput(question);
-        }
-    </script>
+    <script src="{{ asset_url('js/voice_assistant.js') }}"></script>
 </body>
 </html>
-        ''',
+    ''',
         
-        'offline_mode.html': '''
+    'offline_mode.html': '''
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Offline Mode - Cultural Explorer</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-        }
-        
-        .container {
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 20px;
-        }
-        
-        header {
-            background: rgba(255, 255, 255, 0.95);
-            padding: 1rem 0;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            border-radius: 10px;
-            margin-bottom: 2rem;
-        }
-        
-        nav {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding: 0 2rem;
-        }
-        
-        .logo {
-            font-size: 1.8rem;
-            font-weight: bold;
-            color: #4a5568;
-        }
-        
-        .nav-links {
-            display: flex;
-            gap: 2rem;
-        }
-        
-        .nav-links a {
-            text-decoration: none;
-            color: #4a5568;
-            font-weight: 500;
-            transition: color 0.3s;
-        }
-        
-        .nav-links a:hover {
-            color: #667eea;
-        }
-        
-        .page-header {
-            text-align: center;
-            color: white;
-            margin-bottom: 3rem;
-        }
-        
-        .page-header h1 {
-            font-size: 2.5rem;
-            margin-bottom: 1rem;
-        }
-        
-        .offline-container {
-            background: rgba(255, 255, 255, 0.95);
-            padding: 2rem;
-            border-radius: 15px;
-            margin-bottom: 2rem;
-        }
-        
-        .status-card {
-            background: #f7fafc;
-            padding: 2rem;
-            border-radius: 10px;
-            text-align: center;
-            margin-bottom: 2rem;
-            border-left: 4px solid #48bb78;
-        }
-        
-        .status-offline {
-            border-left-color: #ed8936;
-        }
-        
-        .downloads-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-            gap: 2rem;
-            margin: 3rem 0;
-        }
-        
-        .download-card {
-            background: #f7fafc;
-            padding: 2rem;
-            border-radius: 10px;
-            text-align: center;
-            border: 2px solid #e2e8f0;
-            transition: border-color 0.3s;
-        }
-        
-        .download-card:hover {
-            border-color: #667eea;
-        }
-        
-        .download-icon {
-            font-size: 3rem;
-            margin-bottom: 1rem;
-        }
-        
-        .btn {
-            padding: 10px 20px;
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            color: white;
-            border: none;
-            border-radius: 20px;
-            font-weight: 600;
-            cursor: pointer;
-            transition: transform 0.3s;
-            margin-top: 1rem;
-        }
-        
-        .btn:hover {
-            transform: translateY(-2px);
-        }
-        
-        .btn-outline {
-            background: transparent;
-            border: 2px solid #667eea;
-            color: #667eea;
-        }
-        
-        .progress-bar {
-            width: 100%;
-            height: 8px;
-            background: #e2e8f0;
-            border-radius: 4px;
-            margin: 1rem 0;
-            overflow: hidden;
-        }
-        
-        .progress {
-            height: 100%;
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            border-radius: 4px;
-            transition: width 0.3s;
-        }
-        
-        .feature-list {
-            list-style: none;
-            margin: 2rem 0;
-        }
-        
-        .feature-list li {
-            padding: 0.5rem 0;
-            border-bottom: 1px solid #e2e8f0;
-        }
-        
-        .feature-list li:before {
-            content: "✓";
-            color: #48bb78;
-            font-weight: bold;
-            margin-right: 0.5rem;
-        }
-        
-        footer {
-            text-align: center;
-            padding: 2rem;
-            color: white;
-        }
-        
-        @media (max-width: 768px) {
-            .nav-links {
-                flex-direction: column;
-                gap: 1rem;
-            }
-        }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('css/common.css') }}">
+    <link rel="stylesheet" href="{{ asset_url('css/offline_mode.css') }}">
 </head>
 <body>
     <header>
@@ -1859,47 +1504,9 @@ def create_templates():
                 <button class="btn" onclick="toggleOfflineMode()">Switch to Offline Mode</button>
             </div>
 
-            <div class="downloads-grid">
-                <div class="download-card">
-                    <div class="download-icon">🏛️</div>
-                    <h3>Heritage Sites Guide</h3>
-                    <p>Complete information about major cultural heritage sites</p>
-                    <div class="progress-bar">
-                        <div class="progress" style="width: 100%"></div>
-                    </div>
-                    <button class="btn" onclick="downloadContent('sites')">Download (25 MB)</button>
-                </div>
-                
-                <div class="download-card">
-                    <div class="download-icon">🗺️</div>
-                    <h3>Offline Maps</h3>
-                    <p>Interactive maps and navigation for heritage sites</p>
-                    <div class="progress-bar">
-                        <div class="progress" style="width: 75%"></div>
-                    </div>
-                    <button class="btn" onclick="downloadContent('maps')">Download (50 MB)</button>
-                </div>
-                
-                <div class="download-card">
-                    <div class="download-icon">🎧</div>
-                    <h3>Audio Guides</h3>
-                    <p>Multilingual audio tours and descriptions</p>
-                    <div class="progress-bar">
-                        <div class="progress" style="width: 60%"></div>
-                    </div>
-                    <button class="btn" onclick="downloadContent('audio')">Download (100 MB)</button>
-                </div>
-                
-                <div class="download-card">
-                    <div class="download-icon">📸</div>
-                    <h3>AR Content</h3>
-                    <p>Augmented reality models and experiences</p>
-                    <div class="progress-bar">
-                        <div class="progress" style="width: 40%"></div>
-                    </div>
-                    <button class="btn" onclick="downloadContent('ar')">Download (150 MB)</button>
-                </div>
-            </div>
+            <h2>Region Packs</h2>
+            <p>Each pack bundles site guides, maps, audio tours and AR content for one region.</p>
+            <div class="downloads-grid" id="packsGrid"></div>
 
             <div style="margin-top: 3rem;">
                 <h2>Offline Features</h2>
@@ -1914,7 +1521,7 @@ def create_templates():
             </div>
 
             <div style="text-align: center; margin-top: 2rem;">
-                <button class="btn" onclick="downloadAll()">Download All Content (325 MB)</button>
+                <button class="btn" onclick="downloadAll()">Download All Content</button>
                 <button class="btn btn-outline" onclick="clearDownloads()" style="margin-left: 1rem;">Clear Downloads</button>
             </div>
         </div>
@@ -1924,111 +1531,213 @@ def create_templates():
         <p>&copy; 2024 Smart Cultural Tourism Assistant. All rights reserved.</p>
     </footer>
 
-    <script>
-        let isOfflineMode = false;
-        
-        function toggleOfflineMode() {
-            isOfflineMode = !isOfflineMode;
-            const statusCard = document.getElementById('statusCard');
-            
-            if (isOfflineMode) {
-                statusCard.innerHTML = `
-                    <h2>Offline Mode Active</h2>
-                    <p>You are now in offline mode. All downloaded content is available.</p>
-                    <button class="btn" onclick="toggleOfflineMode()">Switch to Online Mode</button>
-                `;
-                statusCard.classList.add('status-offline');
-            } else {
-                statusCard.innerHTML = `
-                    <h2>Online Mode</h2>
-                    <p>You are currently connected to the internet. Download content for offline access.</p>
-                    <button class="btn" onclick="toggleOfflineMode()">Switch to Offline Mode</button>
-                `;
-                statusCard.classList.remove('status-offline');
-            }
-        }
-        
-        function downloadContent(type) {
-            alert(`Starting download of ${type} content...`);
-            // Simulate download progress
-            simulateDownloadProgress(type);
-        }
-        
-        function downloadAll() {
-            alert('Starting download of all offline content (325 MB)...');
-            // Simulate download progress for all types
-            ['sites', 'maps', 'audio', 'ar'].forEach(type => {
-                simulateDownloadProgress(type);
-            });
-        }
-        
-        function clearDownloads() {
-            if (confirm('Are you sure you want to clear all downloaded content?')) {
-                alert('All downloaded content has been cleared.');
-                // Reset progress bars
-                document.querySelectorAll('.progress').forEach(progress => {
-                    progress.style.width = '0%';
-                });
-            }
-        }
-        
-        function simulateDownloadProgress(type) {
-            const progressBars = {
-                'sites': document.querySelector('.download-card:nth-child(1) .progress'),
-                'maps': document.querySelector('.download-card:nth-child(2) .progress'),
-                'audio': document.querySelector('.download-card:nth-child(3) .progress'),
-                'ar': document.querySelector('.download-card:nth-child(4) .progress')
-            };
-            
-            const progressBar = progressBars[type];
-            if (progressBar) {
-                let width = parseInt(progressBar.style.width) || 0;
-                const interval = setInterval(() => {
-                    if (width >= 100) {
-                        clearInterval(interval);
-                        alert(`${type} content downloaded successfully!`);
-                    } else {
-                        width += 10;
-                        progressBar.style.width = width + '%';
-                    }
-                }, 200);
-            }
-        }
-    </script>
+    <script src="{{ asset_url('js/offline_mode.js') }}"></script>
 </body>
 </html>
-        '''
-    }
+    '''
+}
+
+def template_loader(mode, build_dir):
+    if mode == 'memory':
+        return DictLoader(TEMPLATES)
+    if mode == 'compiled':
+        return ModuleLoader(os.path.join(build_dir, 'compiled_templates'))
+    if mode == 'filesystem':
+        return FileSystemLoader('templates')
+    raise ValueError(f'Unknown template mode: {mode}')
+
+def load_catalog(uri):
+    # The sample data only seeds the catalog; point SMART_TOURISM_CATALOG at a
+    # sqlite:/// database, prepared with `migrate`, to serve a real one.
+    catalog = open_catalog(uri, SAMPLE_HERITAGE_SITES, SAMPLE_NEARBY_ATTRACTIONS, SAMPLE_SITE_TRANSLATIONS)
+    if not (uri or '').startswith('sqlite:///'):
+        return LoadedCatalog(catalog, SearchIndex(catalog.items()))
+    # Built once by `migrate` or `generate`; every worker maps the same file
+    path = index_path(catalog.path)
+    index = SearchIndex.load(path) if os.path.exists(path) else None
+    if index is None or index.catalog_version != catalog.content_version:
+        raise CatalogSchemaError(f'The search index of {catalog.path} is missing or out of date; '
+                                 f'rebuild it with `python Website.py migrate`')
+    return LoadedCatalog(catalog, index)
+
+def index_catalog(catalog, force=False):
+    """Save the search index of a SQLite catalog next to it, unless the saved
+    one is current; returns whether it was built."""
+    path = index_path(catalog.path)
+    if not force and os.path.exists(path) and SearchIndex.load(path).catalog_version == catalog.content_version:
+        return False
+    SearchIndex(catalog.items()).save(path, catalog.content_version)
+    return True
+
+def create_app(config=None):
+    # Static files go through the fingerprinting asset pipeline instead
+    app = Flask(__name__, static_folder=None)
+    app.config.update(default_config())
+    if config:
+        app.config.update(config)
     
-    for filename, content in templates.items():
-        with open(f'templates/{filename}', 'w', encoding='utf-8') as f:
-            f.write(content)
+    # Reloads render the new catalog's pages before it is swapped in
+    app.extensions['catalog_reloader'] = CatalogReloader(
+        load_catalog, app.config['CATALOG_URI'], app.config['CATALOG_WATCH_INTERVAL'],
+        lambda loaded: precompute_site_variants(app, app.config['PRECOMPUTE_SITES'], loaded))
+    app.before_request(app.extensions['catalog_reloader'].check)
+    app.extensions['answers'] = AnswerEngine(app.config['ANSWER_PASSAGES'], app.config['ANSWER_CACHE_SIZE'])
+    
+    # Workers never write templates; they are emitted once by the build command.
+    # Set on the environment itself: Flask's dispatching loader asks for template
+    # source, which precompiled modules can't provide.
+    app.jinja_env.loader = template_loader(app.config['TEMPLATE_MODE'], app.config['BUILD_DIR'])
+    if app.config['TEMPLATE_MODE'] == 'filesystem':
+        # Pick up edits without a restart
+        app.jinja_env.auto_reload = True
+    
+    assets = app.extensions['assets'] = AssetManifest(app.config['STATIC_DIR'])
+    app.jinja_env.globals['asset_url'] = lambda name: url_for(
+        'tourism.static_asset', filename=assets.hashed_name(name))
+    # Pages embed asset URLs, so a CSS/JS change must change their ETags too;
+    # in filesystem mode template_version() hashes the files instead
+    app.extensions['template_version'] = hashlib.sha1(
+        (json.dumps(TEMPLATES, sort_keys=True) + assets.version).encode('utf-8')).hexdigest()
+    app.extensions['page_cache'] = PageCache(app.config['PAGE_CACHE_MAX_BYTES'])
+    app.extensions['speech'] = SpeechBatcher(
+        lambda: WhisperTranscriber(app.config['STT_MODEL'], app.config['STT_THREADS']),
+        app.config['STT_MAX_BATCH'], app.config['STT_MAX_WAIT_MS'] / 1000, app.config['STT_WORKERS'])
+    app.extensions['speech_renderer'] = SpeechRenderer(EspeakSynthesizer, AudioCache(
+        app.config['TTS_CACHE_BYTES'], app.config['TTS_SPILL_DIR'], app.config['TTS_SPILL_MAX_BYTES']))
+    app.session_interface = ServerSessionInterface(open_session_store(
+        app.config['SESSION_URI'], app.permanent_session_lifetime.total_seconds(),
+        app.config['SESSION_MAX_ENTRIES']))
+    app.extensions['packs'] = PackBuilder(
+        app.config['OFFLINE_PACK_DIR'], app.config['OFFLINE_MEDIA_DIR'], app.config['OFFLINE_CHUNK_SIZE'])
+    app.extensions['download_progress'] = DownloadProgress(
+        os.path.join(app.config['OFFLINE_PACK_DIR'], 'progress'))
+    app.extensions['ar_assets'] = ARAssetStore(app.config['OFFLINE_MEDIA_DIR'])
+    
+    app.register_blueprint(bp)
+    # Registered first so it sees responses after compression
+    metrics.init_app(app, Metrics(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_INTERVAL']))
+    profiling.init_app(app)
+    compression.init_app(app)
+    precompute_site_variants(app, app.config['PRECOMPUTE_SITES'])
+    return app
 
-# Create requirements.txt
-requirements_content = '''Flask==2.3.3
-Werkzeug==2.3.7
-'''
+def create_templates(directory='templates'):
+    os.makedirs(directory, exist_ok=True)
+    for filename, content in TEMPLATES.items():
+        with open(os.path.join(directory, filename), 'w', encoding='utf-8') as f:
+            f.write(content)
 
-with open('requirements.txt', 'w') as f:
-    f.write(requirements_content)
+def build(build_dir):
+    create_templates()
+    # Compile from the in-memory sources so the output matches what the
+    # default memory mode serves
+    app = create_app({'TEMPLATE_MODE': 'memory'})
+    app.jinja_env.compile_templates(os.path.join(build_dir, 'compiled_templates'), zip=None)
+    # Fingerprinted, precompressed copies for a CDN or front proxy to serve
+    app.extensions['assets'].write(os.path.join(build_dir, 'static'))
 
-# Create README.md
-readme_content = '''# Smart Cultural Tourism Assistant
+def build_packs():
+    app = create_app()
+    builder = app.extensions['packs']
+    catalog = app.extensions['catalog_reloader'].current.catalog
+    for region in sorted(builder.regions(catalog)):
+        manifest = builder.build(catalog, region)
+        print(f"{region}: {len(manifest['sites'])} sites, {manifest['size']} bytes, version {manifest['version']}")
+    app.extensions['download_progress'].prune()
 
-A Flask-based web application that provides an intelligent cultural tourism experience with AI-powered guidance, augmented reality features, and multilingual support.
+def render_speech(limit):
+    """Pre-render every passage of the first ``limit`` sites to the TTS cache.
+    
+    Answers are always whole passages, in English or one of the site's
+    translations, so afterwards none needs synthesis.
+    """
+    app = create_app()
+    catalog = app.extensions['catalog_reloader'].current.catalog
+    renderer = app.extensions['speech_renderer']
+    voice = app.config['TTS_VOICE']
+    rendered = 0
+    for site_id, site in itertools.islice(catalog.items(), limit):
+        clips = [(text, DEFAULT_LANGUAGE) for text in [DEFAULT_ANSWER, *GENERAL_PASSAGES.values()]
+                 if rendered == 0]
+        for language in [DEFAULT_LANGUAGE] + catalog.translation_languages(site_id):
+            localized = localize(site, catalog.get_translation(site_id, language))
+            clips += [(text, language) for _, _, text in site_passages(localized)]
+        for text, language in clips:
+            key, audio = renderer.render(text, LANGUAGE_CODES[language], voice)
+            renderer.cache.spill(key, audio)
+            rendered += 1
+    renderer.cache.prune()
+    print(f"{rendered} clips in {app.config['TTS_SPILL_DIR']} ({renderer.misses} synthesised)")
 
-## Features
+def add_ar_models(site_id, paths):
+    app = create_app()
+    if app.extensions['catalog_reloader'].current.catalog.get_site(site_id) is None:
+        raise SystemExit(f'Unknown site: {site_id}')
+    for entry in app.extensions['ar_assets'].add(site_id, paths):
+        print(f"lod{entry['level']}: {entry['size']} bytes, sha256 {entry['sha256'][:16]}")
 
-- **Smart Discovery**: Explore cultural heritage sites with detailed information
-- **AI Assistant**: Ask questions about sites and get intelligent responses
-- **Augmented Reality**: AR experiences for historical reconstructions
-- **Voice Assistant**: Voice-controlled interface in multiple languages
-- **Offline Mode**: Access content without internet connection
-- **Multilingual Support**: Available in multiple languages
+def migrate_catalog(uri, reindex=False):
+    """Create the SQLite catalog at ``uri``, seeded with the sample sites, or
+    upgrade it to the schema workers expect; then build its search index."""
+    if not uri.startswith('sqlite:///'):
+        raise SystemExit(f'Only sqlite:/// catalogs are migrated, not {uri!r}')
+    started = time.perf_counter()
+    catalog = open_catalog(uri, SAMPLE_HERITAGE_SITES, SAMPLE_NEARBY_ATTRACTIONS, SAMPLE_SITE_TRANSLATIONS,
+                           writable=True)
+    print(f'{uri}: schema {SCHEMA_VERSION}, {catalog.count()} sites, {time.perf_counter() - started:.1f} s')
+    started = time.perf_counter()
+    if index_catalog(catalog, reindex):
+        print(f'Search index in {index_path(catalog.path)}, {time.perf_counter() - started:.1f} s')
+    catalog.close()
 
-## Installation
+def generate_catalog(path, sites, seed, workers):
+    if os.path.exists(path):
+        raise SystemExit(f'{path} already exists')
+    started = time.perf_counter()
+    write_catalog(path, sites, seed, workers=workers)
+    print(f'{sites} sites in {time.perf_counter() - started:.1f} s')
+    started = time.perf_counter()
+    index_catalog(open_catalog(f'sqlite:///{path}'))
+    print(f'Search index in {time.perf_counter() - started:.1f} s; serve them with SMART_TOURISM_CATALOG=sqlite:///{path}')
 
-1. Clone this repository:
-```bash
-git clone <your-repo-url>
-cd smart-cultural-tourism
\ No newline at end of file
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Smart Cultural Tourism Assistant')
+    subcommands = parser.add_subparsers(dest='command')
+    subcommands.add_parser('run', help='start the development server (default)')
+    build_parser = subcommands.add_parser('build', help='write templates/ and precompiled templates')
+    build_parser.add_argument('--build-dir', default=default_config()['BUILD_DIR'])
+    subcommands.add_parser('packs', help='build the offline content pack of every region')
+    speech_parser = subcommands.add_parser('speech', help='pre-render spoken answers for the first sites')
+    speech_parser.add_argument('--limit', type=int, default=1000)
+    ar_parser = subcommands.add_parser('ar', help="store a site's 3D models as levels of detail")
+    ar_parser.add_argument('site_id')
+    ar_parser.add_argument('models', nargs='+', help='.glb files of one model at different detail')
+    migrate_parser = subcommands.add_parser('migrate', help='create or upgrade the SQLite catalog workers serve')
+    migrate_parser.add_argument('--catalog', default=default_config()['CATALOG_URI'], help='catalog URI')
+    migrate_parser.add_argument('--reindex', action='store_true',
+                                help='rebuild the search index even if it is current, e.g. after editing sites in SQL')
+    generate_parser = subcommands.add_parser('generate', help='write a seeded synthetic catalog for scale testing')
+    generate_parser.add_argument('path', help='new SQLite catalog file')
+    generate_parser.add_argument('--sites', type=int, default=1000000)
+    generate_parser.add_argument('--seed', type=int, default=1)
+    generate_parser.add_argument('--workers', type=int, help='generating processes (default: one per CPU)')
+    serve_parser = subcommands.add_parser('serve', help='run under the pre-fork production server')
+    add_serve_arguments(serve_parser)
+    args = parser.parse_args()
+    
+    if args.command == 'build':
+        build(args.build_dir)
+    elif args.command == 'packs':
+        build_packs()
+    elif args.command == 'speech':
+        render_speech(args.limit)
+    elif args.command == 'ar':
+        add_ar_models(args.site_id, args.models)
+    elif args.command == 'migrate':
+        migrate_catalog(args.catalog, args.reindex)
+    elif args.command == 'generate':
+        generate_catalog(args.path, args.sites, args.seed, args.workers)
+    elif args.command == 'serve':
+        serve(create_app, args)
+    else:
+        create_app().run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,105 @@
+"""Answering visitors' questions.
+
+``AnswerEngine`` is the one place questions are answered, whether typed on a
+site page or spoken to the voice assistant. The best BM25 passage is the
+answer, in the visitor's language where the site has a translation of it.
+Results are cached per (catalog version, site, normalised question,
+language); BM25 ranks a question by its set of terms, so questions that only
+differ in case, word order or stopwords share an entry. The engine is given
+the catalog and index with each question, so its cache outlives a catalog
+reload: entries of the old version stop matching and age out.
+"""
+import threading
+from collections import OrderedDict
+
+from i18n import DEFAULT_LANGUAGE
+from search import tokenize
+
+DEFAULT_ANSWER = "I'd be happy to tell you more about this heritage site. It represents rich cultural heritage and historical significance."
+
+
+def normalize_question(question):
+    return ' '.join(sorted(set(tokenize(question))))
+
+
+class Answer:
+    __slots__ = ('text', 'language', 'passages')
+
+    def __init__(self, text, language, passages):
+        self.text = text
+        self.language = language
+        self.passages = passages
+
+
+class AnswerEngine:
+    def __init__(self, passages=3, cache_size=10000):
+        self.passages = passages
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache),
+                    "max_size": self.cache_size}
+
+    def _passage(self, catalog, index, doc, score, language):
+        passage = index.passage(catalog, doc)
+        if language != DEFAULT_LANGUAGE and passage['site_id'] is not None:
+            translation = catalog.get_translation(passage['site_id'], language) or {}
+            value = translation.get(passage['field'])
+            fact = int(index.passage_fact[doc])
+            if isinstance(value, list) and 0 <= fact < len(value):
+                passage = dict(passage, text=value[fact], language=language)
+            elif isinstance(value, str) and fact < 0:
+                passage = dict(passage, text=value, language=language)
+        passage.setdefault('language', DEFAULT_LANGUAGE)
+        passage['score'] = round(score, 4)
+        return passage
+
+    def answer(self, catalog, index, question, site_id=None, language=DEFAULT_LANGUAGE):
+        """Return ``(answer, hit)`` from ``catalog`` and its search ``index``;
+        ``hit`` tells whether it came from the cache.
+
+        Callers share the cached ``Answer`` and must not modify it.
+        """
+        for kind, value in self.iter_answer(catalog, index, question, site_id, language):
+            if kind == 'answer':
+                return value
+
+    def iter_answer(self, catalog, index, question, site_id=None, language=DEFAULT_LANGUAGE):
+        """Like ``answer``, step by step, for streaming.
+
+        Yields ``('passage', passage)`` for each ranked passage, best first,
+        as soon as it is resolved, then ``('answer', (answer, hit))``. A miss
+        is cached at the end, so a caller that stops early caches nothing.
+        """
+        key = (catalog.version, site_id or None, normalize_question(question), language)
+        with self._lock:
+            answer = self._cache.get(key)
+            if answer is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if answer is not None:
+            for passage in answer.passages:
+                yield 'passage', passage
+            yield 'answer', (answer, True)
+            return
+        passages = []
+        for doc, score in index.search(question, site_id or None, self.passages):
+            passage = self._passage(catalog, index, doc, score, language)
+            passages.append(passage)
+            yield 'passage', passage
+        if passages:
+            answer = Answer(passages[0]['text'], passages[0]['language'], passages)
+        else:
+            answer = Answer(DEFAULT_ANSWER, DEFAULT_LANGUAGE, passages)
+        with self._lock:
+            self._cache[key] = answer
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        yield 'answer', (answer, False)
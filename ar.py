@@ -0,0 +1,131 @@
+"""3D reconstructions for the AR view.
+
+Each site's models live under ``<media dir>/ar/<site_id>/`` as binary glTF
+files ``lod0.glb``, ``lod1.glb``, ... from coarsest to finest, next to the
+site's other offline media. Clients load ``lod0`` first, which should be
+small enough to show within a second on a phone, and then swap in the finer
+levels as they arrive.
+
+Models are served from memory maps: the bytes come straight out of the OS
+page cache, which every worker process shares, so a model is never copied
+whole into a worker's memory however large it is or however many clients are
+downloading it.
+"""
+import mmap
+import os
+import re
+import shutil
+import threading
+
+from offline import file_digest
+
+LOD_RE = re.compile(r'^lod(\d+)\.glb$')
+
+
+class MappedFile:
+    """WSGI response iterable over a memory-mapped file.
+
+    It is seekable, so werkzeug's Range handling jumps straight to the first
+    requested byte instead of reading up to it.
+    """
+
+    def __init__(self, path, chunk_size=256 * 1024):
+        self.chunk_size = chunk_size
+        self.position = 0
+        with open(path, 'rb') as f:
+            self.size = os.fstat(f.fileno()).st_size
+            # The map keeps its own reference to the file, so it can be closed here
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self.position, os.SEEK_END: self.size}[whence]
+        self.position = max(0, min(base + offset, self.size))
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.position >= self.size:
+            raise StopIteration
+        chunk = self._map[self.position:self.position + self.chunk_size]
+        self.position += len(chunk)
+        return chunk
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+class ARAssetStore:
+    def __init__(self, media_dir):
+        self.root = os.path.join(media_dir, 'ar')
+        # path -> (size, mtime_ns, sha256); models are only hashed again when they change
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def site_dir(self, site_id):
+        return os.path.join(self.root, site_id)
+
+    def site_ids(self):
+        """Return the sites that have at least one model, sorted."""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(name for name in names if self.levels(name))
+
+    def _digest(self, path, stat):
+        with self._lock:
+            cached = self._digests.get(path)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+        _, digest = file_digest(path)
+        with self._lock:
+            self._digests[path] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def levels(self, site_id):
+        """Return ``{level, path, size, sha256}`` for each of a site's models, coarsest first."""
+        try:
+            names = os.listdir(self.site_dir(site_id))
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+        levels = []
+        for name in names:
+            match = LOD_RE.match(name)
+            if match:
+                path = os.path.join(self.site_dir(site_id), name)
+                stat = os.stat(path)
+                levels.append({"level": int(match.group(1)), "path": path, "size": stat.st_size,
+                               "sha256": self._digest(path, stat)})
+        return sorted(levels, key=lambda level: level['level'])
+
+    def level(self, site_id, level):
+        return next((entry for entry in self.levels(site_id) if entry['level'] == level), None)
+
+    def add(self, site_id, paths):
+        """Store ``paths`` as a site's levels of detail, replacing any it had.
+
+        The models are ordered by size, so the smallest becomes ``lod0``.
+        """
+        directory = self.site_dir(site_id)
+        os.makedirs(directory, exist_ok=True)
+        paths = sorted(paths, key=os.path.getsize)
+        for level, path in enumerate(paths):
+            target = os.path.join(directory, f'lod{level}.glb')
+            tmp = os.path.join(directory, f'.lod{level}.glb.tmp')
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, target)
+        for name in os.listdir(directory):
+            match = LOD_RE.match(name)
+            if match and int(match.group(1)) >= len(paths):
+                os.remove(os.path.join(directory, name))
+        return self.levels(site_id)
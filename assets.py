@@ -0,0 +1,77 @@
+"""Static asset pipeline.
+
+Source files under ``static/`` are fingerprinted with a content hash and
+precompressed once at start-up, in memory, so workers still write nothing to
+disk. Hashed URLs never change content, which lets them be cached forever;
+``AssetManifest.write`` emits the same files for a CDN or front proxy.
+"""
+import hashlib
+import json
+import os
+
+from compression import COMPRESSORS, compress
+
+CONTENT_TYPES = {
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+    '.json': 'application/json',
+    '.svg': 'image/svg+xml',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+}
+
+# Only these are worth compressing; images are already compressed
+COMPRESSIBLE = ('.css', '.js', '.json', '.svg')
+
+
+class Asset:
+    def __init__(self, name, body):
+        self.name = name
+        self.body = body
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        root, ext = os.path.splitext(name)
+        self.hashed_name = f'{root}.{self.digest}{ext}'
+        self.content_type = CONTENT_TYPES.get(ext, 'application/octet-stream')
+        self.variants = {}
+        if ext in COMPRESSIBLE:
+            for encoding in COMPRESSORS:
+                self.variants[encoding] = compress(body, encoding, 'best')
+
+
+class AssetManifest:
+    def __init__(self, source_dir):
+        self.assets = {}
+        self._by_hashed_name = {}
+        for root, _, files in os.walk(source_dir):
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, source_dir).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    asset = Asset(name, f.read())
+                self.assets[name] = asset
+                self._by_hashed_name[asset.hashed_name] = asset
+        self.version = hashlib.sha1(
+            ''.join(sorted(a.hashed_name for a in self.assets.values())).encode()).hexdigest()
+
+    def hashed_name(self, name):
+        return self.assets[name].hashed_name
+
+    def lookup(self, hashed_name):
+        return self._by_hashed_name.get(hashed_name)
+
+    def manifest(self):
+        return {name: asset.hashed_name for name, asset in sorted(self.assets.items())}
+
+    def write(self, output_dir):
+        """Write hashed files, their compressed variants and manifest.json."""
+        suffixes = {'gzip': '.gz', 'br': '.br', 'zstd': '.zst'}
+        for asset in self.assets.values():
+            path = os.path.join(output_dir, asset.hashed_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(asset.body)
+            for encoding, body in asset.variants.items():
+                with open(path + suffixes[encoding], 'wb') as f:
+                    f.write(body)
+        with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.manifest(), f, indent=2)
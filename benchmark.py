@@ -0,0 +1,251 @@
+"""Benchmark the routes against a synthetic catalog.
+
+Seeds a SQLite catalog of ``--sites`` generated sites, then replays the same
+seeded mix of requests to every route through the WSGI test client (the app's
+own cost) and over HTTP to a threaded server in a child process (the cost a
+client sees), and reports throughput and p50/p95/p99 latency per route:
+
+    python benchmark.py --sites 100000 --save-baseline bench.json
+    python benchmark.py --sites 100000 --baseline bench.json
+
+Against a baseline, any route whose throughput drops or whose p95 latency
+grows by more than ``--tolerance`` is reported and the exit status is 1.
+``--url`` benchmarks an already running server instead, e.g. ``serve``.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+import synthetic
+from catalog import open_catalog
+from i18n import DEFAULT_LANGUAGE, LANGUAGE_CODES
+
+QUESTIONS = ["When was it built?", "Who built it?", "What architectural style is it?",
+             "Tell me a fun fact", "How many people worked on it?", "Where is it?"]
+
+
+class Workload:
+    """Seeded request generators for each route. Popular sites get most of the
+    traffic, as they would in production."""
+
+    def __init__(self, count, seed):
+        self.count = count
+        self.rng = random.Random(seed)
+
+    def site(self):
+        return f'site_{min(int(self.count * self.rng.random() ** 3), self.count - 1):07d}'
+
+    def discover_query(self):
+        filters = self.rng.choice([{}, {"location": "{}, {}".format(*self.rng.choice(synthetic.CITIES)[:2])},
+                                   {"style": self.rng.choice(synthetic.STYLES[DEFAULT_LANGUAGE])},
+                                   {"language": self.rng.choice(list(LANGUAGE_CODES))}])
+        return urlencode(dict(filters, sort=self.rng.choice(['name', 'location'])))
+
+    def routes(self):
+        return {
+            'home': lambda: ('GET', '/', None),
+            'discover': lambda: ('GET', '/discover?' + self.discover_query(), None),
+            'api_discover': lambda: ('GET', '/api/discover?' + self.discover_query(), None),
+            'site_detail': lambda: ('GET', f'/site/{self.site()}', None),
+            'site_info': lambda: ('GET', f'/api/site_info/{self.site()}', None),
+            'site_info_batch': lambda: ('POST', '/api/site_info_batch',
+                                        {"site_ids": [self.site() for _ in range(20)]}),
+            'nearby_attractions': lambda: ('GET', f'/api/nearby_attractions/{self.site()}', None),
+            'ask_question': lambda: ('POST', '/api/ask_question',
+                                     {"question": self.rng.choice(QUESTIONS), "site_id": self.site()}),
+            'ar_experience': lambda: ('GET', '/ar_experience', None),
+            'voice_assistant': lambda: ('GET', '/voice_assistant', None),
+            'offline_mode': lambda: ('GET', '/offline_mode', None),
+            'precache_manifest': lambda: ('GET', '/precache-manifest.json', None),
+        }
+
+
+HEADERS = {'Accept-Encoding': 'gzip', 'Content-Type': 'application/json'}
+
+
+def summarize(latencies, errors, elapsed):
+    ms = np.asarray(latencies) * 1000
+    return {"requests": len(latencies), "errors": errors, "throughput": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(float(np.percentile(ms, 50)), 3), "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3)}
+
+
+def run_wsgi(app, requests):
+    client = app.test_client()
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for method, path, body in requests:
+        begin = time.perf_counter()
+        response = client.open(path, method=method, json=body, headers={'Accept-Encoding': 'gzip'})
+        response.get_data()
+        response.close()
+        latencies.append(time.perf_counter() - begin)
+        errors += response.status_code >= 400
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def run_http(host, port, requests, concurrency):
+    pending = iter(requests)
+    lock = threading.Lock()
+    latencies, errors = [], [0]
+
+    def worker():
+        conn = http.client.HTTPConnection(host, port, timeout=60)
+        while True:
+            with lock:
+                request = next(pending, None)
+            if request is None:
+                break
+            method, path, body = request
+            begin = time.perf_counter()
+            conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=HEADERS)
+            response = conn.getresponse()
+            response.read()
+            elapsed = time.perf_counter() - begin
+            with lock:
+                latencies.append(elapsed)
+                errors[0] += response.status >= 400
+        conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+class QuietHandler(WSGIRequestHandler):
+    # Keep-alive, as browsers use, and no per-request log lines
+    protocol_version = 'HTTP/1.1'
+
+    def log(self, type, message, *args):
+        pass
+
+
+def start_server(app):
+    """Serve ``app`` from a forked child so clients don't share its GIL."""
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+
+    def run():
+        server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+        sender.send(server.port)
+        server.serve_forever()
+
+    process = context.Process(target=run, daemon=True)
+    process.start()
+    return process, receiver.recv()
+
+
+def compare(results, baseline, tolerance):
+    """Return a description of every regression against ``baseline``."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline['results'].get(key)
+        if base is None:
+            continue
+        if result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {result['throughput']} req/s, baseline {base['throughput']}")
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {result['p95_ms']} ms, baseline {base['p95_ms']}")
+        if result['errors'] > base['errors']:
+            regressions.append(f"{key}: {result['errors']} errors, baseline {base['errors']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sites', type=int, default=10000, help='synthetic catalog size')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=500, help='measured requests per route and mode')
+    parser.add_argument('--warmup', type=int, default=50, help='unmeasured requests per route first')
+    parser.add_argument('--concurrency', type=int, default=8, help='client connections over HTTP')
+    parser.add_argument('--modes', default='wsgi,http', help='wsgi, http or both')
+    parser.add_argument('--routes', help='comma-separated subset of routes')
+    parser.add_argument('--url', help='benchmark this running server over HTTP instead')
+    parser.add_argument('--catalog-dir', help='keep the seeded catalog here and reuse it')
+    parser.add_argument('--baseline', help='fail on regressions against this results file')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--save-baseline', help='write the results to this file')
+    args = parser.parse_args(argv)
+
+    params = {"sites": args.sites, "seed": args.seed, "requests": args.requests, "concurrency": args.concurrency}
+    modes = ['http'] if args.url else args.modes.split(',')
+    server = None
+    if not args.url:
+        from Website import create_app, index_catalog
+        catalog_dir = args.catalog_dir or tempfile.mkdtemp(prefix='smart-tourism-bench-')
+        path = os.path.join(catalog_dir, f'catalog-{args.sites}-{args.seed}.db')
+        if not os.path.exists(path):
+            os.makedirs(catalog_dir, exist_ok=True)
+            started = time.perf_counter()
+            synthetic.write_catalog(path, args.sites, args.seed)
+            print(f'Seeded {args.sites} sites in {time.perf_counter() - started:.1f} s', file=sys.stderr)
+        # Workers map the search index, which is built once per catalog
+        index_catalog(open_catalog(f'sqlite:///{path}'))
+        app = create_app({'CATALOG_URI': f'sqlite:///{path}'})
+        if 'http' in modes:
+            server, port = start_server(app)
+            host = '127.0.0.1'
+    else:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+
+    routes = Workload(args.sites, args.seed).routes()
+    names = args.routes.split(',') if args.routes else list(routes)
+    results = {}
+    try:
+        print(f"{'route':<28}{'requests':>9}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for mode in modes:
+            for name in names:
+                # The same seed gives every mode and run the same requests
+                workload = Workload(args.sites, args.seed)
+                generate = workload.routes()[name]
+                warmup = [generate() for _ in range(args.warmup)]
+                measured = [generate() for _ in range(args.requests)]
+                if mode == 'wsgi':
+                    run_wsgi(app, warmup)
+                    result = run_wsgi(app, measured)
+                else:
+                    run_http(host, port, warmup, args.concurrency)
+                    result = run_http(host, port, measured, args.concurrency)
+                key = f'{mode}/{name}'
+                results[key] = result
+                print(f"{key:<28}{result['requests']:>9}{result['errors']:>8}{result['throughput']:>10}"
+                      f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}")
+    finally:
+        if server is not None:
+            server.terminate()
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({"params": params, "results": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['params'] != params:
+            print(f"Baseline was run with {baseline['params']}, not {params}", file=sys.stderr)
+            return 2
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,677 @@
+"""Heritage site catalog storage.
+
+Both backends expose the same interface so the routes never care where the
+catalog lives: ``MemoryCatalogStore`` keeps everything in dicts and is meant
+for the bundled sample data and small deployments, ``SQLiteCatalogStore``
+keeps the data on disk and only holds a bounded LRU of decoded sites in RAM.
+
+Workers open SQLite catalogs read-only. Creating, seeding and upgrading one
+is a separate step (``python Website.py migrate``), since on a large catalog
+it takes minutes and must not be raced by every worker at start-up.
+"""
+import base64
+import bisect
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from urllib.parse import quote
+
+from geo import GeoIndex, format_distance
+
+
+class CatalogStore:
+    """Interface shared by every catalog backend.
+
+    ``version`` changes whenever the catalog content does; caches derived from
+    the catalog key on it.
+    """
+
+    version = None
+
+    def get_site(self, site_id):
+        raise NotImplementedError
+
+    def get_sites(self, site_ids):
+        """Return ``{site_id: site}`` for the ids that exist."""
+        found = {}
+        for site_id in site_ids:
+            site = self.get_site(site_id)
+            if site is not None:
+                found[site_id] = site
+        return found
+
+    def get_nearby(self, site_id):
+        raise NotImplementedError
+
+    def get_translation(self, site_id, language):
+        """Return the translated fields of a site as ``{field: value}``, or None."""
+        raise NotImplementedError
+
+    def get_translations(self, site_ids, language):
+        """Return ``{site_id: fields}`` for the sites translated into ``language``."""
+        found = {}
+        for site_id in site_ids:
+            translation = self.get_translation(site_id, language)
+            if translation is not None:
+                found[site_id] = translation
+        return found
+
+    def translation_languages(self, site_id):
+        """Return the languages a site has translations for, sorted."""
+        raise NotImplementedError
+
+    def site_ids_by_location(self, location):
+        raise NotImplementedError
+
+    def site_ids_by_style(self, architectural_style):
+        raise NotImplementedError
+
+    def regions(self):
+        """Return ``{region: site count}``, by ``region_for`` of each site."""
+        raise NotImplementedError
+
+    def site_ids_by_region(self, region, limit=None):
+        """Return the ids of a region's sites, sorted."""
+        raise NotImplementedError
+
+    def items(self):
+        """Yield ``(site_id, site)`` pairs in catalog order."""
+        raise NotImplementedError
+
+    def query_sites(self, location=None, style=None, language=None, sort='name', after=None, limit=24):
+        """Return one page of sites as ``([(site_id, site), ...], next_after)``.
+
+        ``after`` is the ``next_after`` of the previous page (the sort value and
+        site_id of its last row); ``next_after`` is None on the last page.
+        """
+        raise NotImplementedError
+
+    def attraction_points(self):
+        """Return ``(keys, lats, lons)`` for every attraction with coordinates."""
+        raise NotImplementedError
+
+    def get_attractions(self, keys):
+        """Return the attractions stored under ``keys``, in the same order."""
+        raise NotImplementedError
+
+    def attraction_index(self):
+        index = getattr(self, '_attraction_index', None)
+        if index is None:
+            index = self._attraction_index = GeoIndex(*self.attraction_points())
+        return index
+
+    def nearest_attractions(self, lat, lon, radius_km, limit):
+        keys, distances = self.attraction_index().query(lat, lon, radius_km, limit)
+        return [dict(attraction, distance_km=round(km, 2), distance=format_distance(km))
+                for attraction, km in zip(self.get_attractions(keys), distances)]
+
+    def count(self):
+        raise NotImplementedError
+
+    def import_sites(self, sites, nearby=None, translations=None):
+        """Bulk load ``{site_id: site}``, ``{site_id: [attraction, ...]}`` and
+        ``{site_id: {language: {field: value}}}``."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __contains__(self, site_id):
+        return self.get_site(site_id) is not None
+
+    def __len__(self):
+        return self.count()
+
+
+def _index_key(value):
+    return (value or '').strip().lower()
+
+
+def slugify(value):
+    return re.sub(r'[^a-z0-9]+', '-', (value or '').lower()).strip('-') or 'other'
+
+
+def region_for(site):
+    """Sites can name their region; otherwise it is the last part of the location."""
+    return slugify(site.get('region') or (site.get('location') or '').split(',')[-1])
+
+
+def catalog_rows(start, sites, nearby=None, translations=None):
+    """Return the rows of ``sites``, numbered from ``start``, for a SQLite catalog."""
+    site_rows = [(site_id, position, _index_key(site.get('name')), _index_key(site.get('location')),
+                  _index_key(site.get('architectural_style')), region_for(site), json.dumps(site, ensure_ascii=False))
+                 for position, (site_id, site) in enumerate(sites.items(), start)]
+    language_rows = [(_index_key(language), site_id, keys[2], keys[3], keys[4])
+                     for keys, (site_id, site) in zip(site_rows, sites.items())
+                     for language in site.get('languages', ())]
+    attraction_rows = [(site_id, i, a.get('lat'), a.get('lon'), json.dumps(dict(a, site_id=site_id), ensure_ascii=False))
+                       for site_id, attractions in (nearby or {}).items() for i, a in enumerate(attractions)]
+    translation_rows = [(site_id, language, json.dumps(fields, ensure_ascii=False))
+                        for site_id, by_language in (translations or {}).items()
+                        for language, fields in by_language.items()]
+    return site_rows, language_rows, attraction_rows, translation_rows
+
+
+# Sort keys accepted by query_sites, prefixed with '-' for descending order
+SORT_FIELDS = {'name': 'name', 'location': 'location', 'style': 'architectural_style'}
+
+
+def parse_sort(sort):
+    field = sort[1:] if sort.startswith('-') else sort
+    if field not in SORT_FIELDS:
+        raise ValueError(f'Unknown sort key: {sort}')
+    return field, sort.startswith('-')
+
+
+def encode_cursor(sort, after):
+    payload = json.dumps([sort, after], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """Turn a cursor back into ``after``; raises ValueError if it is malformed
+    or was issued for a different sort order."""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, after = json.loads(payload)
+    except Exception:
+        raise ValueError('Malformed cursor')
+    if cursor_sort != sort or not (isinstance(after, list) and len(after) == 2
+                                   and all(isinstance(v, str) for v in after)):
+        raise ValueError('Cursor does not match this query')
+    return tuple(after)
+
+
+class MemoryCatalogStore(CatalogStore):
+    def __init__(self, sites=None, nearby=None, translations=None):
+        self._sites = {}
+        self._nearby = {}
+        self._translations = {}
+        self._attractions = []
+        self._by_location = {}
+        self._by_style = {}
+        self._by_language = {}
+        self._by_region = {}
+        # Per sort field: every (sort value, site_id) in order, and each site's
+        # rank in that order so filtered result sets sort as plain integers
+        self._sorted = {}
+        self._rank = {}
+        self.version = hashlib.sha1(b'').hexdigest()
+        if sites:
+            self.import_sites(sites, nearby, translations)
+
+    def get_site(self, site_id):
+        return self._sites.get(site_id)
+
+    def get_nearby(self, site_id):
+        return self._nearby.get(site_id, [])
+
+    def get_translation(self, site_id, language):
+        return self._translations.get(site_id, {}).get(language)
+
+    def translation_languages(self, site_id):
+        return sorted(self._translations.get(site_id, ()))
+
+    def site_ids_by_location(self, location):
+        return list(self._by_location.get(_index_key(location), ()))
+
+    def site_ids_by_style(self, architectural_style):
+        return list(self._by_style.get(_index_key(architectural_style), ()))
+
+    def regions(self):
+        return {region: len(site_ids) for region, site_ids in self._by_region.items()}
+
+    def site_ids_by_region(self, region, limit=None):
+        return sorted(self._by_region.get(region, ()))[:limit]
+
+    def items(self):
+        return iter(self._sites.items())
+
+    def query_sites(self, location=None, style=None, language=None, sort='name', after=None, limit=24):
+        field, descending = parse_sort(sort)
+        keys = self._sorted[field]
+        filters = [index.get(_index_key(value), ()) for index, value in
+                   ((self._by_location, location), (self._by_style, style), (self._by_language, language))
+                   if value]
+        if filters:
+            filters.sort(key=len)
+            others = [set(ids) for ids in filters[1:]]
+            rank = self._rank[field]
+            ranks = sorted(rank[site_id] for site_id in filters[0]
+                           if all(site_id in ids for ids in others))
+            keys = [keys[r] for r in ranks]
+        if descending:
+            end = bisect.bisect_left(keys, tuple(after)) if after else len(keys)
+            page = keys[max(end - limit, 0):end][::-1]
+            more = end > limit
+        else:
+            start = bisect.bisect_right(keys, tuple(after)) if after else 0
+            page = keys[start:start + limit]
+            more = start + limit < len(keys)
+        return [(site_id, self._sites[site_id]) for _, site_id in page], (list(page[-1]) if more else None)
+
+    def count(self):
+        return len(self._sites)
+
+    def attraction_points(self):
+        points = [(key, a['lat'], a['lon']) for key, a in enumerate(self._attractions)
+                  if a.get('lat') is not None and a.get('lon') is not None]
+        return [p[0] for p in points], [p[1] for p in points], [p[2] for p in points]
+
+    def get_attractions(self, keys):
+        return [self._attractions[key] for key in keys]
+
+    def import_sites(self, sites, nearby=None, translations=None):
+        for site_id, site in sites.items():
+            self._sites[site_id] = site
+            self._by_location.setdefault(_index_key(site.get('location')), []).append(site_id)
+            self._by_style.setdefault(_index_key(site.get('architectural_style')), []).append(site_id)
+            self._by_region.setdefault(region_for(site), []).append(site_id)
+            for language in site.get('languages', ()):
+                self._by_language.setdefault(_index_key(language), []).append(site_id)
+        for field, attribute in SORT_FIELDS.items():
+            self._sorted[field] = sorted((_index_key(site.get(attribute)), site_id)
+                                         for site_id, site in self._sites.items())
+            self._rank[field] = {site_id: i for i, (_, site_id) in enumerate(self._sorted[field])}
+        for site_id, attractions in (nearby or {}).items():
+            attractions = [dict(a, site_id=site_id) for a in attractions]
+            self._nearby[site_id] = attractions
+            self._attractions.extend(attractions)
+        for site_id, by_language in (translations or {}).items():
+            self._translations[site_id] = dict(by_language)
+        self._attraction_index = None
+        # Content-derived, so every worker loading the same data agrees on it
+        digest = hashlib.sha1(self.version.encode())
+        digest.update(json.dumps([sites, nearby, translations], sort_keys=True, default=str).encode())
+        self.version = digest.hexdigest()
+
+
+class CatalogSchemaError(RuntimeError):
+    """A SQLite catalog that is missing or not at ``SCHEMA_VERSION``."""
+
+
+# Kept in PRAGMA user_version; bump it with every change to SCHEMA or _upgrade
+SCHEMA_VERSION = 2
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sites (
+    site_id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name_key TEXT NOT NULL,
+    location_key TEXT NOT NULL,
+    style_key TEXT NOT NULL,
+    data TEXT NOT NULL,
+    -- region_for(site), which offline packs are grouped by
+    region_key TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS sites_position ON sites (position);
+CREATE INDEX IF NOT EXISTS sites_region ON sites (region_key, site_id);
+CREATE INDEX IF NOT EXISTS sites_name ON sites (name_key, site_id);
+CREATE INDEX IF NOT EXISTS sites_location ON sites (location_key, site_id);
+CREATE INDEX IF NOT EXISTS sites_style ON sites (style_key, site_id);
+CREATE INDEX IF NOT EXISTS sites_location_name ON sites (location_key, name_key, site_id);
+CREATE INDEX IF NOT EXISTS sites_style_name ON sites (style_key, name_key, site_id);
+CREATE INDEX IF NOT EXISTS sites_location_style ON sites (location_key, style_key, site_id);
+CREATE INDEX IF NOT EXISTS sites_style_location ON sites (style_key, location_key, site_id);
+CREATE INDEX IF NOT EXISTS sites_location_style_name ON sites (location_key, style_key, name_key, site_id);
+-- Carries the site's sort keys so language filters page through an index too
+CREATE TABLE IF NOT EXISTS site_languages (
+    language_key TEXT NOT NULL,
+    site_id TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    location_key TEXT NOT NULL,
+    style_key TEXT NOT NULL,
+    PRIMARY KEY (language_key, site_id)
+);
+CREATE INDEX IF NOT EXISTS site_languages_name ON site_languages (language_key, name_key, site_id);
+CREATE INDEX IF NOT EXISTS site_languages_location ON site_languages (language_key, location_key, site_id);
+CREATE INDEX IF NOT EXISTS site_languages_style ON site_languages (language_key, style_key, site_id);
+CREATE INDEX IF NOT EXISTS site_languages_location_name
+    ON site_languages (language_key, location_key, name_key, site_id);
+CREATE INDEX IF NOT EXISTS site_languages_style_name ON site_languages (language_key, style_key, name_key, site_id);
+CREATE INDEX IF NOT EXISTS site_languages_location_style
+    ON site_languages (language_key, location_key, style_key, site_id);
+CREATE INDEX IF NOT EXISTS site_languages_style_location
+    ON site_languages (language_key, style_key, location_key, site_id);
+CREATE INDEX IF NOT EXISTS site_languages_location_style_name
+    ON site_languages (language_key, location_key, style_key, name_key, site_id);
+CREATE TABLE IF NOT EXISTS site_translations (
+    site_id TEXT NOT NULL,
+    language TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (site_id, language)
+);
+CREATE TABLE IF NOT EXISTS attractions (
+    id INTEGER PRIMARY KEY,
+    site_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    lat REAL,
+    lon REAL,
+    data TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS attractions_site ON attractions (site_id, position);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+'''
+
+
+class SQLiteCatalogStore(CatalogStore):
+    """A catalog in a SQLite file, read-only unless ``writable``.
+
+    A read-only store refuses a file that is missing or at another schema
+    version with ``CatalogSchemaError``; a writable one creates or upgrades it.
+    """
+
+    def __init__(self, path, cache_size=4096, writable=False):
+        # Resolved once: every thread's connection must open the same file,
+        # even after a symlink at ``path`` is pointed at a newer catalog
+        self.path = os.path.realpath(path)
+        self.writable = writable
+        self.cache_size = cache_size
+        self._local = threading.local()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        if writable:
+            self.migrate()
+        elif not os.path.exists(self.path):
+            raise CatalogSchemaError(f'No catalog at {self.path}; create it with `python Website.py migrate`')
+        else:
+            schema = self._connection().execute('PRAGMA user_version').fetchone()[0]
+            if schema != SCHEMA_VERSION:
+                raise CatalogSchemaError(f'{self.path} is at catalog schema {schema}, not {SCHEMA_VERSION}; '
+                                         f'upgrade it with `python Website.py migrate`')
+        self.content_version, self.version = self._read_version()
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork so pre-forked
+        # workers never share a SQLite handle with their parent.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            if self.writable:
+                conn = sqlite3.connect(self.path)
+            else:
+                conn = sqlite3.connect(f'file:{quote(self.path)}?mode=ro', uri=True)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def migrate(self):
+        """Create the tables and indexes, or bring an older catalog up to date."""
+        conn = self._connection()
+        self._upgrade()
+        conn.executescript(SCHEMA)
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def _upgrade(self):
+        conn = self._connection()
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(site_languages)')]
+        if columns and 'name_key' not in columns:
+            # Catalogs written before site_languages carried the sort keys
+            with conn:
+                conn.execute('ALTER TABLE site_languages RENAME TO site_languages_old')
+                conn.execute('CREATE TABLE site_languages (language_key TEXT NOT NULL, site_id TEXT NOT NULL, '
+                             'name_key TEXT NOT NULL, location_key TEXT NOT NULL, style_key TEXT NOT NULL, '
+                             'PRIMARY KEY (language_key, site_id))')
+                conn.execute('INSERT INTO site_languages SELECT l.language_key, l.site_id, s.name_key, '
+                             's.location_key, s.style_key FROM site_languages_old l JOIN sites s USING (site_id)')
+                conn.execute('DROP TABLE site_languages_old')
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(sites)')]
+        if columns and 'region_key' not in columns:
+            with conn:
+                conn.execute("ALTER TABLE sites ADD COLUMN region_key TEXT NOT NULL DEFAULT ''")
+                rows = conn.execute('SELECT site_id, data FROM sites').fetchall()
+                conn.executemany('UPDATE sites SET region_key = ? WHERE site_id = ?',
+                                 ((region_for(json.loads(data)), site_id) for site_id, data in rows))
+
+    def _read_version(self):
+        """Return ``(content_version, version)``.
+
+        The stored content version only moves on imports, and is what files
+        derived from the catalog, like its search index, are checked against.
+        ``version`` also covers the file's signature, which moves when it is
+        written to directly, e.g. with a SQL UPDATE.
+        """
+        row = self._connection().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        content_version = row[0] if row else ''
+        stat = os.stat(self.path)
+        signature = f'{content_version}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}'
+        return content_version, hashlib.sha1(signature.encode()).hexdigest()
+
+    def get_site(self, site_id):
+        with self._cache_lock:
+            site = self._cache.get(site_id)
+            if site is not None:
+                self._cache.move_to_end(site_id)
+                return site
+        row = self._connection().execute(
+            'SELECT data FROM sites WHERE site_id = ?', (site_id,)).fetchone()
+        if row is None:
+            return None
+        site = json.loads(row[0])
+        with self._cache_lock:
+            self._cache[site_id] = site
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return site
+
+    def get_sites(self, site_ids):
+        found, wanted = {}, []
+        with self._cache_lock:
+            for site_id in site_ids:
+                site = self._cache.get(site_id)
+                if site is None:
+                    wanted.append(site_id)
+                else:
+                    found[site_id] = site
+        conn = self._connection()
+        for start in range(0, len(wanted), 500):
+            chunk = wanted[start:start + 500]
+            rows = conn.execute(
+                f'SELECT site_id, data FROM sites WHERE site_id IN ({",".join("?" * len(chunk))})', chunk)
+            found.update((site_id, json.loads(data)) for site_id, data in rows)
+        return found
+
+    def get_nearby(self, site_id):
+        rows = self._connection().execute(
+            'SELECT data FROM attractions WHERE site_id = ? ORDER BY position', (site_id,))
+        return [json.loads(data) for data, in rows]
+
+    def get_translation(self, site_id, language):
+        row = self._connection().execute(
+            'SELECT data FROM site_translations WHERE site_id = ? AND language = ?', (site_id, language)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_translations(self, site_ids, language):
+        found = {}
+        conn = self._connection()
+        for start in range(0, len(site_ids), 500):
+            chunk = site_ids[start:start + 500]
+            rows = conn.execute(
+                f'SELECT site_id, data FROM site_translations WHERE language = ? '
+                f'AND site_id IN ({",".join("?" * len(chunk))})', [language, *chunk])
+            found.update((site_id, json.loads(data)) for site_id, data in rows)
+        return found
+
+    def translation_languages(self, site_id):
+        rows = self._connection().execute(
+            'SELECT language FROM site_translations WHERE site_id = ? ORDER BY language', (site_id,))
+        return [language for language, in rows]
+
+    def site_ids_by_location(self, location):
+        rows = self._connection().execute(
+            'SELECT site_id FROM sites WHERE location_key = ? ORDER BY position',
+            (_index_key(location),))
+        return [site_id for site_id, in rows]
+
+    def site_ids_by_style(self, architectural_style):
+        rows = self._connection().execute(
+            'SELECT site_id FROM sites WHERE style_key = ? ORDER BY position',
+            (_index_key(architectural_style),))
+        return [site_id for site_id, in rows]
+
+    def regions(self):
+        return dict(self._connection().execute('SELECT region_key, COUNT(*) FROM sites GROUP BY region_key'))
+
+    def site_ids_by_region(self, region, limit=None):
+        rows = self._connection().execute(
+            'SELECT site_id FROM sites WHERE region_key = ? ORDER BY site_id LIMIT ?',
+            (region, -1 if limit is None else limit))
+        return [site_id for site_id, in rows]
+
+    def items(self):
+        # Iterate on a dedicated cursor so callers can stream the whole
+        # catalog without materialising it.
+        for site_id, data in self._connection().execute(
+                'SELECT site_id, data FROM sites ORDER BY position'):
+            yield site_id, json.loads(data)
+
+    def query_sites(self, location=None, style=None, language=None, sort='name', after=None, limit=24):
+        field, descending = parse_sort(sort)
+        column = {'name': 'name_key', 'location': 'location_key', 'style': 'style_key'}[field]
+        # Every filter and sort combination has an index that yields the rows
+        # in order, so a page never sorts the matching sites. A language
+        # filter walks site_languages, which repeats the keys, and only
+        # looks up the sites on the page.
+        table = 'site_languages AS f CROSS JOIN sites AS s USING (site_id)' if language else 'sites AS f'
+        where, params = [], []
+        if language:
+            where.append('f.language_key = ?')
+            params.append(_index_key(language))
+        if location:
+            where.append('f.location_key = ?')
+            params.append(_index_key(location))
+        if style:
+            where.append('f.style_key = ?')
+            params.append(_index_key(style))
+        if after and {'location': location, 'style': style}.get(field):
+            # The filter fixes the sort value, so only site_id moves on
+            where.append(f'f.site_id {"<" if descending else ">"} ?')
+            params.append(after[1])
+        elif after:
+            where.append(f'(f.{column}, f.site_id) {"<" if descending else ">"} (?, ?)')
+            params.extend(after)
+        direction = 'DESC' if descending else 'ASC'
+        rows = self._connection().execute(
+            f'SELECT f.site_id, f.{column}, {"s" if language else "f"}.data FROM {table} '
+            f'{"WHERE " + " AND ".join(where) if where else ""} '
+            f'ORDER BY f.{column} {direction}, f.site_id {direction} LIMIT ?',
+            params + [limit + 1]).fetchall()
+        page = rows[:limit]
+        next_after = [page[-1][1], page[-1][0]] if len(rows) > limit else None
+        return [(site_id, json.loads(data)) for site_id, _, data in page], next_after
+
+    def count(self):
+        return self._connection().execute('SELECT COUNT(*) FROM sites').fetchone()[0]
+
+    def attraction_points(self):
+        rows = self._connection().execute(
+            'SELECT id, lat, lon FROM attractions WHERE lat IS NOT NULL AND lon IS NOT NULL').fetchall()
+        return [r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows]
+
+    def get_attractions(self, keys):
+        found = {}
+        conn = self._connection()
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = conn.execute(
+                f'SELECT id, data FROM attractions WHERE id IN ({",".join("?" * len(chunk))})', chunk)
+            found.update((key, json.loads(data)) for key, data in rows)
+        return [found[key] for key in keys]
+
+    def _insert(self, conn, rows):
+        site_rows, language_rows, attraction_rows, translation_rows = rows
+        conn.executemany(
+            'INSERT OR REPLACE INTO sites (site_id, position, name_key, location_key, style_key, region_key, data) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', site_rows)
+        conn.executemany('INSERT OR IGNORE INTO site_languages (language_key, site_id, name_key, location_key, '
+                         'style_key) VALUES (?, ?, ?, ?, ?)', language_rows)
+        conn.executemany('INSERT INTO attractions (site_id, position, lat, lon, data) VALUES (?, ?, ?, ?, ?)',
+                         attraction_rows)
+        conn.executemany('INSERT INTO site_translations (site_id, language, data) VALUES (?, ?, ?)',
+                         translation_rows)
+
+    def _changed(self, conn):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (uuid.uuid4().hex,))
+
+    def import_sites(self, sites, nearby=None, translations=None):
+        conn = self._connection()
+        start = conn.execute('SELECT COALESCE(MAX(position) + 1, 0) FROM sites').fetchone()[0]
+        with conn:
+            conn.executemany('DELETE FROM site_languages WHERE site_id = ?', ((site_id,) for site_id in sites))
+            conn.executemany('DELETE FROM attractions WHERE site_id = ?', ((site_id,) for site_id in nearby or {}))
+            conn.executemany('DELETE FROM site_translations WHERE site_id = ?',
+                             ((site_id,) for site_id in translations or {}))
+            self._insert(conn, catalog_rows(start, sites, nearby, translations))
+            self._changed(conn)
+        self._reset()
+
+    def bulk_import(self, chunks):
+        """Load chunks of ``catalog_rows`` into an empty catalog.
+
+        Much faster than ``import_sites`` for millions of sites: secondary
+        indexes are built once at the end instead of row by row, and nothing
+        is journaled, so a load that fails leaves a file to delete. The rows
+        can be built in other processes while earlier chunks are written.
+        """
+        conn = self._connection()
+        if self.count():
+            raise ValueError('bulk_import needs an empty catalog')
+        indexes = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall()
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute('PRAGMA synchronous=OFF')
+        # Index builds sort every row; let SQLite spread that over the CPUs
+        conn.execute(f'PRAGMA threads={os.cpu_count() or 1}')
+        try:
+            for name, _ in indexes:
+                conn.execute(f'DROP INDEX {name}')
+            with conn:
+                for rows in chunks:
+                    self._insert(conn, rows)
+            for _, sql in indexes:
+                conn.execute(sql)
+            with conn:
+                self._changed(conn)
+        finally:
+            conn.execute('PRAGMA journal_mode=DELETE')
+            conn.execute('PRAGMA synchronous=FULL')
+            conn.execute('PRAGMA threads=0')
+        self._reset()
+
+    def _reset(self):
+        self.content_version, self.version = self._read_version()
+        with self._cache_lock:
+            self._cache.clear()
+        self._attraction_index = None
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def open_catalog(uri, sites=None, nearby=None, translations=None, writable=False):
+    """Open a catalog from a URI such as ``memory`` or ``sqlite:///catalog.db``.
+
+    ``sites``/``nearby``/``translations`` seed the memory backend, and an
+    empty SQLite catalog opened ``writable``. SQLite catalogs are otherwise
+    opened read-only.
+    """
+    if uri in (None, '', 'memory'):
+        store = MemoryCatalogStore(sites, nearby, translations)
+    elif uri.startswith('sqlite:///'):
+        store = SQLiteCatalogStore(uri[len('sqlite:///'):], writable=writable)
+        if writable and sites and store.count() == 0:
+            store.import_sites(sites, nearby, translations)
+    else:
+        raise ValueError(f'Unsupported catalog URI: {uri}')
+    store.attraction_index()
+    return store
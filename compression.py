@@ -0,0 +1,94 @@
+"""Response compression.
+
+gzip is always available; brotli and zstd are used when their packages are
+installed. ``init_app`` compresses ordinary responses on the way out; cached
+pages and static assets store their compressed bytes instead, and arrive here
+already encoded.
+"""
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compression levels: 'fast' for bytes compressed once per response, 'best'
+# for bytes that are compressed once and then served from a cache
+LEVELS = {
+    'gzip': {'fast': 6, 'best': 9},
+    'br': {'fast': 4, 'best': 11},
+    'zstd': {'fast': 3, 'best': 19},
+}
+
+
+def _compressors():
+    compressors = {'gzip': lambda body, level: gzip.compress(body, compresslevel=level, mtime=0)}
+    if brotli is not None:
+        compressors['br'] = lambda body, level: brotli.compress(body, quality=level)
+    if zstandard is not None:
+        compressors['zstd'] = lambda body, level: zstandard.ZstdCompressor(level=level).compress(body)
+    return compressors
+
+
+COMPRESSORS = _compressors()
+
+# Preferred first; the order a client lists encodings in is ignored
+ENCODING_PREFERENCE = ('br', 'zstd', 'gzip')
+
+COMPRESSIBLE_MIMETYPES = frozenset([
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+    'application/json', 'application/x-ndjson', 'image/svg+xml',
+])
+
+
+def choose_encoding(accept_encodings, available=COMPRESSORS):
+    """Pick the best of ``available`` that the request's Accept-Encoding allows."""
+    for encoding in ENCODING_PREFERENCE:
+        if encoding in available and accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress(body, encoding, level='fast'):
+    return COMPRESSORS[encoding](body, LEVELS[encoding][level])
+
+
+def add_vary(response, header):
+    if header not in response.vary:
+        response.vary.add(header)
+
+
+def compress_response(response, accept_encodings, min_size):
+    """Compress a finished response in place when it is worth it."""
+    if (response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.status_code < 200 or response.status_code in (204, 304)):
+        return response
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+    add_vary(response, 'Accept-Encoding')
+    encoding = choose_encoding(accept_encodings)
+    if encoding is None:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    # A strong validator must change with the representation
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+    return response
+
+
+def init_app(app):
+    @app.after_request
+    def compress_after_request(response):
+        return compress_response(response, request.accept_encodings, app.config['COMPRESS_MIN_SIZE'])
@@ -0,0 +1,96 @@
+"""Spatial index for points of interest.
+
+Points are bucketed into a fixed lat/lon grid and stored sorted by cell, so a
+radius query only has to touch the few contiguous slices of the arrays that
+overlap its bounding box; the distance math on the candidates is vectorized.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distances in km from one point to arrays of points (degrees in)."""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons) - np.radians(lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def format_distance(km):
+    if km < 10:
+        return f"{km:.1f} km"
+    return f"{km:.0f} km"
+
+
+class GeoIndex:
+    def __init__(self, keys, lats, lons, cell_degrees=0.25):
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        self.cell_degrees = cell_degrees
+        self.n_rows = int(math.ceil(180 / cell_degrees))
+        self.n_cols = int(math.ceil(360 / cell_degrees))
+        cells = self._cells(self._row(lats), self._col(lons))
+        order = np.argsort(cells, kind='stable')
+        self.cells = cells[order]
+        self.lats = lats[order]
+        self.lons = lons[order]
+        self.keys = np.asarray(keys)[order]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _row(self, lats):
+        return np.clip(((np.asarray(lats) + 90) // self.cell_degrees).astype(np.int64), 0, self.n_rows - 1)
+
+    def _col(self, lons):
+        return np.clip(((np.asarray(lons) + 180) // self.cell_degrees).astype(np.int64), 0, self.n_cols - 1)
+
+    def _cells(self, rows, cols):
+        return rows * self.n_cols + cols
+
+    def _candidates(self, lat, lon, radius_km):
+        dlat = radius_km / KM_PER_DEGREE
+        lat_lo, lat_hi = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        # Longitude degrees shrink towards the poles, so widen the box by the
+        # worst-case latitude it covers.
+        cos_lat = math.cos(math.radians(max(abs(lat_lo), abs(lat_hi))))
+        if cos_lat < 1e-6 or dlat / cos_lat >= 180:
+            col_ranges = [(0, self.n_cols - 1)]
+        else:
+            dlon = dlat / cos_lat
+            c0 = int(self._col(((lon - dlon + 180) % 360) - 180))
+            c1 = int(self._col(((lon + dlon + 180) % 360) - 180))
+            col_ranges = [(c0, c1)] if c0 <= c1 else [(0, c1), (c0, self.n_cols - 1)]
+
+        r0, r1 = int(self._row(lat_lo)), int(self._row(lat_hi))
+        if len(col_ranges) == 1 and col_ranges[0] == (0, self.n_cols - 1):
+            bounds = [(r0 * self.n_cols, r1 * self.n_cols + self.n_cols - 1)]
+        else:
+            bounds = [(row * self.n_cols + c0, row * self.n_cols + c1)
+                      for row in range(r0, r1 + 1) for c0, c1 in col_ranges]
+        lo = np.searchsorted(self.cells, [b[0] for b in bounds], side='left')
+        hi = np.searchsorted(self.cells, [b[1] for b in bounds], side='right')
+        slices = [np.arange(a, b) for a, b in zip(lo, hi) if b > a]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    def query(self, lat, lon, radius_km, limit):
+        """Return ``(keys, distances_km)`` of the nearest points within the radius."""
+        candidates = self._candidates(lat, lon, radius_km)
+        if not len(candidates):
+            return [], []
+        distances = haversine_km(lat, lon, self.lats[candidates], self.lons[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        if len(distances) > limit:
+            nearest = np.argpartition(distances, limit - 1)[:limit]
+            candidates, distances = candidates[nearest], distances[nearest]
+        order = np.argsort(distances, kind='stable')
+        return self.keys[candidates[order]].tolist(), distances[order].tolist()
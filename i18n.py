@@ -0,0 +1,40 @@
+"""Languages and translated site content.
+
+Languages are identified by the names sites list under ``languages``;
+``LANGUAGE_CODES`` maps them to the BCP 47 tags used in Accept-Language and
+Content-Language.
+"""
+DEFAULT_LANGUAGE = 'English'
+
+LANGUAGE_CODES = {
+    'English': 'en',
+    'Hindi': 'hi',
+    'Spanish': 'es',
+    'French': 'fr',
+    'German': 'de',
+    'Japanese': 'ja',
+    'Italian': 'it',
+    'Mandarin': 'zh',
+}
+
+LANGUAGES_BY_CODE = {code: language for language, code in LANGUAGE_CODES.items()}
+
+# Fields a translation may override; coordinates, languages etc. are shared
+TRANSLATABLE_FIELDS = ('name', 'location', 'description', 'history', 'architectural_style', 'fun_facts')
+
+
+def negotiate_language(accept_languages):
+    """Best supported language for an Accept-Language header, else the default."""
+    # Match on the primary subtag, so fr-CA still gets French
+    for value, quality in accept_languages:
+        language = LANGUAGES_BY_CODE.get(value.split('-')[0].lower())
+        if language and quality > 0:
+            return language
+    return DEFAULT_LANGUAGE
+
+
+def localize(site, translation):
+    """Return ``site`` with its translatable fields replaced by ``translation``."""
+    if not translation:
+        return site
+    return dict(site, **{field: value for field, value in translation.items() if field in TRANSLATABLE_FIELDS})
@@ -0,0 +1,286 @@
+"""Request metrics in the Prometheus text format.
+
+Every request is counted by endpoint, method and status, with histograms of
+its latency and response size. ``timed(phase)`` adds the time a request spent
+in a phase to its phase histogram. The catalog and answer lookups count as
+``data``, and template rendering and JSON encoding count as ``render``.
+Latency runs until the last byte is sent, so streamed answers and model
+downloads are measured in full.
+
+Each worker process counts its own requests. With ``METRICS_DIR`` set, workers
+also save a snapshot there, at most once per ``METRICS_FLUSH_INTERVAL``
+seconds, and ``/metrics`` adds up the snapshots of all of them.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from flask.signals import before_render_template, template_rendered
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000, 100000000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def new_histogram(buckets):
+    # Per-bucket counts (the last one is +Inf), then sum and count
+    return {"buckets": [0] * (len(buckets) + 1), "sum": 0.0, "count": 0}
+
+
+def observe(histogram, buckets, value):
+    histogram['buckets'][bisect_left(buckets, value)] += 1
+    histogram['sum'] += value
+    histogram['count'] += 1
+
+
+def copy_histogram(histogram):
+    return dict(histogram, buckets=list(histogram['buckets']))
+
+
+def merge_histogram(into, histogram):
+    into['buckets'] = [a + b for a, b in zip(into['buckets'], histogram['buckets'])]
+    into['sum'] += histogram['sum']
+    into['count'] += histogram['count']
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to the current request's ``phase``.
+
+    Nested blocks of the same phase are only counted once.
+    """
+    if not has_request_context():
+        yield
+        return
+    depth = g.setdefault('metrics_depth', {})
+    if depth.get(phase):
+        yield
+        return
+    depth[phase] = 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        depth[phase] = 0
+        phases = g.setdefault('metrics_phases', {})
+        phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - started
+
+
+class TimedProxy:
+    """Wraps an object so that each of its method calls is timed as ``phase``."""
+
+    def __init__(self, target, phase):
+        self._target = target
+        self._phase = phase
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            with timed(self._phase):
+                return value(*args, **kwargs)
+        return call
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, with encoding timed as ``render``."""
+
+    def dumps(self, obj, **kwargs):
+        with timed('render'):
+            return super().dumps(obj, **kwargs)
+
+
+class Metrics:
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.requests = {}
+        self.latency = {}
+        self.sizes = {}
+        self.phases = {}
+        self.in_flight = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def start(self, endpoint):
+        with self._lock:
+            self.in_flight[endpoint] = self.in_flight.get(endpoint, 0) + 1
+
+    def finish(self, endpoint, method, status, size, seconds, phases):
+        with self._lock:
+            self.in_flight[endpoint] -= 1
+            key = (endpoint, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            observe(self.latency.setdefault(endpoint, new_histogram(LATENCY_BUCKETS)), LATENCY_BUCKETS, seconds)
+            if size is not None:
+                observe(self.sizes.setdefault(endpoint, new_histogram(SIZE_BUCKETS)), SIZE_BUCKETS, size)
+            for phase, phase_seconds in phases.items():
+                observe(self.phases.setdefault((endpoint, phase), new_histogram(LATENCY_BUCKETS)),
+                        LATENCY_BUCKETS, phase_seconds)
+        if self.directory and time.monotonic() - self._last_flush > self.flush_interval:
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": [[*key, count] for key, count in self.requests.items()],
+                "latency": {endpoint: copy_histogram(h) for endpoint, h in self.latency.items()},
+                "sizes": {endpoint: copy_histogram(h) for endpoint, h in self.sizes.items()},
+                "phases": [[endpoint, phase, copy_histogram(h)] for (endpoint, phase), h in self.phases.items()],
+                "in_flight": dict(self.in_flight),
+            }
+
+    def flush(self):
+        """Save this process's snapshot for the other workers' ``/metrics``."""
+        self._last_flush = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, os.path.join(self.directory, f'{os.getpid()}.json'))
+
+    def collect(self):
+        """Return the snapshot of every worker added together."""
+        snapshots = [self.snapshot()]
+        if self.directory and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                pid = name[:-len('.json')]
+                if not name.endswith('.json') or pid == str(os.getpid()):
+                    continue
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                # Requests of workers that have exited still count; their
+                # in-flight ones are gone
+                if not pid_alive(int(pid)):
+                    snapshot['in_flight'] = {}
+                snapshots.append(snapshot)
+        total = {"requests": {}, "latency": {}, "sizes": {}, "phases": {}, "in_flight": {}}
+        for snapshot in snapshots:
+            for *key, count in snapshot['requests']:
+                total['requests'][tuple(key)] = total['requests'].get(tuple(key), 0) + count
+            for name, buckets in (('latency', LATENCY_BUCKETS), ('sizes', SIZE_BUCKETS)):
+                for endpoint, histogram in snapshot[name].items():
+                    merge_histogram(total[name].setdefault(endpoint, new_histogram(buckets)), histogram)
+            for endpoint, phase, histogram in snapshot['phases']:
+                merge_histogram(total['phases'].setdefault((endpoint, phase), new_histogram(LATENCY_BUCKETS)),
+                                histogram)
+            for endpoint, count in snapshot['in_flight'].items():
+                total['in_flight'][endpoint] = total['in_flight'].get(endpoint, 0) + count
+        return total
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        total = self.collect()
+        lines = []
+
+        def histogram_lines(name, labels, histogram, buckets):
+            cumulative = 0
+            for bound, count in zip([*buckets, '+Inf'], histogram['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram["sum"]}')
+            lines.append(f'{name}_count{{{labels}}} {histogram["count"]}')
+
+        lines += ['# HELP http_requests_total Requests by endpoint, method and status.',
+                  '# TYPE http_requests_total counter']
+        for (endpoint, method, status), count in sorted(total['requests'].items()):
+            lines.append(f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+        lines += ['# HELP http_requests_in_flight Requests being served.',
+                  '# TYPE http_requests_in_flight gauge']
+        for endpoint, count in sorted(total['in_flight'].items()):
+            lines.append(f'http_requests_in_flight{{endpoint="{endpoint}"}} {count}')
+        lines += ['# HELP http_request_duration_seconds Time from the request starting until its last byte is sent.',
+                  '# TYPE http_request_duration_seconds histogram']
+        for endpoint, histogram in sorted(total['latency'].items()):
+            histogram_lines('http_request_duration_seconds', f'endpoint="{endpoint}"', histogram, LATENCY_BUCKETS)
+        lines += ['# HELP http_response_size_bytes Response body size.',
+                  '# TYPE http_response_size_bytes histogram']
+        for endpoint, histogram in sorted(total['sizes'].items()):
+            histogram_lines('http_response_size_bytes', f'endpoint="{endpoint}"', histogram, SIZE_BUCKETS)
+        lines += ['# HELP http_request_phase_seconds Time a request spent on data lookups or rendering.',
+                  '# TYPE http_request_phase_seconds histogram']
+        for (endpoint, phase), histogram in sorted(total['phases'].items()):
+            histogram_lines('http_request_phase_seconds', f'endpoint="{endpoint}",phase="{phase}"',
+                            histogram, LATENCY_BUCKETS)
+        return '\n'.join(lines) + '\n'
+
+
+def counting(iterable, counter):
+    """Yield from ``iterable``, adding the bytes sent to ``counter[0]``."""
+    try:
+        for chunk in iterable:
+            counter[0] += len(chunk)
+            yield chunk
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+
+
+def init_app(app, metrics):
+    """Record every request of ``app``.
+
+    Call it before extensions that rewrite responses in ``after_request``,
+    such as compression, so the sizes recorded are the ones sent.
+    """
+    app.extensions['metrics'] = metrics
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_endpoint = request.endpoint or 'unmatched'
+        metrics.start(g.metrics_endpoint)
+
+    @app.after_request
+    def record_request(response):
+        if 'metrics_started' not in g:
+            return response
+        started, endpoint = g.metrics_started, g.metrics_endpoint
+        phases = g.setdefault('metrics_phases', {})
+        method, status = request.method, response.status_code
+        size = [response.content_length]
+        if size[0] is None:
+            size = [0]
+            response.response = counting(response.response, size)
+        # Recorded once the body has been sent, which for streamed responses
+        # is long after this hook runs
+        response.call_on_close(lambda: metrics.finish(
+            endpoint, method, status, size[0], time.perf_counter() - started, phases))
+        return response
+
+    def render_started(sender, **extra):
+        if has_request_context() and not g.get('metrics_depth', {}).get('render'):
+            g.metrics_render_started = time.perf_counter()
+            g.setdefault('metrics_depth', {})['render'] = 1
+
+    def render_finished(sender, **extra):
+        if has_request_context() and 'metrics_render_started' in g:
+            g.metrics_depth['render'] = 0
+            phases = g.setdefault('metrics_phases', {})
+            phases['render'] = phases.get('render', 0.0) + time.perf_counter() - g.pop('metrics_render_started')
+
+    # Strong references: the handlers only live in this closure
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
@@ -0,0 +1,393 @@
+"""Offline content packs.
+
+A pack bundles everything a region needs offline: the site data plus any
+maps, audio and AR files found under ``<media_dir>/<kind>/<site_id>/``. Packs
+are deterministic zip archives named by a hash of their content, so a
+version never changes once published and can be cached and range-served
+forever.
+
+Archives are split into content-defined chunks: boundaries are picked by a
+rolling hash of the bytes themselves, so editing one site moves only the
+chunks around that edit and the rest keep their offsets-independent hashes.
+The manifest lists every chunk's checksum, which lets clients verify and
+resume downloads chunk by chunk, and update an installed pack by fetching
+only the chunks it does not already have.
+
+Building a pack reads every site of its region, so requests never wait for
+one: when the catalog changes they keep getting the last built version
+while a background thread (or ``python Website.py packs``) builds the new
+one, and a region that was never built answers 503 until it is ready.
+"""
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+from catalog import slugify
+
+MEDIA_KINDS = ('maps', 'audio', 'ar')
+
+# Fixed timestamp so identical content always produces identical archives
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+DOWNLOAD_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Random but fixed byte -> value table for the rolling (gear) hash
+GEAR = np.array([int.from_bytes(hashlib.sha256(bytes([i])).digest()[:4], 'big') for i in range(256)],
+                dtype=np.uint32)
+
+
+def sha256_hex(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path, block_size=1024 * 1024):
+    """Return ``(size, sha256)`` of a file without reading it into memory at once."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+            size += len(block)
+    return size, digest.hexdigest()
+
+
+def chunk_boundaries(path, avg_size, block_size=8 * 1024 * 1024):
+    """Return the end offsets of a file's content-defined chunks.
+
+    A gear hash is computed for every byte position; a position whose low
+    bits are all zero is a cut point candidate. The masked bits only depend
+    on the last ``bits`` bytes, so the hash is evaluated a block at a time
+    with NumPy instead of byte by byte. Chunks are kept between a quarter
+    and four times ``avg_size``.
+    """
+    min_size, max_size = avg_size // 4, avg_size * 4
+    bits = max((avg_size - min_size).bit_length() - 1, 1)
+    mask = np.uint32((1 << bits) - 1)
+    candidates = []
+    size = 0
+    tail = b''
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            data = np.frombuffer(tail + block, dtype=np.uint8)
+            gear = GEAR[data]
+            h = np.zeros(len(data), dtype=np.uint32)
+            for k in range(min(bits, len(data))):
+                h[k:] += gear[:len(data) - k] << np.uint32(k)
+            # Positions inside the carried-over tail were checked last block
+            positions = np.flatnonzero((h & mask) == 0)
+            positions = positions[positions >= len(tail)]
+            candidates.extend((positions + (size - len(tail) + 1)).tolist())
+            size += len(block)
+            tail = bytes(data[-(bits - 1):]) if bits > 1 else b''
+
+    cuts, start = [], 0
+    for cut in candidates + [size]:
+        while cut - start > max_size:
+            start += max_size
+            cuts.append(start)
+        if cut - start >= min_size or (cut == size and cut > start):
+            cuts.append(cut)
+            start = cut
+    return cuts
+
+
+def content_chunks(path, avg_size):
+    """Return ``[{offset, size, sha256}, ...]`` for a file's content-defined chunks."""
+    chunks, offset = [], 0
+    with open(path, 'rb') as f:
+        for end in chunk_boundaries(path, avg_size):
+            chunks.append({"offset": offset, "size": end - offset, "sha256": sha256_hex(f.read(end - offset))})
+            offset = end
+    return chunks
+
+
+class PackBuilder:
+    def __init__(self, pack_dir, media_dir, chunk_size):
+        self.pack_dir = pack_dir
+        self.media_dir = media_dir
+        self.chunk_size = chunk_size
+        self._regions = (None, {})
+        self._lock = threading.Lock()
+        self._building = set()
+
+    def regions(self, catalog):
+        """Return ``{region: site count}``, read again when the catalog changes."""
+        version, regions = self._regions
+        if version != catalog.version:
+            regions = catalog.regions()
+            self._regions = (catalog.version, regions)
+        return regions
+
+    def _media_files(self, site_id):
+        for kind in MEDIA_KINDS:
+            root = os.path.join(self.media_dir, kind, site_id)
+            for dirpath, _, filenames in os.walk(root):
+                for filename in sorted(filenames):
+                    path = os.path.join(dirpath, filename)
+                    yield f'{kind}/{site_id}/{os.path.relpath(path, root).replace(os.sep, "/")}', path
+
+    def pack_files(self, catalog, site_ids):
+        """Yield ``(archive path, bytes or media file path)`` for a region's pack.
+
+        Site data is small and generated; media is referenced by path so it is
+        streamed into the archive rather than held in memory.
+        """
+        for site_id in sorted(site_ids):
+            site = catalog.get_site(site_id)
+            if site is None:
+                continue
+            data = {"site_id": site_id, "site": site, "nearby_attractions": catalog.get_nearby(site_id),
+                    "translations": {language: catalog.get_translation(site_id, language)
+                                     for language in catalog.translation_languages(site_id)}}
+            yield f'sites/{site_id}.json', json.dumps(data, sort_keys=True, ensure_ascii=False).encode('utf-8')
+            yield from self._media_files(site_id)
+
+    def _region_dir(self, region):
+        return os.path.join(self.pack_dir, slugify(region))
+
+    def archive_path(self, region, version):
+        return os.path.join(self._region_dir(region), f'{version}.zip')
+
+    def manifest(self, region, version):
+        path = os.path.join(self._region_dir(region), f'{version}.json')
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_atomic(self, path, data):
+        # Concurrent builders in other workers may race us; whoever renames
+        # last wins, and both wrote identical bytes anyway
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def build(self, catalog, region, wait=True):
+        """Build the region's pack for this catalog version and make it current.
+
+        Holds the region's lock file, so one process builds at a time; with
+        ``wait=False`` returns None instead of waiting for another builder.
+        """
+        if region not in self.regions(catalog):
+            return None
+        region_dir = self._region_dir(region)
+        os.makedirs(region_dir, exist_ok=True)
+        with open(os.path.join(region_dir, '.lock'), 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return None
+            current = self._current(region)
+            if current and current['catalog_version'] == catalog.version:
+                manifest = self.manifest(region, current['version'])
+                if manifest is not None:
+                    return manifest
+            return self._build(catalog, region, catalog.site_ids_by_region(region))
+
+    def _build(self, catalog, region, site_ids):
+        region_dir = self._region_dir(region)
+        files = list(self.pack_files(catalog, site_ids))
+        listing = []
+        for arcname, source in files:
+            size, digest = (len(source), sha256_hex(source)) if isinstance(source, bytes) else file_digest(source)
+            listing.append({"path": arcname, "size": size, "sha256": digest})
+        # The chunking parameters shape the manifest, so they are part of the version
+        version = sha256_hex(json.dumps([self.chunk_size, listing], sort_keys=True).encode('utf-8'))[:16]
+
+        manifest = self.manifest(region, version)
+        if manifest is None:
+            fd, tmp = tempfile.mkstemp(dir=region_dir, prefix='.tmp-')
+            os.close(fd)
+            with zipfile.ZipFile(tmp, 'w', allowZip64=True) as archive:
+                for arcname, source in files:
+                    info = zipfile.ZipInfo(arcname, ZIP_DATE)
+                    # Media is already compressed; only the JSON benefits
+                    info.compress_type = zipfile.ZIP_DEFLATED if arcname.endswith('.json') else zipfile.ZIP_STORED
+                    if isinstance(source, bytes):
+                        archive.writestr(info, source)
+                    else:
+                        with open(source, 'rb') as src, archive.open(info, 'w', force_zip64=True) as dst:
+                            shutil.copyfileobj(src, dst, 1024 * 1024)
+            size, digest = file_digest(tmp)
+            chunks = content_chunks(tmp, self.chunk_size)
+            os.replace(tmp, self.archive_path(region, version))
+            manifest = {
+                "region": region,
+                "version": version,
+                "size": size,
+                "sha256": digest,
+                "chunks": chunks,
+                "sites": sorted(site_ids),
+                "files": listing,
+            }
+            self._write_atomic(os.path.join(region_dir, f'{version}.json'),
+                               json.dumps(manifest, indent=1).encode('utf-8'))
+        self._write_atomic(os.path.join(region_dir, 'current.json'), json.dumps(
+            {"catalog_version": catalog.version, "version": version}).encode('utf-8'))
+        return manifest
+
+    def _current(self, region):
+        try:
+            with open(os.path.join(self._region_dir(region), 'current.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def current(self, catalog, region):
+        """Manifest of the region's last built pack, or None if there is none yet.
+
+        When it was built from another catalog version, a background build
+        of the current one is started and the old pack is served meanwhile.
+        """
+        current = self._current(region)
+        manifest = self.manifest(region, current['version']) if current else None
+        if manifest is None or current['catalog_version'] != catalog.version:
+            self.build_later(catalog, region)
+        return manifest
+
+    def build_later(self, catalog, region):
+        """Start building the region's pack in a thread; False if one is running."""
+        with self._lock:
+            if region in self._building:
+                return False
+            self._building.add(region)
+        threading.Thread(target=self._build_later, args=(catalog, region),
+                         name=f'pack-{slugify(region)}', daemon=True).start()
+        return True
+
+    def _build_later(self, catalog, region):
+        try:
+            self.build(catalog, region, wait=False)
+        finally:
+            with self._lock:
+                self._building.discard(region)
+
+    def diff(self, catalog, region, from_version):
+        """Describe how to update an installed pack to the current version.
+
+        ``missing`` indexes the current manifest's chunks whose content the
+        client does not have yet; every other chunk can be reused from the
+        installed version. Unknown versions get the whole pack. None if the
+        region has no pack yet.
+        """
+        manifest = self.current(catalog, region)
+        if manifest is None:
+            return None
+        old = self.manifest(region, from_version) if re.fullmatch(r'[0-9a-f]{16}', from_version or '') else None
+        have = {chunk['sha256'] for chunk in old['chunks']} if old else set()
+        missing = [i for i, chunk in enumerate(manifest['chunks']) if chunk['sha256'] not in have]
+        old_files = {f['path']: f['sha256'] for f in old['files']} if old else {}
+        new_files = {f['path']: f['sha256'] for f in manifest['files']}
+        return {
+            "region": region,
+            "from": from_version if old else None,
+            "to": manifest['version'],
+            "size": manifest['size'],
+            "sha256": manifest['sha256'],
+            "chunks": manifest['chunks'],
+            "missing": missing,
+            "download_bytes": sum(manifest['chunks'][i]['size'] for i in missing),
+            "changed_files": sorted(path for path, digest in new_files.items() if old_files.get(path) != digest),
+            "removed_files": sorted(set(old_files) - set(new_files)),
+        }
+
+
+class DownloadProgress:
+    """Bytes actually sent per download id, shared between worker processes.
+
+    Each process only ever writes its own ``<download_id>.<pid>`` counter
+    file, so there are no cross-process races; readers sum the files. A
+    process keeps at most ``max_tracked`` counters, deleting the files of
+    those it forgets, and prunes idle ones every ``prune_interval`` seconds.
+    """
+
+    def __init__(self, directory, flush_bytes=1024 * 1024, max_tracked=10000, max_age=86400,
+                 prune_interval=3600):
+        self.directory = directory
+        self.flush_bytes = flush_bytes
+        self.max_tracked = max_tracked
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        self._totals = OrderedDict()
+        self._unflushed = {}
+        self._lock = threading.Lock()
+        self._pruned = time.monotonic()
+
+    def _path(self, download_id, pid=None):
+        return os.path.join(self.directory, f'{download_id}.{pid or os.getpid()}')
+
+    def add(self, download_id, nbytes):
+        stale = None
+        with self._lock:
+            new = download_id not in self._totals
+            self._totals[download_id] = self._totals.get(download_id, 0) + nbytes
+            self._totals.move_to_end(download_id)
+            if len(self._totals) > self.max_tracked:
+                stale, _ = self._totals.popitem(last=False)
+                self._unflushed.pop(stale, None)
+            self._unflushed[download_id] = self._unflushed.get(download_id, 0) + nbytes
+            flush = self._unflushed[download_id] >= self.flush_bytes
+            prune = new and time.monotonic() - self._pruned >= self.prune_interval
+            if prune:
+                self._pruned = time.monotonic()
+        if stale is not None:
+            try:
+                os.remove(self._path(stale))
+            except FileNotFoundError:
+                pass
+        if prune:
+            self.prune()
+        if flush:
+            self.flush(download_id)
+
+    def flush(self, download_id):
+        with self._lock:
+            total = self._totals.get(download_id, 0)
+            self._unflushed[download_id] = 0
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(download_id), 'w') as f:
+            f.write(str(total))
+
+    def bytes_sent(self, download_id):
+        total = 0
+        for path in glob.glob(os.path.join(glob.escape(self.directory), glob.escape(download_id) + '.*')):
+            try:
+                with open(path) as f:
+                    total += int(f.read() or 0)
+            except (OSError, ValueError):
+                pass
+        return total
+
+    def counting(self, download_id, iterable):
+        """Wrap a response body so every byte handed to the server is counted."""
+        try:
+            for chunk in iterable:
+                self.add(download_id, len(chunk))
+                yield chunk
+        finally:
+            self.flush(download_id)
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    def prune(self, max_age=None):
+        """Remove counters of downloads that have been idle for ``max_age`` seconds."""
+        cutoff = time.time() - (self.max_age if max_age is None else max_age)
+        for path in glob.glob(os.path.join(glob.escape(self.directory), '*')):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                # Another process pruned it first
+                pass
@@ -0,0 +1,64 @@
+"""LRU cache for rendered pages.
+
+Entries are keyed by catalog version as well as by page, so publishing a new
+catalog version makes every old entry unreachable; they then age out of the
+LRU instead of needing an explicit purge.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def page_etag(*parts):
+    """Strong ETag for a page, derived from the versions and key that produced it."""
+    return hashlib.sha1(':'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+class CachedPage:
+    __slots__ = ('body', 'etag', 'mimetype', 'encoding')
+
+    def __init__(self, body, etag, mimetype='text/html', encoding=None):
+        self.body = body
+        self.etag = etag
+        self.mimetype = mimetype
+        self.encoding = encoding
+
+    @property
+    def size(self):
+        return len(self.body)
+
+
+class PageCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None:
+                self._entries.move_to_end(key)
+            return page
+
+    def put(self, key, page):
+        if page.size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            self._entries[key] = page
+            self.size += page.size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
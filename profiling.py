@@ -0,0 +1,129 @@
+"""Opt-in profiling of single requests.
+
+A request is profiled when it sends ``X-Profile`` with the configured
+``PROFILE_TOKEN`` in ``X-Profile-Token``. With ``PROFILE_SAMPLE_RATE`` set, a
+random share of all requests is profiled as well.
+
+``X-Profile: sample``, also used for the random share, samples the request
+thread's stack every ``PROFILE_INTERVAL_MS`` and saves collapsed stacks, one
+``frame;frame;... count`` line per stack, which flamegraph.pl and speedscope
+read. ``X-Profile: cprofile``
+saves a cProfile dump for pstats or snakeviz. Every other request only pays
+for one header lookup.
+"""
+import cProfile
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+PROFILE_ID_RE = re.compile(r'^[0-9]{8}T[0-9]{6}-[A-Za-z0-9_.]+-[0-9a-f]{8}\.(collapsed|prof)$')
+
+EXTENSIONS = {'sample': 'collapsed', 'cprofile': 'prof'}
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """Samples one thread's stack from a background thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+def authorized(token):
+    """Whether the request carries the profiling token."""
+    given = request.headers.get('X-Profile-Token', '')
+    return bool(token) and secrets.compare_digest(given.encode(), token.encode())
+
+
+def prune(directory, keep):
+    names = sorted(name for name in os.listdir(directory) if PROFILE_ID_RE.match(name))
+    for name in names[:-keep]:
+        os.remove(os.path.join(directory, name))
+
+
+def init_app(app):
+    config = app.config
+
+    @app.before_request
+    def start_profile():
+        mode = request.headers.get('X-Profile')
+        if mode is not None:
+            if mode not in EXTENSIONS or not authorized(config['PROFILE_TOKEN']):
+                return
+        elif not (config['PROFILE_SAMPLE_RATE'] and random.random() < config['PROFILE_SAMPLE_RATE']):
+            return
+        else:
+            mode = 'sample'
+        if mode == 'cprofile':
+            g.profiler = cProfile.Profile()
+            try:
+                g.profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one profiler at a time
+                del g.profiler
+                return
+        else:
+            g.profiler = StackSampler(threading.get_ident(), config['PROFILE_INTERVAL_MS'] / 1000)
+            g.profiler.start()
+        g.profile_id = '{}-{}-{}.{}'.format(time.strftime('%Y%m%dT%H%M%S'), request.endpoint or 'unmatched',
+                                            secrets.token_hex(4), EXTENSIONS[mode])
+
+    @app.after_request
+    def finish_profile(response):
+        if 'profiler' not in g:
+            return response
+        profiler, profile_id = g.profiler, g.profile_id
+        directory = config['PROFILE_DIR']
+
+        def save():
+            # After the last byte, so streamed bodies are included
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, profile_id)
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+                profiler.dump_stats(path)
+            else:
+                profiler.stop()
+                profiler.write(path)
+            prune(directory, config['PROFILE_MAX_FILES'])
+
+        response.call_on_close(save)
+        response.headers['X-Profile-Id'] = profile_id
+        return response
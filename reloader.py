@@ -0,0 +1,115 @@
+"""Reloading the catalog without restarting workers.
+
+``CatalogReloader`` holds the catalog being served together with its search
+index, as one ``LoadedCatalog``. ``reload()`` loads the next one in a
+background thread, indexes included, and swaps it in with a single
+assignment, so no request sees a catalog with another one's index. Caches
+keyed by catalog version, such as rendered pages and answers, stop matching
+and their old entries age out.
+
+``check()`` runs before each request and reloads when the catalog's SQLite
+file has changed, looking at most once per ``interval`` seconds. Each worker
+checks for itself, so a change reaches all of them. A new search index for
+the catalog counts as a change too. Update the file in
+place, or make the catalog path a symlink and point it at a new file; the
+SQLite store folds the file's signature into its version either way. Don't
+replace a file being served: threads of the old catalog would open the new
+one.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+from search import index_path
+
+LoadedCatalog = namedtuple('LoadedCatalog', 'catalog index')
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def source_signature(uri):
+    """What changes when the catalog at ``uri`` or its search index does, or
+    None if nothing can."""
+    if not (uri or '').startswith('sqlite:///'):
+        return None
+    path = uri[len('sqlite:///'):]
+    return file_signature(path), file_signature(index_path(path))
+
+
+class CatalogReloader:
+    """Serves ``load(uri)`` and swaps in a fresh one on ``reload()``.
+
+    ``prepare(loaded)``, if given, runs in the background thread before the
+    swap, to warm caches for the new catalog.
+    """
+
+    def __init__(self, load, uri, interval=None, prepare=None):
+        self.load = load
+        self.uri = uri
+        self.interval = interval
+        self.prepare = prepare
+        self.loading = False
+        self.error = None
+        # Taken before loading, so a change made during the load is seen
+        self.signature = source_signature(uri)
+        started = time.perf_counter()
+        self.current = load(uri)
+        self.loaded_at = time.time()
+        self.load_seconds = time.perf_counter() - started
+        self._lock = threading.Lock()
+        self._checked = time.monotonic()
+
+    def reload(self):
+        """Start loading the catalog again; False if a load is already running."""
+        with self._lock:
+            if self.loading:
+                return False
+            self.loading = True
+        threading.Thread(target=self._reload, name='catalog-reload', daemon=True).start()
+        return True
+
+    def _reload(self):
+        signature = source_signature(self.uri)
+        started = time.perf_counter()
+        try:
+            loaded = self.load(self.uri)
+            if self.prepare:
+                self.prepare(loaded)
+        except Exception as e:
+            # Keep serving the old catalog
+            self.error = f'{type(e).__name__}: {e}'
+        else:
+            self.current = loaded
+            self.error = None
+            self.loaded_at = time.time()
+            self.load_seconds = time.perf_counter() - started
+        finally:
+            # Also after a failure, so a broken file is not retried until it changes
+            self.signature = signature
+            self.loading = False
+
+    def check(self):
+        """Reload if the catalog file changed since it was last loaded."""
+        now = time.monotonic()
+        if not self.interval or now - self._checked < self.interval:
+            return
+        self._checked = now
+        if not self.loading and source_signature(self.uri) != self.signature:
+            self.reload()
+
+    def status(self):
+        return {
+            "state": "loading" if self.loading else "idle",
+            "version": self.current.catalog.version,
+            "sites": self.current.catalog.count(),
+            "loaded_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.loaded_at)),
+            "load_seconds": round(self.load_seconds, 3),
+            "error": self.error,
+        }
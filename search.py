@@ -0,0 +1,303 @@
+"""BM25 retrieval over site passages.
+
+Every site contributes one passage per text field and one per fun fact, and
+a few general passages answer what no site's text covers. Passages are
+indexed together with words naming their field, so "what is the style?"
+finds the architectural style, and terms are lightly stemmed, so
+"constructed" meets "construction". The index only keeps postings and
+passage coordinates; passage text is read back from the catalog for the
+handful of results actually returned.
+"""
+import itertools
+import json
+import mmap
+import os
+import re
+import tempfile
+from array import array
+
+import numpy as np
+
+FIELDS = ('description', 'history', 'architectural_style', 'fun_facts')
+
+STOPWORDS = frozenset('''
+a an and are as at be by can could did do does for from had has have how i in
+is it its me more of on or tell that the this to was were what when where which
+who why will with you your about
+'''.split())
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Longest first; one is stripped per word, keeping at least three letters
+SUFFIXES = ('ations', 'ation', 'ances', 'ance', 'ences', 'ence', 'ments', 'ment', 'ings', 'ing', 'ions',
+            'ion', 'ants', 'ant', 'ness', 'ally', 'ical', 'ers', 'er', 'ed', 'es', 'al', 'ly', 's')
+
+# Words a question may use to ask for a field, besides the field's own text
+FIELD_TERMS = {
+    'description': 'description overview',
+    'history': 'history historical origin built build construction',
+    'architectural_style': 'architecture architectural style design',
+    'fun_facts': 'fun fact interesting trivia',
+    'significance': 'significance cultural heritage importance',
+    'visit': 'visit visiting best time',
+}
+
+# Answers that hold for every site, searched along with the site's own passages
+GENERAL_PASSAGES = {
+    'significance': "This site holds great cultural and historical importance for the region.",
+    'visit': "The best time to visit is during morning hours to avoid crowds.",
+}
+
+
+def stem(token):
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)]
+            break
+    return token[:-1] if token.endswith('e') and len(token) > 3 else token
+
+
+def tokenize(text):
+    return [stem(t) for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+FIELD_TOKENS = {field: tokenize(terms) for field, terms in FIELD_TERMS.items()}
+PASSAGE_FIELDS = FIELDS + tuple(GENERAL_PASSAGES)
+
+
+def site_passages(site):
+    """Yield ``(field, fact_index, text)`` for every passage of a site."""
+    for field in FIELDS:
+        value = site.get(field)
+        if isinstance(value, list):
+            for i, text in enumerate(value):
+                yield field, i, text
+        elif value:
+            yield field, -1, value
+
+
+def general_passages():
+    """Yield ``(field, fact_index, text)`` for the passages of no one site."""
+    for field, text in GENERAL_PASSAGES.items():
+        yield field, -1, text
+
+
+def index_path(catalog_path):
+    """Where the index of the SQLite catalog at ``catalog_path`` is saved."""
+    return os.path.realpath(catalog_path) + '.search'
+
+
+def _bytes_array(values):
+    # Fixed-width byte strings, which NumPy sorts and binary searches
+    return np.array(values, dtype=bytes) if values else np.zeros(0, dtype='S1')
+
+
+def _find(values, key):
+    """Position of ``key`` in the sorted byte strings ``values``, or None."""
+    key = key.encode('utf-8')
+    # A longer key would be truncated to the array's width and could match
+    if not len(values) or len(key) > values.dtype.itemsize:
+        return None
+    i = int(np.searchsorted(values, key))
+    return i if i < len(values) and values[i] == key else None
+
+
+def _aligned(offset):
+    return -(-offset // 64) * 64
+
+
+class SearchIndex:
+    """BM25 over the passages of ``sites``.
+
+    Everything lives in flat NumPy arrays: terms and site ids are sorted byte
+    strings found by binary search, and the postings of all terms are one
+    array sorted by term and passage. ``save`` writes them into one file,
+    which ``load`` maps instead of reading, so workers start at once however
+    large the catalog and share its pages through the OS page cache.
+    """
+
+    # Written first in a saved index, followed by the header's length
+    MAGIC = b'BM25IDX1'
+    # Arrays of a saved index, in file order
+    ARRAYS = ('terms', 'term_starts', 'idf', 'docs', 'tfs', 'lengths', 'passage_site', 'passage_field',
+              'passage_fact', 'site_ids', 'site_starts', 'sorted_site_ids', 'sorted_site_numbers')
+
+    def __init__(self, sites, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.catalog_version = None
+        term_numbers = {}
+        post_terms, post_docs, post_tfs = array('i'), array('i'), array('i')
+        passage_site, passage_field, passage_fact, lengths = array('i'), array('b'), array('h'), array('i')
+        site_ids, site_starts = [], array('q')
+        # Passages are numbered in site order, so one site's passages form a
+        # contiguous range and each term's postings are sorted by passage.
+        # The general passages come last, under site number -1.
+        for site_id, passages in itertools.chain(
+                ((site_id, site_passages(site)) for site_id, site in sites), [(None, general_passages())]):
+            if site_id is None:
+                site_number = -1
+                self.general_start = len(lengths)
+            else:
+                site_number = len(site_ids)
+                site_ids.append(site_id.encode('utf-8'))
+                site_starts.append(len(lengths))
+            for field, fact, text in passages:
+                doc = len(lengths)
+                tokens = tokenize(text) + FIELD_TOKENS[field]
+                counts = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, tf in counts.items():
+                    post_terms.append(term_numbers.setdefault(token, len(term_numbers)))
+                    post_docs.append(doc)
+                    post_tfs.append(tf)
+                passage_site.append(site_number)
+                passage_field.append(PASSAGE_FIELDS.index(field))
+                passage_fact.append(fact)
+                lengths.append(len(tokens))
+        site_starts.append(self.general_start)
+
+        terms = _bytes_array([token.encode('utf-8') for token in term_numbers])
+        order = np.argsort(terms, kind='stable')
+        rank = np.empty(len(order), dtype=np.int32)
+        rank[order] = np.arange(len(order), dtype=np.int32)
+        post_terms = rank[np.frombuffer(post_terms, dtype=np.int32)]
+        # Stable, so each term's postings stay in passage order
+        by_term = np.argsort(post_terms, kind='stable')
+        df = np.bincount(post_terms, minlength=len(terms))
+        self.terms = terms[order]
+        self.term_starts = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+        self.idf = np.log(1 + (len(lengths) - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self.docs = np.frombuffer(post_docs, dtype=np.int32)[by_term]
+        self.tfs = np.frombuffer(post_tfs, dtype=np.int32)[by_term].astype(np.float32)
+
+        self.lengths = np.frombuffer(lengths, dtype=np.int32).astype(np.float32)
+        self.avg_length = float(self.lengths.mean())
+        self.passage_site = np.frombuffer(passage_site, dtype=np.int32)
+        self.passage_field = np.frombuffer(passage_field, dtype=np.int8)
+        self.passage_fact = np.frombuffer(passage_fact, dtype=np.int16)
+        self.site_ids = _bytes_array(site_ids)
+        self.site_starts = np.frombuffer(site_starts, dtype=np.int64)
+        order = np.argsort(self.site_ids, kind='stable')
+        self.sorted_site_ids = self.site_ids[order]
+        self.sorted_site_numbers = order.astype(np.int32)
+
+    def save(self, path, catalog_version=None):
+        """Write the index to ``path``, atomically, noting the ``catalog_version``
+        it was built from."""
+        arrays, offset = {}, 0
+        for name in self.ARRAYS:
+            value = getattr(self, name)
+            arrays[name] = [value.dtype.str, len(value), offset]
+            offset = _aligned(offset + value.nbytes)
+        header = json.dumps({"catalog_version": catalog_version, "k1": self.k1, "b": self.b,
+                             "avg_length": self.avg_length, "general_start": self.general_start,
+                             "arrays": arrays}).encode('utf-8')
+        base = _aligned(len(self.MAGIC) + 8 + len(header))
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.tmp-')
+        # Readable by workers running as another user, like the catalog
+        os.fchmod(fd, 0o644)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.MAGIC + len(header).to_bytes(8, 'little') + header)
+                for name in self.ARRAYS:
+                    f.write(b'\0' * (base + arrays[name][2] - f.tell()))
+                    f.write(np.ascontiguousarray(getattr(self, name)).data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """Map an index written by ``save``; nothing is read until searched."""
+        with open(path, 'rb') as f:
+            # The map keeps its own reference to the file, so it can be closed here
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[:len(cls.MAGIC)] != cls.MAGIC:
+            raise ValueError(f'{path} is not a search index')
+        length = int.from_bytes(mapped[len(cls.MAGIC):len(cls.MAGIC) + 8], 'little')
+        header = json.loads(mapped[len(cls.MAGIC) + 8:len(cls.MAGIC) + 8 + length])
+        base = _aligned(len(cls.MAGIC) + 8 + length)
+        index = cls.__new__(cls)
+        for name in ('catalog_version', 'k1', 'b', 'avg_length', 'general_start'):
+            setattr(index, name, header[name])
+        for name, (dtype, count, offset) in header['arrays'].items():
+            setattr(index, name, np.frombuffer(mapped, dtype=np.dtype(dtype), count=count, offset=base + offset))
+        return index
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def site_range(self, site_id):
+        """``(first, end)`` passage numbers of a site, or None if it has none."""
+        i = _find(self.sorted_site_ids, site_id)
+        if i is None:
+            return None
+        number = self.sorted_site_numbers[i]
+        return int(self.site_starts[number]), int(self.site_starts[number + 1])
+
+    def search(self, query, site_id=None, limit=5):
+        """Return ``[(passage, score), ...]`` best first.
+
+        With a ``site_id``, only that site's passages and the general ones
+        are searched.
+        """
+        if site_id is not None:
+            site_range = self.site_range(site_id)
+            if site_range is None:
+                return []
+            ranges = [site_range, (self.general_start, len(self.lengths))]
+        docs, weights = [], []
+        for token in set(tokenize(query)):
+            term = _find(self.terms, token)
+            if term is None:
+                continue
+            start, end = int(self.term_starts[term]), int(self.term_starts[term + 1])
+            idf = float(self.idf[term])
+            if site_id is None:
+                slices = [(start, end)]
+            else:
+                term_docs = self.docs[start:end]
+                slices = [(start + int(np.searchsorted(term_docs, lo)), start + int(np.searchsorted(term_docs, hi)))
+                          for lo, hi in ranges]
+            for start, end in slices:
+                term_docs = self.docs[start:end]
+                tf = self.tfs[start:end]
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[term_docs] / self.avg_length)
+                docs.append(term_docs)
+                weights.append(idf * tf * (self.k1 + 1) / (tf + norm))
+        if not docs:
+            return []
+        docs, weights = np.concatenate(docs), np.concatenate(weights)
+        if len(docs) * 8 > len(self.lengths):
+            # Broad queries: a dense accumulator avoids sorting the postings
+            scores = np.bincount(docs, weights=weights, minlength=len(self.lengths))
+            matched = np.flatnonzero(scores)
+            scores = scores[matched]
+        else:
+            matched, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=weights)
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(matched[i]), float(scores[i])) for i in top]
+
+    def passage(self, catalog, doc):
+        """Resolve a passage number to ``{site_id, field, text}`` via the catalog.
+
+        General passages have no ``site_id``.
+        """
+        field = PASSAGE_FIELDS[self.passage_field[doc]]
+        if self.passage_site[doc] < 0:
+            return {"site_id": None, "field": field, "text": GENERAL_PASSAGES[field]}
+        site_id = self.site_ids[self.passage_site[doc]].decode('utf-8')
+        value = (catalog.get_site(site_id) or {}).get(field)
+        fact = int(self.passage_fact[doc])
+        text = value[fact] if fact >= 0 else value
+        return {"site_id": site_id, "field": field, "text": text}
@@ -0,0 +1,95 @@
+"""Production entry point: serves the app with gunicorn's pre-fork server.
+
+Every worker builds its own app through the factory, so sending SIGHUP to the
+master gracefully swaps the workers for freshly loaded ones (new code, new
+catalog) while the old ones finish their in-flight requests.
+
+Apps loaded by gunicorn directly (``gunicorn wsgi:app -w 4``) get the same
+multi-worker defaults from ``default_config``: see ``under_gunicorn``.
+"""
+import multiprocessing
+import os
+import tempfile
+
+# Sessions every worker can see; a file outlives restarts, like the signed
+# cookies sessions used to be
+SHARED_SESSIONS = 'sqlite:///sessions.db'
+
+
+def under_gunicorn():
+    """True when the app is loaded by gunicorn, which sets this in its master
+    before loading the app; workers inherit it."""
+    return os.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn/')
+
+
+def gunicorn_metrics_dir():
+    """Metrics directory shared by the workers of this gunicorn master.
+
+    Workers load the app after they are forked, so their parent is the
+    master. With ``--preload`` the app is loaded once in the master and the
+    workers inherit the directory it picked.
+    """
+    return os.path.join(tempfile.gettempdir(), f'smart-tourism-metrics-{os.getppid()}')
+
+
+def default_workers():
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+def add_serve_arguments(parser):
+    parser.add_argument('--bind', default=os.environ.get('SMART_TOURISM_BIND', '0.0.0.0:8000'))
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('SMART_TOURISM_WORKERS', default_workers())))
+    parser.add_argument('--threads', type=int,
+                        default=int(os.environ.get('SMART_TOURISM_THREADS', 4)),
+                        help='threads per worker; more than one uses the gthread worker')
+    parser.add_argument('--timeout', type=int, default=30)
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='seconds old workers get to finish requests on reload or shutdown')
+    parser.add_argument('--max-requests', type=int, default=0,
+                        help='recycle a worker after this many requests (0 disables)')
+    parser.add_argument('--preload', action='store_true',
+                        help='load the app once in the master and share it copy-on-write; '
+                             'SIGHUP then restarts workers without reloading code')
+
+
+def gunicorn_options(args):
+    return {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'preload_app': args.preload,
+    }
+
+
+def serve(app_factory, args):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit('`serve` needs gunicorn: pip install gunicorn')
+
+    options = gunicorn_options(args)
+    # Workers share request metrics through files so any of them can answer
+    # /metrics for all; a fresh directory per master drops stale workers
+    if args.workers > 1:
+        os.environ.setdefault('SMART_TOURISM_METRICS_DIR', tempfile.mkdtemp(prefix='smart-tourism-metrics-'))
+        # The in-memory session store is per worker, so a visitor's language
+        # would only stick on the worker that set it
+        sessions = os.environ.setdefault('SMART_TOURISM_SESSIONS', SHARED_SESSIONS)
+        if sessions in ('', 'memory'):
+            raise SystemExit('SMART_TOURISM_SESSIONS=memory only works with --workers 1')
+
+    class TourismApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app_factory()
+
+    TourismApplication().run()
@@ -0,0 +1,198 @@
+"""Server-side sessions.
+
+The cookie only carries an opaque random session id; the data lives in a
+``SessionStore``. ``MemorySessionStore`` is a per-process LRU, fine for a
+single worker; ``SQLiteSessionStore`` is shared by every worker on the host.
+Both expire sessions that have been idle for longer than their ``ttl``.
+"""
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+SESSION_ID_RE = re.compile(r'^[A-Za-z0-9_-]{43}$')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires);
+'''
+
+
+class SessionStore:
+    """Interface shared by the session backends; data is a JSON-able dict."""
+
+    def get(self, session_id):
+        """Return the session's data, or None if it is unknown or expired."""
+        raise NotImplementedError
+
+    def set(self, session_id, data):
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, ttl, max_entries=100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            data, expires = entry
+            if expires < now:
+                del self._entries[session_id]
+                return None
+            self._entries[session_id] = (data, now + self.ttl)
+            self._entries.move_to_end(session_id)
+            return json.loads(data)
+
+    def set(self, session_id, data):
+        with self._lock:
+            self._entries[session_id] = (json.dumps(data), time.time() + self.ttl)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    def __init__(self, path, ttl, purge_interval=60):
+        self.path = path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._last_purge = 0
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        # Same per-thread, fork-aware scheme as the SQLite catalog
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, session_id):
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute('SELECT data, expires FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+        if row is None or row[1] < now:
+            return None
+        # Reads only write when half the lifetime is used up, so an active
+        # session costs one write per ttl/2 instead of one per request
+        if row[1] - now < self.ttl / 2:
+            conn.execute('UPDATE sessions SET expires = ? WHERE session_id = ?', (now + self.ttl, session_id))
+        return json.loads(row[0])
+
+    def set(self, session_id, data):
+        now = time.time()
+        conn = self._connection()
+        conn.execute('INSERT OR REPLACE INTO sessions (session_id, data, expires) VALUES (?, ?, ?)',
+                     (session_id, json.dumps(data), now + self.ttl))
+        if now - self._last_purge > self.purge_interval:
+            self._last_purge = now
+            conn.execute('DELETE FROM sessions WHERE expires < ?', (now,))
+
+    def delete(self, session_id):
+        self._connection().execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, session_id=None):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.session_id = session_id
+        self.modified = False
+        self.accessed = False
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+
+class ServerSessionInterface(SessionInterface):
+    """Keeps session data in a ``SessionStore``, keyed by the cookie's id.
+
+    Requests without a cookie never touch the store, and a session id is
+    only issued once something is written to the session.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        session_id = request.cookies.get(self.get_cookie_name(app))
+        if session_id and SESSION_ID_RE.match(session_id):
+            data = self.store.get(session_id)
+            if data is not None:
+                return ServerSession(data, session_id)
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add('Cookie')
+        if not session.modified and not (session.session_id and self.should_set_cookie(app, session)):
+            return
+        if not session:
+            if session.session_id:
+                self.store.delete(session.session_id)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        # A fresh id whenever a session is created, so ids are never reused
+        session_id = session.session_id or secrets.token_urlsafe(32)
+        if session.modified:
+            self.store.set(session_id, dict(session))
+        # Otherwise only the cookie's expiry is refreshed; the store extends
+        # idle sessions by itself when they are read
+        response.set_cookie(
+            name, session_id,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def open_session_store(uri, ttl, max_entries=100000):
+    """Open a session store from a URI such as ``memory`` or ``sqlite:///sessions.db``."""
+    if uri in (None, '', 'memory'):
+        return MemorySessionStore(ttl, max_entries)
+    if uri.startswith('sqlite:///'):
+        return SQLiteSessionStore(uri[len('sqlite:///'):], ttl)
+    raise ValueError(f'Unsupported session URI: {uri}')
@@ -0,0 +1,140 @@
+let currentSite = null;
+let modelPoints = null;
+let animationFrame = null;
+
+document.addEventListener('DOMContentLoaded', loadSites);
+
+async function loadSites() {
+    const select = document.getElementById('arSite');
+    try {
+        const response = await fetch('/api/ar');
+        const data = await response.json();
+        data.sites.forEach(site => select.add(new Option(site.name, site.site_id)));
+    } catch (error) {
+        // Handled below like a server without models
+    }
+    if (!select.options.length) {
+        select.style.display = 'none';
+        setStatus('No 3D reconstructions are available yet');
+    }
+}
+
+function setStatus(text) {
+    document.getElementById('arStatus').textContent = text;
+}
+
+// Vertex positions of every mesh in a binary glTF file, as x, y, z triples
+function glbPositions(buffer) {
+    const view = new DataView(buffer);
+    if (view.getUint32(0, true) !== 0x46546C67) {
+        throw new Error('Not a binary glTF model');
+    }
+    const jsonLength = view.getUint32(12, true);
+    const gltf = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 20, jsonLength)));
+    // The BIN chunk follows the JSON chunk and its own 8-byte header
+    const binStart = 20 + jsonLength + 8;
+    const positions = [];
+    (gltf.meshes || []).forEach(mesh => mesh.primitives.forEach(primitive => {
+        const accessor = gltf.accessors[primitive.attributes.POSITION];
+        const bufferView = gltf.bufferViews[accessor.bufferView];
+        const stride = bufferView.byteStride || 12;
+        const start = binStart + (bufferView.byteOffset || 0) + (accessor.byteOffset || 0);
+        for (let i = 0; i < accessor.count; i++) {
+            for (let axis = 0; axis < 3; axis++) {
+                positions.push(view.getFloat32(start + i * stride + axis * 4, true));
+            }
+        }
+    }));
+    return new Float32Array(positions);
+}
+
+// Centre the model and scale it to fit a unit sphere
+function normalize(positions) {
+    const min = [Infinity, Infinity, Infinity];
+    const max = [-Infinity, -Infinity, -Infinity];
+    for (let i = 0; i < positions.length; i++) {
+        min[i % 3] = Math.min(min[i % 3], positions[i]);
+        max[i % 3] = Math.max(max[i % 3], positions[i]);
+    }
+    const centre = min.map((value, axis) => (value + max[axis]) / 2);
+    const scale = 2 / Math.max(...max.map((value, axis) => value - min[axis]), 1e-9);
+    return positions.map((value, i) => (value - centre[i % 3]) * scale);
+}
+
+async function loadModel(siteId) {
+    currentSite = siteId;
+    const response = await fetch(`/api/ar/${encodeURIComponent(siteId)}`);
+    const manifest = await response.json();
+    if (!response.ok) {
+        setStatus(manifest.error || 'Could not load the model');
+        return;
+    }
+    // Coarsest first so something is on screen quickly, then refine
+    for (const level of manifest.levels) {
+        const model = await fetch(level.url);
+        const positions = normalize(glbPositions(await model.arrayBuffer()));
+        if (currentSite !== siteId) {
+            return;
+        }
+        modelPoints = positions;
+        setStatus(`Detail level ${level.level + 1} of ${manifest.levels.length} (${positions.length / 3} points)`);
+    }
+}
+
+function draw(time) {
+    const canvas = document.getElementById('arCanvas');
+    canvas.width = canvas.clientWidth;
+    canvas.height = canvas.clientHeight;
+    const context = canvas.getContext('2d');
+    context.clearRect(0, 0, canvas.width, canvas.height);
+    if (modelPoints) {
+        const angle = time / 4000;
+        const cos = Math.cos(angle), sin = Math.sin(angle);
+        const size = Math.min(canvas.width, canvas.height) * 0.4;
+        // Draw at most about 100k points per frame
+        const step = Math.max(1, Math.floor(modelPoints.length / 3 / 100000)) * 3;
+        context.fillStyle = '#4c51bf';
+        for (let i = 0; i < modelPoints.length; i += step) {
+            const x = modelPoints[i] * cos - modelPoints[i + 2] * sin;
+            context.fillRect(canvas.width / 2 + x * size, canvas.height / 2 - modelPoints[i + 1] * size, 1.5, 1.5);
+        }
+    }
+    animationFrame = requestAnimationFrame(draw);
+}
+
+function showModel() {
+    const select = document.getElementById('arSite');
+    if (!select.value) {
+        setStatus('No 3D reconstructions are available yet');
+        return;
+    }
+    document.getElementById('arOverlay').style.display = 'none';
+    if (!animationFrame) {
+        animationFrame = requestAnimationFrame(draw);
+    }
+    if (currentSite !== select.value) {
+        loadModel(select.value).catch(error => setStatus(`Could not load the model: ${error.message}`));
+    }
+}
+
+async function startAR() {
+    try {
+        const camera = document.getElementById('arCamera');
+        camera.srcObject = await navigator.mediaDevices.getUserMedia({ video: { facingMode: 'environment' } });
+        await camera.play();
+        camera.style.display = 'block';
+    } catch (error) {
+        setStatus('Camera access is needed for AR; showing the model on its own');
+    }
+    showModel();
+}
+
+function startDemo() {
+    showModel();
+    document.getElementById('arInfo').style.display = 'block';
+}
+
+function showInfo() {
+    const infoDiv = document.getElementById('arInfo');
+    infoDiv.style.display = infoDiv.style.display === 'none' ? 'block' : 'none';
+}
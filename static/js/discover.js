@@ -0,0 +1,41 @@
+let loading = false;
+
+function siteCard(site) {
+    const words = site.name.split(' ');
+    const card = document.createElement('div');
+    card.className = 'site-card';
+    card.innerHTML = '<div class="site-image"></div><div class="site-content"><h3></h3>' +
+        '<div class="site-location"></div><p class="site-description"></p>' +
+        '<a class="btn">Explore Site</a></div>';
+    card.querySelector('.site-image').textContent =
+        site.name[0] + (words.length > 1 ? words[words.length - 1][0] : site.name[1]);
+    card.querySelector('h3').textContent = site.name;
+    card.querySelector('.site-location').textContent = site.location;
+    card.querySelector('.site-description').textContent = site.description;
+    card.querySelector('a').href = '/site/' + encodeURIComponent(site.site_id);
+    return card;
+}
+
+function loadMore() {
+    const button = document.querySelector('#loadMore button');
+    if (loading || !button.dataset.cursor) return;
+    loading = true;
+
+    const params = new URLSearchParams(window.location.search);
+    params.set('cursor', button.dataset.cursor);
+    fetch('/api/discover?' + params.toString())
+    .then(response => response.json())
+    .then(data => {
+        const grid = document.getElementById('sitesGrid');
+        data.sites.forEach(site => grid.appendChild(siteCard(site)));
+        button.dataset.cursor = data.next_cursor || '';
+        document.getElementById('loadMore').hidden = !data.next_cursor;
+    })
+    .catch(error => console.error('Error:', error))
+    .finally(() => { loading = false; });
+}
+
+// Fetch the next page as the user scrolls near the end of the list
+new IntersectionObserver(entries => {
+    if (entries[0].isIntersecting) loadMore();
+}, { rootMargin: '400px' }).observe(document.getElementById('loadMore'));
@@ -0,0 +1,247 @@
+function showOfflineStatus(enabled, message) {
+    const statusCard = document.getElementById('statusCard');
+
+    if (enabled) {
+        statusCard.innerHTML = `
+            <h2>Offline Mode Active</h2>
+            <p></p>
+            <button class="btn" onclick="toggleOfflineMode()">Switch to Online Mode</button>
+        `;
+        statusCard.classList.add('status-offline');
+    } else {
+        statusCard.innerHTML = `
+            <h2>Online Mode</h2>
+            <p></p>
+            <button class="btn" onclick="toggleOfflineMode()">Switch to Offline Mode</button>
+        `;
+        statusCard.classList.remove('status-offline');
+    }
+    statusCard.querySelector('p').textContent = message;
+}
+
+function sendToServiceWorker(worker, message) {
+    return new Promise(resolve => {
+        const channel = new MessageChannel();
+        channel.port1.onmessage = event => resolve(event.data);
+        worker.postMessage(message, [channel.port2]);
+    });
+}
+
+async function syncOfflinePages() {
+    const registration = await navigator.serviceWorker.ready;
+    const result = await sendToServiceWorker(registration.active, { type: 'precache' });
+    if (result.error) {
+        showOfflineStatus(true, `Offline pages could not be updated (${result.error}); the saved copies are still available.`);
+    } else {
+        showOfflineStatus(true, `${result.entries} pages and files are saved on this device and open without a network.`);
+    }
+}
+
+async function toggleOfflineMode() {
+    if (!('serviceWorker' in navigator)) {
+        alert('This browser cannot keep pages offline.');
+        return;
+    }
+    const registration = await navigator.serviceWorker.getRegistration();
+    if (registration) {
+        await registration.unregister();
+        await caches.delete('precache');
+        showOfflineStatus(false, 'You are currently connected to the internet. Download content for offline access.');
+    } else {
+        showOfflineStatus(true, 'Saving pages for offline use...');
+        await navigator.serviceWorker.register('/service-worker.js');
+        await syncOfflinePages();
+    }
+}
+
+async function loadOfflineStatus() {
+    if ('serviceWorker' in navigator && await navigator.serviceWorker.getRegistration()) {
+        // Already enabled: fetch whatever changed since the last visit
+        await syncOfflinePages();
+    }
+}
+
+const PACK_CACHE = 'offline-packs';
+const MAX_ATTEMPTS = 3;
+
+function formatBytes(bytes) {
+    if (bytes >= 1024 * 1024) {
+        return (bytes / (1024 * 1024)).toFixed(1) + ' MB';
+    }
+    return Math.ceil(bytes / 1024) + ' KB';
+}
+
+function packCard(region) {
+    return document.querySelector(`.download-card[data-region="${region}"]`);
+}
+
+function setPackStatus(region, fraction, text) {
+    const card = packCard(region);
+    card.querySelector('.progress').style.width = Math.round(fraction * 100) + '%';
+    card.querySelector('.pack-status').textContent = text;
+}
+
+async function loadPacks() {
+    const response = await fetch('/api/offline/packs');
+    const data = await response.json();
+    const grid = document.getElementById('packsGrid');
+    grid.innerHTML = '';
+    for (const pack of data.packs) {
+        const card = document.createElement('div');
+        card.className = 'download-card';
+        card.dataset.region = pack.region;
+        card.dataset.diff = pack.diff;
+        card.innerHTML = `
+            <div class="download-icon">🏛️</div>
+            <h3></h3>
+            <p>${pack.sites} heritage site${pack.sites === 1 ? '' : 's'}</p>
+            <div class="progress-bar">
+                <div class="progress" style="width: 0%"></div>
+            </div>
+            <p class="pack-status"></p>
+            <button class="btn">Download</button>
+        `;
+        card.querySelector('h3').textContent = pack.region.replace(/-/g, ' ');
+        card.querySelector('button').addEventListener('click', () => downloadPack(pack.region));
+        grid.appendChild(card);
+        const version = localStorage.getItem('offline-pack-' + pack.region);
+        if (version) {
+            setPackStatus(pack.region, 1, 'Downloaded');
+        }
+    }
+}
+
+function chunkKey(chunk) {
+    return `/offline-packs/chunks/${chunk.sha256}`;
+}
+
+function manifestKey(region) {
+    return `/offline-packs/${region}/manifest.json`;
+}
+
+async function sha256Hex(buffer) {
+    const digest = await crypto.subtle.digest('SHA-256', buffer);
+    return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function fetchChunk(url, chunk, downloadId) {
+    const start = chunk.offset;
+    const end = chunk.offset + chunk.size - 1;
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const response = await fetch(`${url}?download_id=${downloadId}`, {
+                headers: { 'Range': `bytes=${start}-${end}` }
+            });
+            if (response.status !== 206 && response.status !== 200) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            let body = await response.arrayBuffer();
+            if (response.status === 200) {
+                // The server ignored the range; keep only the part we asked for
+                body = body.slice(start, end + 1);
+            }
+            if (await sha256Hex(body) !== chunk.sha256) {
+                throw new Error(`checksum mismatch at byte ${start}`);
+            }
+            return body;
+        } catch (error) {
+            if (attempt >= MAX_ATTEMPTS) {
+                throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+        }
+    }
+}
+
+async function fetchDiff(region, url) {
+    // The server answers 503 until the region's first pack is built
+    for (;;) {
+        const response = await fetch(url);
+        if (response.status !== 503) {
+            return response.json();
+        }
+        setPackStatus(region, 0, 'Preparing pack...');
+        const wait = parseInt(response.headers.get('Retry-After'), 10) || 10;
+        await new Promise(resolve => setTimeout(resolve, 1000 * wait));
+    }
+}
+
+async function downloadPack(region) {
+    const card = packCard(region);
+    const installed = localStorage.getItem('offline-pack-' + region);
+    const diff = await fetchDiff(region, card.dataset.diff + (installed ? `?from=${installed}` : ''));
+    if (installed === diff.to) {
+        setPackStatus(region, 1, 'Up to date');
+        return;
+    }
+    const cache = await caches.open(PACK_CACHE);
+    const downloadId = diff.to + '-' + Math.random().toString(36).slice(2, 10);
+    const total = formatBytes(diff.download_bytes);
+
+    // Chunks are stored under their checksum, so anything already in the
+    // cache - from the installed version or an interrupted download - is
+    // reused and only the rest is fetched
+    let received = 0;
+    const poll = setInterval(async () => {
+        const response = await fetch(`/api/offline/progress/${downloadId}`);
+        const progress = await response.json();
+        const sent = Math.min(Math.max(received, progress.bytes_sent), diff.download_bytes);
+        setPackStatus(region, sent / (diff.download_bytes || 1), `${formatBytes(sent)} of ${total}`);
+    }, 1000);
+    try {
+        for (const i of diff.missing) {
+            const chunk = diff.chunks[i];
+            if (!await cache.match(chunkKey(chunk))) {
+                const body = await fetchChunk(diff.url, chunk, downloadId);
+                await cache.put(chunkKey(chunk), new Response(body));
+            }
+            received += chunk.size;
+            setPackStatus(region, received / diff.download_bytes, `${formatBytes(received)} of ${total}`);
+        }
+
+        const previous = await cache.match(manifestKey(region));
+        const manifest = { region: region, version: diff.to, size: diff.size, sha256: diff.sha256, chunks: diff.chunks };
+        await cache.put(manifestKey(region), new Response(JSON.stringify(manifest)));
+        if (previous) {
+            const current = new Set(diff.chunks.map(chunk => chunk.sha256));
+            for (const chunk of (await previous.json()).chunks) {
+                if (!current.has(chunk.sha256)) {
+                    await cache.delete(chunkKey(chunk));
+                }
+            }
+        }
+        localStorage.setItem('offline-pack-' + region, diff.to);
+        setPackStatus(region, 1, installed ? `Updated (${total} downloaded)` : 'Downloaded');
+    } catch (error) {
+        setPackStatus(region, received / (diff.download_bytes || 1), `Download paused: ${error.message}. Try again to resume.`);
+        throw error;
+    } finally {
+        clearInterval(poll);
+    }
+}
+
+async function downloadAll() {
+    for (const card of document.querySelectorAll('.download-card[data-region]')) {
+        try {
+            await downloadPack(card.dataset.region);
+        } catch (error) {
+            // Keep going; the failed pack shows its own status
+        }
+    }
+}
+
+async function clearDownloads() {
+    if (confirm('Are you sure you want to clear all downloaded content?')) {
+        await caches.delete(PACK_CACHE);
+        document.querySelectorAll('.download-card[data-region]').forEach(card => {
+            localStorage.removeItem('offline-pack-' + card.dataset.region);
+            setPackStatus(card.dataset.region, 0, '');
+        });
+        alert('All downloaded content has been cleared.');
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    loadOfflineStatus();
+    loadPacks();
+});
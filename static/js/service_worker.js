@@ -0,0 +1,117 @@
+// Keeps the pages listed in /precache-manifest.json in the Cache API and
+// serves them from there first, refreshing each one in the background.
+const PRECACHE = 'precache';
+const MANIFEST_URL = '/precache-manifest.json';
+const CONCURRENCY = 6;
+
+async function precache() {
+    const cache = await caches.open(PRECACHE);
+    const response = await fetch(MANIFEST_URL, { cache: 'no-cache' });
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+    }
+    const manifest = await response.clone().json();
+
+    // Entries whose revision is unchanged since the last run are kept as is
+    const previous = await cache.match(MANIFEST_URL);
+    const revisions = new Map();
+    if (previous) {
+        for (const entry of (await previous.json()).entries) {
+            revisions.set(entry.url, entry.revision);
+        }
+    }
+    const stale = [];
+    for (const entry of manifest.entries) {
+        if (revisions.get(entry.url) !== entry.revision || !await cache.match(entry.url)) {
+            stale.push(entry.url);
+        }
+    }
+    let failed = 0;
+    const worker = async () => {
+        while (stale.length) {
+            const url = stale.shift();
+            try {
+                const page = await fetch(url, { cache: 'no-cache' });
+                if (page.ok) {
+                    await cache.put(url, page);
+                    continue;
+                }
+            } catch (error) {
+                // Counted below; the next run retries it
+            }
+            failed++;
+        }
+    };
+    const fetched = stale.length;
+    await Promise.all(Array.from({ length: CONCURRENCY }, worker));
+
+    const wanted = new Set(manifest.entries.map(entry => new URL(entry.url, self.location).href));
+    wanted.add(new URL(MANIFEST_URL, self.location).href);
+    for (const request of await cache.keys()) {
+        if (!wanted.has(request.url)) {
+            await cache.delete(request);
+        }
+    }
+    if (!failed) {
+        await cache.put(MANIFEST_URL, response);
+    }
+    return { version: manifest.version, entries: manifest.entries.length, fetched: fetched - failed, failed: failed };
+}
+
+async function refresh(cache, request) {
+    try {
+        const response = await fetch(request, { cache: 'no-cache' });
+        if (response.ok) {
+            await cache.put(request, response);
+        }
+    } catch (error) {
+        // Offline; the cached copy stays
+    }
+}
+
+self.addEventListener('install', event => {
+    event.waitUntil(precache().catch(() => null).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(self.clients.claim());
+});
+
+self.addEventListener('message', event => {
+    if (event.data && event.data.type === 'precache') {
+        event.waitUntil(precache().then(
+            result => event.ports[0].postMessage(result),
+            error => event.ports[0].postMessage({ error: error.message })
+        ));
+    }
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== self.location.origin
+            || url.pathname === MANIFEST_URL || request.headers.has('Range')) {
+        return;
+    }
+    event.respondWith((async () => {
+        const cache = await caches.open(PRECACHE);
+        // Pages vary on Cookie and Accept-Encoding; any stored copy will do
+        const cached = await cache.match(request, { ignoreVary: true });
+        if (cached) {
+            // Fingerprinted assets never change; pages are revalidated
+            if (!url.pathname.startsWith('/static/')) {
+                event.waitUntil(refresh(cache, request));
+            }
+            return cached;
+        }
+        try {
+            return await fetch(request);
+        } catch (error) {
+            const fallback = request.mode === 'navigate' && await cache.match('/offline_mode', { ignoreVary: true });
+            if (fallback) {
+                return fallback;
+            }
+            throw error;
+        }
+    })());
+});
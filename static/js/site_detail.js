@@ -0,0 +1,91 @@
+function askQuestion() {
+    const input = document.getElementById('questionInput');
+    const question = input.value.trim();
+    const chatContainer = document.getElementById('chatContainer');
+
+    if (!question) return;
+
+    // Add user message
+    const userMessage = document.createElement('div');
+    userMessage.className = 'message user-message';
+    userMessage.textContent = question;
+    chatContainer.appendChild(userMessage);
+
+    // Clear input
+    input.value = '';
+
+    // Show loading
+    const loadingMessage = document.createElement('div');
+    loadingMessage.className = 'message ai-message';
+    loadingMessage.textContent = 'Thinking...';
+    chatContainer.appendChild(loadingMessage);
+
+    // Scroll to bottom
+    chatContainer.scrollTop = chatContainer.scrollHeight;
+
+    // Stream the answer: tokens are shown as they arrive
+    fetch('/api/ask_question?stream=ndjson', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            question: question,
+            site_id: document.body.dataset.siteId
+        })
+    })
+    .then(async response => {
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const aiMessage = document.createElement('div');
+        aiMessage.className = 'message ai-message';
+        aiMessage.innerHTML = '<strong>Answer:</strong> <span></span><br><small></small>';
+        const answerText = aiMessage.querySelector('span');
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = '';
+        for (;;) {
+            const { done, value } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffered += decoder.decode(value, { stream: true });
+            const lines = buffered.split('\n');
+            buffered = lines.pop();
+            for (const line of lines) {
+                if (!line) continue;
+                const event = JSON.parse(line);
+                if (event.type === 'meta') {
+                    aiMessage.querySelector('small').textContent = event.timestamp;
+                } else if (event.type === 'token') {
+                    // Replace the loading message on the first token
+                    if (loadingMessage.parentNode) {
+                        chatContainer.replaceChild(aiMessage, loadingMessage);
+                    }
+                    answerText.textContent += event.text;
+                    chatContainer.scrollTop = chatContainer.scrollHeight;
+                }
+            }
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        if (loadingMessage.parentNode) {
+            chatContainer.removeChild(loadingMessage);
+        }
+
+        const errorMessage = document.createElement('div');
+        errorMessage.className = 'message ai-message';
+        errorMessage.textContent = 'Sorry, I encountered an error. Please try again.';
+        chatContainer.appendChild(errorMessage);
+    });
+}
+
+// Allow pressing Enter to send message
+document.getElementById('questionInput').addEventListener('keypress', function(e) {
+    if (e.key === 'Enter') {
+        askQuestion();
+    }
+});
@@ -0,0 +1,172 @@
+let isListening = false;
+let currentLanguage = 'English';
+
+let mediaRecorder = null;
+
+async function toggleListening() {
+    const voiceCircle = document.getElementById('voiceCircle');
+    const statusText = document.getElementById('statusText');
+
+    if (!isListening) {
+        // Start recording
+        let stream;
+        try {
+            stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+        } catch (error) {
+            statusText.textContent = 'Microphone access is needed to ask by voice';
+            return;
+        }
+        const chunks = [];
+        mediaRecorder = new MediaRecorder(stream);
+        mediaRecorder.ondataavailable = event => chunks.push(event.data);
+        mediaRecorder.onstop = () => {
+            stream.getTracks().forEach(track => track.stop());
+            sendRecording(new Blob(chunks, { type: mediaRecorder.mimeType }));
+        };
+        mediaRecorder.start();
+        isListening = true;
+        voiceCircle.classList.add('listening');
+        statusText.textContent = 'Listening... Click again when you are done';
+    } else {
+        // Stop recording and send it
+        isListening = false;
+        voiceCircle.classList.remove('listening');
+        statusText.textContent = 'Recognising...';
+        mediaRecorder.stop();
+    }
+}
+
+// 16 kHz mono 16-bit WAV: what the recogniser wants, and far smaller than
+// the browser's native recording
+async function encodeWav(blob) {
+    const decoded = await new AudioContext().decodeAudioData(await blob.arrayBuffer());
+    const sampleRate = 16000;
+    const offline = new OfflineAudioContext(1, Math.ceil(decoded.duration * sampleRate), sampleRate);
+    const source = offline.createBufferSource();
+    source.buffer = decoded;
+    source.connect(offline.destination);
+    source.start();
+    const samples = (await offline.startRendering()).getChannelData(0);
+
+    const view = new DataView(new ArrayBuffer(44 + samples.length * 2));
+    const writeString = (offset, text) => {
+        for (let i = 0; i < text.length; i++) view.setUint8(offset + i, text.charCodeAt(i));
+    };
+    writeString(0, 'RIFF');
+    view.setUint32(4, 36 + samples.length * 2, true);
+    writeString(8, 'WAVE');
+    writeString(12, 'fmt ');
+    view.setUint32(16, 16, true);
+    view.setUint16(20, 1, true);
+    view.setUint16(22, 1, true);
+    view.setUint32(24, sampleRate, true);
+    view.setUint32(28, sampleRate * 2, true);
+    view.setUint16(32, 2, true);
+    view.setUint16(34, 16, true);
+    writeString(36, 'data');
+    view.setUint32(40, samples.length * 2, true);
+    samples.forEach((sample, i) => {
+        view.setInt16(44 + i * 2, Math.max(-1, Math.min(1, sample)) * 0x7fff, true);
+    });
+    return view.buffer;
+}
+
+function addMessage(className, text, note) {
+    const chatContainer = document.getElementById('chatContainer');
+    const message = document.createElement('div');
+    message.className = 'message ' + className;
+    message.textContent = text;
+    if (note) {
+        const small = document.createElement('small');
+        small.textContent = note;
+        message.appendChild(document.createElement('br'));
+        message.appendChild(small);
+    }
+    chatContainer.appendChild(message);
+    chatContainer.scrollTop = chatContainer.scrollHeight;
+}
+
+async function sendRecording(blob) {
+    const statusText = document.getElementById('statusText');
+    try {
+        const response = await fetch('/api/voice_query', {
+            method: 'POST',
+            headers: { 'Content-Type': 'audio/wav' },
+            body: await encodeWav(blob)
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || `HTTP ${response.status}`);
+        }
+        addMessage('user-message', data.transcript);
+        addMessage('ai-message', 'Assistant: ' + data.answer,
+            `Answered in ${Math.round(data.timings.total_ms)} ms`);
+        // Speak the answer; playback is best effort, and the server may have
+        // no text-to-speech at all
+        if (data.audio_url) {
+            new Audio(data.audio_url).play().catch(() => {});
+        }
+    } catch (error) {
+        addMessage('ai-message', `Sorry, I could not process that: ${error.message}`);
+    }
+    statusText.textContent = 'Click the microphone to start speaking';
+}
+
+async function processVoiceInput(question) {
+    addMessage('user-message', question);
+    try {
+        // Answered by the same server engine as typed and spoken questions
+        const response = await fetch('/api/ask_question', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ question: question })
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || `HTTP ${response.status}`);
+        }
+        addMessage('ai-message', 'Assistant: ' + data.answer);
+        if (data.audio_url) {
+            new Audio(data.audio_url).play().catch(() => {});
+        }
+    } catch (error) {
+        addMessage('ai-message', `Sorry, I could not process that: ${error.message}`);
+    }
+}
+
+function changeLanguage(language) {
+    currentLanguage = language;
+
+    // Update active button
+    document.querySelectorAll('.lang-btn').forEach(btn => {
+        btn.classList.remove('active');
+        if (btn.textContent === language) {
+            btn.classList.add('active');
+        }
+    });
+
+    // Show confirmation
+    const chatContainer = document.getElementById('chatContainer');
+    const message = document.createElement('div');
+    message.className = 'message ai-message';
+    message.textContent = `Language changed to ${language}. You can now speak in ${language}.`;
+    chatContainer.appendChild(message);
+
+    // Send to backend
+    fetch('/api/change_language', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ language: language })
+    });
+
+    // Scroll to bottom
+    chatContainer.scrollTop = chatContainer.scrollHeight;
+}
+
+function askQuestion(question) {
+    processVoiceInput(question);
+}
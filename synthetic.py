@@ -0,0 +1,313 @@
+"""Seeded synthetic catalogs for scale testing.
+
+``generate_chunks(count, seed)`` yields the catalog as ``(sites, nearby,
+translations)`` chunks in the shape ``import_sites`` takes. Sites are spread
+around real heritage cities. Each has coordinates, fun facts, the languages
+its guides speak, and nearby attractions. Its text is translated into the
+city's own language, and into each other guide language with probability
+``translated_share``. Chunk ``i`` only depends on ``seed`` and ``i``, so the
+same arguments always give the same catalog.
+
+``write_catalog`` loads the chunks into a SQLite catalog through its bulk
+path. On one core 100k sites take about 15 s; a million take about 45 s for
+the rows plus 90 s for the discover indexes, and ``generate`` then spends
+about two more minutes on the search index.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from catalog import SQLiteCatalogStore, catalog_rows
+from i18n import DEFAULT_LANGUAGE, LANGUAGE_CODES
+
+CHUNK_SIZE = 20000
+
+# (city, country, lat, lon, local language, {language: "city, country"})
+CITIES = [
+    ("Agra", "India", 27.18, 78.04, "Hindi", {"Hindi": "आगरा, भारत"}),
+    ("Delhi", "India", 28.61, 77.21, "Hindi", {"Hindi": "दिल्ली, भारत"}),
+    ("Jaipur", "India", 26.91, 75.79, "Hindi", {"Hindi": "जयपुर, भारत"}),
+    ("Varanasi", "India", 25.32, 82.97, "Hindi", {"Hindi": "वाराणसी, भारत"}),
+    ("Rome", "Italy", 41.89, 12.49, "Italian", {"Italian": "Roma, Italia", "Spanish": "Roma, Italia"}),
+    ("Florence", "Italy", 43.77, 11.26, "Italian", {"Italian": "Firenze, Italia", "Spanish": "Florencia, Italia"}),
+    ("Venice", "Italy", 45.44, 12.32, "Italian", {"Italian": "Venezia, Italia", "Spanish": "Venecia, Italia"}),
+    ("Beijing", "China", 39.90, 116.41, "Mandarin", {"Mandarin": "北京, 中国", "Japanese": "北京, 中国"}),
+    ("Xi'an", "China", 34.34, 108.94, "Mandarin", {"Mandarin": "西安, 中国", "Japanese": "西安, 中国"}),
+    ("Kyoto", "Japan", 35.01, 135.77, "Japanese", {"Japanese": "京都, 日本", "Mandarin": "京都, 日本"}),
+    ("Nara", "Japan", 34.69, 135.80, "Japanese", {"Japanese": "奈良, 日本", "Mandarin": "奈良, 日本"}),
+    ("Paris", "France", 48.86, 2.35, "French", {"French": "Paris, France", "Spanish": "París, Francia"}),
+    ("Avignon", "France", 43.95, 4.81, "French", {"French": "Avignon, France", "Spanish": "Aviñón, Francia"}),
+    ("Berlin", "Germany", 52.52, 13.40, "German", {"German": "Berlin, Deutschland", "French": "Berlin, Allemagne"}),
+    ("Cologne", "Germany", 50.94, 6.96, "German", {"German": "Köln, Deutschland", "French": "Cologne, Allemagne"}),
+    ("Granada", "Spain", 37.18, -3.60, "Spanish", {"Spanish": "Granada, España", "French": "Grenade, Espagne"}),
+    ("Seville", "Spain", 37.39, -5.98, "Spanish", {"Spanish": "Sevilla, España", "French": "Séville, Espagne"}),
+    ("Cusco", "Peru", -13.53, -71.97, "Spanish", {"Spanish": "Cusco, Perú"}),
+    ("Mexico City", "Mexico", 19.43, -99.13, "Spanish", {"Spanish": "Ciudad de México, México"}),
+    ("Cairo", "Egypt", 30.04, 31.24, "French", {"French": "Le Caire, Égypte", "Spanish": "El Cairo, Egipto"}),
+    ("Athens", "Greece", 37.98, 23.73, "German", {"German": "Athen, Griechenland", "French": "Athènes, Grèce"}),
+    ("Istanbul", "Turkey", 41.01, 28.98, "German", {"German": "Istanbul, Türkei", "French": "Istanbul, Turquie"}),
+    ("Siem Reap", "Cambodia", 13.36, 103.86, "French", {"French": "Siem Reap, Cambodge"}),
+    ("Petra", "Jordan", 30.33, 35.44, "French", {"French": "Pétra, Jordanie", "Spanish": "Petra, Jordania"}),
+]
+
+# Every list below is aligned across languages: index i is the same thing
+KINDS = {
+    "English": ["Temple", "Fort", "Palace", "Tomb", "Cathedral", "Amphitheatre", "Monastery", "Citadel"],
+    "Spanish": ["Templo", "Fuerte", "Palacio", "Tumba", "Catedral", "Anfiteatro", "Monasterio", "Ciudadela"],
+    "French": ["Temple", "Fort", "Palais", "Tombeau", "Cathédrale", "Amphithéâtre", "Monastère", "Citadelle"],
+    "Italian": ["Tempio", "Forte", "Palazzo", "Tomba", "Cattedrale", "Anfiteatro", "Monastero", "Cittadella"],
+    "German": ["Tempel", "Festung", "Palast", "Grabmal", "Kathedrale", "Amphitheater", "Kloster", "Zitadelle"],
+    "Hindi": ["मंदिर", "किला", "महल", "मकबरा", "गिरजाघर", "रंगभूमि", "मठ", "दुर्ग"],
+    "Japanese": ["寺院", "砦", "宮殿", "霊廟", "大聖堂", "円形劇場", "修道院", "城塞"],
+    "Mandarin": ["寺庙", "堡垒", "宫殿", "陵墓", "大教堂", "圆形剧场", "修道院", "城堡"],
+}
+
+STYLES = {
+    "English": ["Mughal architecture", "Roman architecture", "Gothic architecture", "Baroque architecture",
+                "Byzantine architecture", "Khmer architecture", "Islamic architecture", "Buddhist architecture"],
+    "Spanish": ["Arquitectura mogol", "Arquitectura romana", "Arquitectura gótica", "Arquitectura barroca",
+                "Arquitectura bizantina", "Arquitectura jemer", "Arquitectura islámica", "Arquitectura budista"],
+    "French": ["Architecture moghole", "Architecture romaine", "Architecture gothique", "Architecture baroque",
+               "Architecture byzantine", "Architecture khmère", "Architecture islamique", "Architecture bouddhique"],
+    "Italian": ["Architettura moghul", "Architettura romana", "Architettura gotica", "Architettura barocca",
+                "Architettura bizantina", "Architettura khmer", "Architettura islamica", "Architettura buddista"],
+    "German": ["Mogul-Architektur", "Römische Architektur", "Gotische Architektur", "Barockarchitektur",
+               "Byzantinische Architektur", "Khmer-Architektur", "Islamische Architektur", "Buddhistische Architektur"],
+    "Hindi": ["मुग़ल वास्तुकला", "रोमन वास्तुकला", "गॉथिक वास्तुकला", "बरोक वास्तुकला",
+              "बीजान्टिन वास्तुकला", "ख्मेर वास्तुकला", "इस्लामी वास्तुकला", "बौद्ध वास्तुकला"],
+    "Japanese": ["ムガル建築", "ローマ建築", "ゴシック建築", "バロック建築",
+                 "ビザンティン建築", "クメール建築", "イスラム建築", "仏教建築"],
+    "Mandarin": ["莫卧儿建筑", "罗马建筑", "哥特式建筑", "巴洛克建筑",
+                 "拜占庭建筑", "高棉建筑", "伊斯兰建筑", "佛教建筑"],
+}
+
+FEATURES = {
+    "English": ["carved stone gateways", "painted ceilings", "marble domes", "terraced gardens",
+                "bronze statues", "stained glass windows"],
+    "Spanish": ["portadas de piedra tallada", "techos pintados", "cúpulas de mármol", "jardines en terrazas",
+                "estatuas de bronce", "vidrieras"],
+    "French": ["portails de pierre sculptée", "plafonds peints", "dômes de marbre", "jardins en terrasses",
+               "statues de bronze", "vitraux"],
+    "Italian": ["portali in pietra scolpita", "soffitti dipinti", "cupole di marmo", "giardini a terrazze",
+                "statue di bronzo", "vetrate istoriate"],
+    "German": ["gemeißelte Steintore", "bemalte Decken", "Marmorkuppeln", "Terrassengärten",
+               "Bronzestatuen", "Buntglasfenster"],
+    "Hindi": ["नक्काशीदार पत्थर के द्वार", "चित्रित छतें", "संगमरमर के गुंबद", "सीढ़ीदार बगीचे",
+              "कांसे की मूर्तियाँ", "रंगीन काँच की खिड़कियाँ"],
+    "Japanese": ["石彫りの門", "彩色された天井", "大理石のドーム", "段々の庭園", "青銅の像", "ステンドグラス"],
+    "Mandarin": ["石雕大门", "彩绘天花板", "大理石穹顶", "梯田式花园", "青铜雕像", "彩色玻璃窗"],
+}
+
+PARTS = {
+    "English": ["columns", "steps", "rooms", "arches"],
+    "Spanish": ["columnas", "escalones", "salas", "arcos"],
+    "French": ["colonnes", "marches", "salles", "arches"],
+    "Italian": ["colonne", "gradini", "sale", "archi"],
+    "German": ["Säulen", "Stufen", "Räume", "Bögen"],
+    "Hindi": ["स्तंभ", "सीढ़ियाँ", "कमरे", "मेहराब"],
+    "Japanese": ["本の柱", "段の階段", "の部屋", "のアーチ"],
+    "Mandarin": ["根柱子", "级台阶", "个房间", "座拱门"],
+}
+
+# name(ruler, kind), description(kind, city, feature), history(year, ruler, years),
+# facts(count, part, visitors, restorations)
+TEMPLATES = {
+    "English": (
+        "{ruler} {kind}",
+        "A {kind_lower} in {city} famous for its {feature}",
+        "Built in {year} under {ruler}. Construction took {years} years.",
+        ["It has {count} {part}", "About {visitors} people visit every year",
+         "It has been restored {restorations} times"],
+    ),
+    "Spanish": (
+        "{kind} de {ruler}",
+        "Un {kind_lower} en {city} famoso por sus {feature}",
+        "Construido en {year} bajo {ruler}. La construcción duró {years} años.",
+        ["Tiene {count} {part}", "Lo visitan unas {visitors} personas al año",
+         "Ha sido restaurado {restorations} veces"],
+    ),
+    "French": (
+        "{kind} de {ruler}",
+        "Un {kind_lower} à {city} célèbre pour ses {feature}",
+        "Construit en {year} sous {ruler}. Les travaux ont duré {years} ans.",
+        ["Il compte {count} {part}", "Environ {visitors} personnes le visitent chaque année",
+         "Il a été restauré {restorations} fois"],
+    ),
+    "Italian": (
+        "{kind} di {ruler}",
+        "Un {kind_lower} a {city} famoso per i suoi {feature}",
+        "Costruito nel {year} sotto {ruler}. La costruzione durò {years} anni.",
+        ["Ha {count} {part}", "Circa {visitors} persone lo visitano ogni anno",
+         "È stato restaurato {restorations} volte"],
+    ),
+    "German": (
+        "{ruler}-{kind}",
+        "{kind} in {city}, berühmt für seine {feature}",
+        "Erbaut {year} unter {ruler}. Der Bau dauerte {years} Jahre.",
+        ["Es hat {count} {part}", "Etwa {visitors} Menschen besuchen es jedes Jahr",
+         "Es wurde {restorations} Mal restauriert"],
+    ),
+    "Hindi": (
+        "{ruler} {kind}",
+        "{city} में स्थित {kind}, जो अपने {feature} के लिए प्रसिद्ध है",
+        "{ruler} के शासनकाल में {year} में निर्मित। निर्माण में {years} वर्ष लगे।",
+        ["इसमें {count} {part} हैं", "हर साल लगभग {visitors} लोग यहाँ आते हैं",
+         "इसका {restorations} बार जीर्णोद्धार हुआ है"],
+    ),
+    "Japanese": (
+        "{ruler}{kind}",
+        "{feature}で知られる{city}の{kind}",
+        "{ruler}の時代、{year}年に建てられました。建設には{years}年かかりました。",
+        ["{count}{part}があります", "毎年約{visitors}人が訪れます", "これまでに{restorations}回修復されました"],
+    ),
+    "Mandarin": (
+        "{ruler}{kind}",
+        "位于{city}的{kind}，以{feature}闻名",
+        "建于{year}年，{ruler}时期。建造历时{years}年。",
+        ["共有{count}{part}", "每年约有{visitors}人参观", "已修复{restorations}次"],
+    ),
+}
+
+RULERS = ["Ashoka", "Akbar", "Hadrian", "Augustus", "Charlemagne", "Suryavarman", "Kublai", "Yongle",
+          "Ramesses", "Justinian", "Suleiman", "Pachacuti", "Nezahualcoyotl", "Ludwig", "Isabella", "Kammu"]
+
+ATTRACTIONS = [("Market", "Shopping"), ("Museum", "Museum"), ("Gardens", "Gardens"), ("Bazaar", "Shopping"),
+               ("Old Town", "Historical Site"), ("Viewpoint", "Landmark"), ("Riverside", "Nature")]
+
+OTHER_LANGUAGES = [language for language in LANGUAGE_CODES if language != DEFAULT_LANGUAGE]
+
+
+@lru_cache(maxsize=None)
+def name_text(language, ruler, kind):
+    return TEMPLATES[language][0].format(ruler=ruler, kind=KINDS[language][kind])
+
+
+@lru_cache(maxsize=None)
+def description_text(language, kind, city, feature):
+    kind_name = KINDS[language][kind]
+    return TEMPLATES[language][1].format(kind=kind_name, kind_lower=kind_name.lower(), city=city.split(',')[0],
+                                         feature=FEATURES[language][feature])
+
+
+def site_text(language, ruler, kind, style, feature, part, city, year, numbers):
+    """Return one site's translatable fields in ``language``."""
+    _, _, history, facts = TEMPLATES[language]
+    years, count, visitors, restorations = numbers
+    return {
+        "name": name_text(language, ruler, kind),
+        "location": city,
+        "description": description_text(language, kind, city, feature),
+        "history": history.format(year=year, ruler=ruler, years=years),
+        "architectural_style": STYLES[language][style],
+        "fun_facts": [facts[0].format(count=count, part=PARTS[language][part]),
+                      facts[1].format(visitors=f'{visitors:,}'), facts[2].format(restorations=restorations)],
+    }
+
+
+def generate_chunk(index, size, seed, translated_share=0.5):
+    """Return chunk ``index``: sites ``index * CHUNK_SIZE`` onwards."""
+    rng = np.random.default_rng([seed, index])
+    start = index * CHUNK_SIZE
+    # Every random draw for the chunk at once; the loop only assembles them
+    cities = rng.integers(len(CITIES), size=size)
+    rulers = rng.integers(len(RULERS), size=size)
+    kinds = rng.integers(len(KINDS[DEFAULT_LANGUAGE]), size=size)
+    styles = rng.integers(len(STYLES[DEFAULT_LANGUAGE]), size=size)
+    features = rng.integers(len(FEATURES[DEFAULT_LANGUAGE]), size=size)
+    parts = rng.integers(len(PARTS[DEFAULT_LANGUAGE]), size=size)
+    years = rng.integers(300, 1900, size=size)
+    numbers = np.stack([rng.integers(2, 60, size=size), rng.integers(8, 400, size=size),
+                        rng.integers(10, 5000, size=size) * 1000, rng.integers(1, 12, size=size)], axis=1)
+    centres = np.array([(city[2], city[3]) for city in CITIES])[cities]
+    positions = np.round(centres + rng.uniform(-0.3, 0.3, size=(size, 2)), 4)
+    attraction_counts = rng.integers(2, 6, size=size)
+    attraction_kinds = rng.integers(len(ATTRACTIONS), size=(size, 5))
+    attraction_positions = np.round(positions[:, None, :] + rng.uniform(-0.05, 0.05, size=(size, 5, 2)), 4)
+    extra_languages = rng.integers(len(OTHER_LANGUAGES), size=(size, 2))
+    translated = rng.random(size=(size, 3))
+
+    # The loop is the slow part, so it only touches plain Python values
+    rows = zip(cities.tolist(), rulers.tolist(), kinds.tolist(), styles.tolist(), features.tolist(),
+               parts.tolist(), years.tolist(), numbers.tolist(), positions.tolist(), attraction_counts.tolist(),
+               attraction_kinds.tolist(), attraction_positions.tolist(), extra_languages.tolist(),
+               translated.tolist())
+    sites, nearby, translations = {}, {}, {}
+    for n, (city_index, ruler, kind, style, feature, part, year, numbers, (lat, lon), attraction_count,
+            attraction_kinds, attraction_positions, extra_languages, translated) in enumerate(rows, start):
+        city, country, _, _, local, local_names = CITIES[city_index]
+        ruler = RULERS[ruler]
+        site_id = f'site_{n:07d}'
+        args = (ruler, kind, style, feature, part)
+        site = site_text(DEFAULT_LANGUAGE, *args, f'{city}, {country}', year, numbers)
+        site['lat'] = lat
+        site['lon'] = lon
+        languages = list(dict.fromkeys([DEFAULT_LANGUAGE, local] + [OTHER_LANGUAGES[j] for j in extra_languages]))
+        site['languages'] = languages
+        sites[site_id] = site
+        # Guides in the city's own language always have the text in it
+        site_translations = {}
+        for language, draw in zip(languages[1:], translated):
+            if language == local or draw < translated_share:
+                location = local_names.get(language, f'{city}, {country}')
+                site_translations[language] = site_text(language, *args, location, year, numbers)
+        if site_translations:
+            translations[site_id] = site_translations
+        nearby[site_id] = [
+            {"name": f"{city} {ATTRACTIONS[kind][0]} {n}.{j}", "type": ATTRACTIONS[kind][1],
+             "lat": position[0], "lon": position[1]}
+            for j, (kind, position) in enumerate(zip(attraction_kinds[:attraction_count], attraction_positions))
+        ]
+    return sites, nearby, translations
+
+
+def generate_chunks(count, seed=1, translated_share=0.5):
+    for index in range((count + CHUNK_SIZE - 1) // CHUNK_SIZE):
+        yield generate_chunk(index, min(CHUNK_SIZE, count - index * CHUNK_SIZE), seed, translated_share)
+
+
+def site_ids(count):
+    return [f'site_{i:07d}' for i in range(count)]
+
+
+def chunk_rows(index, size, seed, translated_share):
+    return catalog_rows(index * CHUNK_SIZE, *generate_chunk(index, size, seed, translated_share))
+
+
+def generate_rows(count, seed=1, translated_share=0.5, workers=None):
+    """Yield the ``catalog_rows`` of each chunk, built by ``workers`` processes.
+
+    Only a few chunks are built ahead of the one being consumed, so memory
+    stays flat however large ``count`` is.
+    """
+    workers = workers or os.cpu_count() or 1
+    jobs = [(index, min(CHUNK_SIZE, count - index * CHUNK_SIZE), seed, translated_share)
+            for index in range((count + CHUNK_SIZE - 1) // CHUNK_SIZE)]
+    if workers == 1 or len(jobs) == 1:
+        for job in jobs:
+            yield chunk_rows(*job)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for job in jobs:
+            pending.append(pool.submit(chunk_rows, *job))
+            if len(pending) > workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_catalog(path, count, seed=1, translated_share=0.5, workers=None):
+    """Create a SQLite catalog of ``count`` synthetic sites at ``path``.
+
+    Chunks are generated and encoded in ``workers`` processes (one per CPU by
+    default) while this one writes, so the load scales with the CPUs until
+    SQLite is the bottleneck.
+    """
+    store = SQLiteCatalogStore(path, writable=True)
+    try:
+        store.bulk_import(generate_rows(count, seed, translated_share, workers))
+    finally:
+        store.close()
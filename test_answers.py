@@ -0,0 +1,40 @@
+import re
+
+import pytest
+
+from Website import TEMPLATES, create_app
+from answers import DEFAULT_ANSWER
+
+# The suggestion cards of the voice assistant, plus a question the old
+# keyword replies covered
+SUGGESTED_QUESTIONS = re.findall(r"askQuestion\('([^']+)'\)", TEMPLATES['voice_assistant.html'])
+QUESTIONS = SUGGESTED_QUESTIONS + ['best time to visit']
+
+
+@pytest.fixture(scope='module')
+def client():
+    return create_app().test_client()
+
+
+def test_suggestions_are_found():
+    assert len(SUGGESTED_QUESTIONS) == 4
+
+
+@pytest.mark.parametrize('site_id', ['taj_mahal', ''])
+@pytest.mark.parametrize('question', QUESTIONS)
+def test_suggested_questions_get_a_passage(client, question, site_id):
+    answer = client.post('/api/ask_question', json={'question': question, 'site_id': site_id}).get_json()
+    assert answer['passages']
+    assert answer['answer'] != DEFAULT_ANSWER
+
+
+@pytest.mark.parametrize('question, field', [
+    ('Tell me about the history', 'history'),
+    ('What is the architectural style?', 'architectural_style'),
+    ('How was it constructed?', 'history'),
+    ('What is the cultural significance?', 'significance'),
+    ('best time to visit', 'visit'),
+])
+def test_questions_find_their_field(client, question, field):
+    answer = client.post('/api/ask_question', json={'question': question, 'site_id': 'taj_mahal'}).get_json()
+    assert answer['passages'][0]['field'] == field
@@ -0,0 +1,209 @@
+"""Text-to-speech for spoken answers.
+
+Audio is content-addressed: the key is a hash of the text, language and
+voice, so the same answer is only ever synthesised once. ``AudioCache`` keeps
+recent clips in a byte-capped LRU and spills evicted ones to disk, where any
+worker process can pick them up again; the spill directory is kept under
+``spill_max_bytes`` by deleting the least recently used clips. Synthesis uses
+the local ``espeak-ng`` binary when it is installed.
+"""
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+
+ESPEAK = shutil.which('espeak-ng') or shutil.which('espeak')
+
+TTS_AVAILABLE = ESPEAK is not None
+
+# espeak-ng voice per BCP 47 language code
+ESPEAK_VOICES = {'en': 'en', 'hi': 'hi', 'es': 'es', 'fr': 'fr', 'de': 'de', 'ja': 'ja', 'it': 'it', 'zh': 'cmn'}
+
+# Voice variants, e.g. "default", "f3" or "m2"
+VOICE_RE = re.compile(r'^(default|[a-z]+[0-9]*)$')
+
+
+def audio_key(text, language, voice):
+    return hashlib.sha256('\0'.join((language, voice, text)).encode('utf-8')).hexdigest()
+
+
+class EspeakSynthesizer:
+    def __init__(self, binary=ESPEAK, speed=160):
+        if binary is None:
+            raise RuntimeError('Text-to-speech needs espeak-ng')
+        self.binary = binary
+        self.speed = speed
+
+    def synthesize(self, text, language, voice):
+        """Return WAV bytes for ``text``."""
+        name = ESPEAK_VOICES.get(language, 'en')
+        if voice != 'default':
+            name = f'{name}+{voice}'
+        # Text goes in on stdin so it can never be taken for an option
+        try:
+            result = subprocess.run([self.binary, '-v', name, '-s', str(self.speed), '--stdout'],
+                                    input=text.encode('utf-8'), capture_output=True, timeout=30, check=True)
+        except subprocess.TimeoutExpired:
+            raise RuntimeError('Text-to-speech timed out')
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f'Text-to-speech failed with exit status {e.returncode}')
+        return result.stdout
+
+
+class AudioCache:
+    """Byte-capped LRU of clips by key, spilling evictions to ``spill_dir``.
+
+    Each process estimates the spill directory's size from its last scan plus
+    what it spilled since, and prunes when that passes ``spill_max_bytes``. It
+    also rescans after spilling a sixteenth of the limit, to count what other
+    workers wrote.
+    """
+
+    def __init__(self, max_bytes, spill_dir, spill_max_bytes):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bytes on disk at the last scan (None before the first) and spilled since
+        self._disk_bytes = None
+        self._spilled = 0
+        self._prune_lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.spill_dir, key[:2], key + '.wav')
+
+    def get(self, key):
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                return audio
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                audio = f.read()
+            # Marks the clip as recently used for prune()
+            os.utime(path)
+        except OSError:
+            return None
+        self.put(key, audio, spill=False)
+        return audio
+
+    def put(self, key, audio, spill=True):
+        if len(audio) > self.max_bytes:
+            if spill:
+                self.spill(key, audio)
+            return
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = audio
+            self.size += len(audio)
+            while self.size > self.max_bytes:
+                evicted.append(self._entries.popitem(last=False))
+                self.size -= len(evicted[-1][1])
+        if spill:
+            for evicted_key, evicted_audio in evicted:
+                self.spill(evicted_key, evicted_audio)
+
+    def spill(self, key, audio):
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(audio)
+        os.replace(tmp, path)
+        with self._lock:
+            self._spilled += len(audio)
+            due = (self._disk_bytes is None or self._disk_bytes + self._spilled > self.spill_max_bytes
+                   or self._spilled > self.spill_max_bytes // 16)
+        if due and self._prune_lock.acquire(blocking=False):
+            try:
+                # Leave some room so the next few spills do not prune again
+                self.prune(self.spill_max_bytes * 9 // 10)
+            finally:
+                self._prune_lock.release()
+
+    def prune(self, target=None):
+        """Delete the least recently used spilled clips beyond ``spill_max_bytes``,
+        or down to ``target`` bytes once over it."""
+        with self._lock:
+            spilled = self._spilled
+        files = []
+        for root, _, filenames in os.walk(self.spill_dir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # Pruned by another worker meanwhile
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        if total > self.spill_max_bytes:
+            limit = self.spill_max_bytes if target is None else target
+            for _, size, path in sorted(files):
+                if total <= limit:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        with self._lock:
+            self._disk_bytes = total
+            self._spilled -= spilled
+
+
+class SpeechRenderer:
+    """Synthesise through the cache; concurrent requests for one clip share a synthesis."""
+
+    def __init__(self, synthesizer_factory, cache):
+        self.synthesizer_factory = synthesizer_factory
+        self.cache = cache
+        self._synthesizer = None
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, language, voice='default'):
+        """Return ``(key, wav bytes)``."""
+        key = audio_key(text, language, voice)
+        audio = self.cache.get(key)
+        if audio is not None:
+            self.hits += 1
+            return key, audio
+        with self._lock:
+            event = self._in_flight.get(key)
+            owner = event is None
+            if owner:
+                event = self._in_flight[key] = threading.Event()
+        if not owner:
+            event.wait(60)
+            audio = self.cache.get(key)
+            if audio is not None:
+                self.hits += 1
+                return key, audio
+        self.misses += 1
+        try:
+            if self._synthesizer is None:
+                self._synthesizer = self.synthesizer_factory()
+            audio = self._synthesizer.synthesize(text, language, voice)
+            self.cache.put(key, audio)
+        finally:
+            if owner:
+                with self._lock:
+                    del self._in_flight[key]
+                event.set()
+        return key, audio
@@ -0,0 +1,193 @@
+"""Speech-to-text for voice questions.
+
+Uploads are decoded to 16 kHz mono float32 and handed to a ``SpeechBatcher``,
+which groups requests arriving within ``max_wait`` seconds of each other (per
+language) into one batch for the transcriber, so concurrent users share a
+single forward pass. The Whisper backend runs locally on the CPU and is used
+when ``transformers`` is installed; without it voice queries are unavailable.
+"""
+import io
+import os
+import threading
+import time
+import wave
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    from transformers import pipeline as hf_pipeline
+    from transformers.pipelines.audio_utils import ffmpeg_read
+except ImportError:
+    hf_pipeline = None
+    ffmpeg_read = None
+
+SAMPLE_RATE = 16000
+
+STT_AVAILABLE = hf_pipeline is not None
+
+
+class AudioError(ValueError):
+    pass
+
+
+def resample(samples, rate):
+    if rate == SAMPLE_RATE or not len(samples):
+        return samples
+    duration = len(samples) / rate
+    positions = np.arange(int(duration * SAMPLE_RATE)) * (rate / SAMPLE_RATE)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def decode_wav(data):
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            if wav.getsampwidth() != 2:
+                raise AudioError('Only 16-bit PCM WAV is supported')
+            frames = wav.readframes(wav.getnframes())
+            channels, rate = wav.getnchannels(), wav.getframerate()
+    except (wave.Error, EOFError) as e:
+        raise AudioError(f'Invalid WAV file: {e}')
+    samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return resample(samples, rate)
+
+
+def decode_audio(data):
+    """Decode an upload to 16 kHz mono float32 samples.
+
+    WAV is decoded in-process; anything else (the webm/ogg browsers record)
+    goes through ffmpeg.
+    """
+    if data[:4] == b'RIFF':
+        return decode_wav(data)
+    if ffmpeg_read is None:
+        raise AudioError('Only WAV uploads are supported on this server')
+    try:
+        return ffmpeg_read(data, SAMPLE_RATE)
+    except ValueError as e:
+        raise AudioError(str(e))
+
+
+class WhisperTranscriber:
+    """Whisper through a transformers pipeline, on the CPU."""
+
+    def __init__(self, model, threads=None):
+        if hf_pipeline is None:
+            raise RuntimeError('Speech recognition needs the transformers package')
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self._pipeline = hf_pipeline('automatic-speech-recognition', model=model, device='cpu')
+
+    def transcribe_batch(self, audios, language):
+        """Return the transcript of each clip in ``audios``; ``language`` is a BCP 47 code."""
+        inputs = [{"raw": audio, "sampling_rate": SAMPLE_RATE} for audio in audios]
+        results = self._pipeline(inputs, batch_size=len(inputs),
+                                 generate_kwargs={"language": language, "task": "transcribe"})
+        return [result['text'].strip() for result in results]
+
+
+class SpeechJob:
+    __slots__ = ('audio', 'language', 'enqueued', 'started', 'finished', 'batch_size',
+                 'text', 'error', 'done')
+
+    def __init__(self, audio, language):
+        self.audio = audio
+        self.language = language
+        self.enqueued = time.perf_counter()
+        self.started = self.finished = None
+        self.batch_size = 0
+        self.text = None
+        self.error = None
+        self.done = threading.Event()
+
+    @property
+    def queue_ms(self):
+        return (self.started - self.enqueued) * 1000
+
+    @property
+    def stt_ms(self):
+        return (self.finished - self.started) * 1000
+
+
+class SpeechBatcher:
+    """Micro-batches transcription requests across request threads.
+
+    Once one of ``workers`` transcription threads is free, a collector thread
+    takes the oldest waiting language, waits up to ``max_wait`` for more clips
+    in it (at most ``max_batch``) and hands the batch over. While every worker
+    is busy, new clips keep piling into the next batch. Threads start on the
+    first request, so they are created in each worker process after a fork.
+    """
+
+    def __init__(self, transcriber_factory, max_batch=8, max_wait=0.05, workers=1):
+        self.transcriber_factory = transcriber_factory
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.workers = workers
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self._pid = None
+        self._transcriber = None
+        self._executor = None
+        self._idle = threading.Semaphore(workers)
+
+    def _start(self):
+        self._transcriber = self.transcriber_factory()
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='stt')
+        threading.Thread(target=self._collect, name='stt-batcher', daemon=True).start()
+        self._pid = os.getpid()
+
+    def submit(self, audio, language):
+        job = SpeechJob(audio, language)
+        with self._cond:
+            if self._pid != os.getpid():
+                self._start()
+            self._pending.setdefault(language, []).append(job)
+            self._cond.notify_all()
+        return job
+
+    def transcribe(self, audio, language, timeout=60):
+        job = self.submit(audio, language)
+        if not job.done.wait(timeout):
+            raise TimeoutError('Speech recognition timed out')
+        if job.error is not None:
+            raise job.error
+        return job
+
+    def _collect(self):
+        while True:
+            self._idle.acquire()
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                language, jobs = next(iter(self._pending.items()))
+                deadline = jobs[0].enqueued + self.max_wait
+                while len(jobs) < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = jobs[:self.max_batch]
+                del jobs[:self.max_batch]
+                if not jobs:
+                    del self._pending[language]
+            self._executor.submit(self._run, batch, language)
+
+    def _run(self, batch, language):
+        started = time.perf_counter()
+        try:
+            texts = self._transcriber.transcribe_batch([job.audio for job in batch], language)
+            error = None
+        except Exception as e:
+            texts, error = [None] * len(batch), e
+        finished = time.perf_counter()
+        for job, text in zip(batch, texts):
+            job.started, job.finished = started, finished
+            job.batch_size = len(batch)
+            job.text, job.error = text, error
+            job.done.set()
+        self._idle.release()
@@ -0,0 +1,4 @@
+"""WSGI entry point for external servers, e.g. ``gunicorn wsgi:app``."""
+from Website import create_app
+
+app = create_app()